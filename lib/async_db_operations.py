@@ -0,0 +1,202 @@
+"""
+Asyncio API mirroring db_operations, for embedding Meal Mate in async services.
+
+    import async_db_operations as adb
+
+    recipes = await adb.list_recipes()
+    missing = await adb.check_inventory(recipes[0])
+    await adb.save_ingredient("Flour", 1, "kg")
+
+Every function takes the same arguments and returns the same result as the
+db_operations function of the same name. Both run the same private cores:
+here through AsyncSession.run_sync on one shared AsyncEngine (aiosqlite for
+SQLite), so each statement awaits the driver instead of blocking the event
+loop and concurrent reads overlap. Caches and change events are shared
+with db_operations, so a write made through either API invalidates both.
+
+Writes retry on conflict like their sync counterparts, backing off with
+asyncio.sleep. batch_transaction() and use_database() have no async
+counterpart.
+"""
+import asyncio
+import random
+from functools import wraps
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import db_operations
+from db.database import get_async_engine
+from instrumentation import instrumented
+
+engine = get_async_engine()
+Session = async_sessionmaker(bind=engine)
+
+
+def retry_on_conflict(max_attempts=5, base_delay=0.02, max_delay=1.0):
+    """
+    Re-run a write transaction with jittered exponential backoff when it
+    loses a race with another writer, without blocking the event loop.
+    """
+    def decorator(operation):
+        @wraps(operation)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    return await operation(*args, **kwargs)
+                except Exception as exc:
+                    if attempt == max_attempts or not db_operations._is_retryable(exc):
+                        raise
+                    delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+        return wrapper
+    return decorator
+
+
+async def _run(core, *args):
+    async with Session() as session:
+        return await session.run_sync(core, *args)
+
+
+@instrumented
+async def list_recipes():
+    return await _run(db_operations._list_recipes)
+
+
+@instrumented
+async def list_recipes_page(after_id=None, limit=100):
+    return await _run(db_operations._list_recipes_page, after_id, limit)
+
+
+async def iter_recipes(batch_size=1000):
+    """Async generator over every recipe, one keyset page at a time."""
+    after_id = None
+    while True:
+        page = await list_recipes_page(after_id, batch_size)
+        for item in page["items"]:
+            yield item
+        after_id = page["next_after_id"]
+        if after_id is None:
+            return
+
+
+@instrumented
+async def recipe_requirements(recipe_id):
+    return await _run(db_operations._recipe_requirements, recipe_id)
+
+
+@instrumented
+async def check_inventory(recipe_dict):
+    return await _run(db_operations._check_inventory, recipe_dict['id'])
+
+
+@instrumented
+async def check_inventory_bulk(recipe_ids, servings=1):
+    return await _run(db_operations._check_inventory_bulk, recipe_ids, servings)
+
+
+@instrumented
+@retry_on_conflict()
+async def save_ingredient(name, quantity, unit, density=None):
+    return await _run(db_operations._save_ingredient, name, quantity, unit, density)
+
+
+@instrumented
+@retry_on_conflict()
+async def save_recipe_with_ingredients(recipe_name, ingredients):
+    return await _run(db_operations._save_recipe_with_ingredients, recipe_name, ingredients)
+
+
+@instrumented
+async def load_inventory():
+    return await _run(db_operations._load_inventory)
+
+
+@instrumented
+async def load_inventory_page(after_id=None, limit=100):
+    return await _run(db_operations._load_inventory_page, after_id, limit)
+
+
+async def iter_inventory(batch_size=1000):
+    """Async generator over inventory rows like load_inventory, one keyset page at a time."""
+    after_id = None
+    while True:
+        page = await load_inventory_page(after_id, batch_size)
+        for item in page["items"]:
+            yield {key: value for key, value in item.items() if key != "id"}
+        after_id = page["next_after_id"]
+        if after_id is None:
+            return
+
+
+@instrumented
+@retry_on_conflict()
+async def create_meal_plan(date_str, recipe_dict):
+    return await _run(db_operations._create_meal_plan, date_str, recipe_dict)
+
+
+@instrumented
+@retry_on_conflict()
+async def create_meal_plans(entries):
+    return await _run(db_operations._create_meal_plans, entries)
+
+
+@instrumented
+async def get_stock(name):
+    return await _run(db_operations._get_stock, name)
+
+
+@instrumented
+@retry_on_conflict()
+async def update_ingredient_quantity(name, new_quantity, expected_version=None, unit=None):
+    return await _run(db_operations._update_ingredient_quantity, name, new_quantity, expected_version, unit)
+
+
+@instrumented
+@retry_on_conflict()
+async def delete_ingredient(name):
+    return await _run(db_operations._delete_ingredient, name)
+
+
+@instrumented
+@retry_on_conflict()
+async def delete_recipe(recipe_name):
+    return await _run(db_operations._delete_recipe, recipe_name)
+
+
+@instrumented
+async def shopping_list(start_date, end_date, use_cache=False):
+    return await _run(db_operations._shopping_list, start_date, end_date, use_cache)
+
+
+@instrumented
+@retry_on_conflict()
+async def consume_recipes(recipe_ids, servings=1):
+    return await _run(db_operations._consume_recipes, recipe_ids, servings)
+
+
+@instrumented
+async def cook(date_str, servings=1):
+    recipe_ids = await _run(db_operations._planned_recipe_ids, date_str)
+    return await consume_recipes(recipe_ids, servings)
+
+
+@instrumented
+async def stock_at(when):
+    return await _run(db_operations._stock_at, when)
+
+
+@instrumented
+async def list_stock_movements(name=None, after_id=None, limit=100):
+    return await _run(db_operations._list_stock_movements, name, after_id, limit)
+
+
+@instrumented
+@retry_on_conflict()
+async def checkpoint_stock():
+    return await _run(db_operations._checkpoint_stock)
+
+
+@instrumented
+@retry_on_conflict()
+async def rebuild_inventory():
+    return await _run(db_operations._rebuild_inventory)
@@ -0,0 +1,139 @@
+"""
+Load test comparing the sync and async data-access paths under concurrency.
+
+Generates a seeded synthetic database, then fires the same mix of read
+requests (check_inventory, get_stock, list_recipes_page, shopping_list)
+through db_operations on a thread pool and through async_db_operations on
+one event loop, at each concurrency level. Reports requests per second and
+p50/p95 latency per path.
+
+Usage:
+    python async_load_test.py --requests 2000 --concurrency 1 8 32 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import async_db_operations
+import benchmark
+import datagen
+import db_operations
+from db.database import get_async_engine, get_engine
+from helpers import format_table
+
+
+def request_mix(fixture, count):
+    """(function name, args) pairs, the same for both paths."""
+    rng = fixture.rng
+    requests = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            requests.append(("check_inventory", (rng.choice(fixture.recipes),)))
+        elif kind == 1:
+            requests.append(("get_stock", (rng.choice(fixture.ingredients)[0],)))
+        elif kind == 2:
+            requests.append(("list_recipes_page", (rng.choice(fixture.recipes)["id"], 50)))
+        else:
+            start = datagen.START_DATE + timedelta(days=rng.randrange(60))
+            requests.append(("shopping_list", (start, start + timedelta(days=6))))
+    return requests
+
+
+def summarize(path, concurrency, latencies, elapsed):
+    latencies.sort()
+    return {
+        "path": path,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(benchmark.percentile(latencies, 50), 3),
+        "p95_ms": round(benchmark.percentile(latencies, 95), 3),
+    }
+
+
+def run_sync(requests, concurrency):
+    def call(request):
+        name, args = request
+        start = time.perf_counter()
+        getattr(db_operations, name)(*args)
+        return (time.perf_counter() - start) * 1000
+
+    db_operations.invalidate_caches()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(call, requests))
+    return summarize("sync", concurrency, latencies, time.perf_counter() - start)
+
+
+async def run_async(requests, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def call(request):
+        name, args = request
+        async with limit:
+            start = time.perf_counter()
+            await getattr(async_db_operations, name)(*args)
+            return (time.perf_counter() - start) * 1000
+
+    db_operations.invalidate_caches()
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(call(r) for r in requests))
+    return summarize("async", concurrency, list(latencies), time.perf_counter() - start)
+
+
+async def run_all(requests, levels):
+    results = []
+    for concurrency in levels:
+        print(f"Concurrency {concurrency} ...", file=sys.stderr)
+        results.append(run_sync(requests, concurrency))
+        results.append(await run_async(requests, concurrency))
+    await async_db_operations.engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare sync and async db access under concurrent load.")
+    datagen.add_generator_arguments(parser)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per path and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--db", help="Where to build the database (default: a temporary file)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "load.db")
+        print(f"Generating database at {db_path} ...")
+        dataset = datagen.generate(db_path, **datagen.generator_kwargs(args))
+
+        url = f"sqlite:///{db_path}"
+        engine = get_engine(url)
+        db_operations.engine = engine
+        db_operations.Session.configure(bind=engine)
+        async_db_operations.engine = get_async_engine(url)
+        async_db_operations.Session.configure(bind=async_db_operations.engine)
+
+        requests = request_mix(benchmark.Fixture(engine, args.seed), args.requests)
+        results = asyncio.run(run_all(requests, args.concurrency))
+        engine.dispose()
+
+    print(format_table(
+        [(r["path"], r["concurrency"], r["requests_per_second"], r["p50_ms"], r["p95_ms"]) for r in results],
+        headers=["Path", "Concurrency", "Requests/s", "p50 ms", "p95 ms"],
+    ))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"dataset": dataset, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
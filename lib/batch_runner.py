@@ -0,0 +1,196 @@
+"""
+Nightly batch runner for multi-tenant deployments, where every household
+has its own SQLite file.
+
+Each tenant is one task: a worker process binds db_operations to the
+tenant's file (db_operations.use_database), runs the requested jobs in
+order (plan meals with the optimizer, build the shopping list, find the
+recipes cookable from stock), releases the tenant's engine and sends the
+results back. Tenants are spread over a ProcessPoolExecutor in chunks, so
+throughput grows with the number of cores, and the results are merged into
+one summary: meals planned, cookable recipes and a combined shopping list
+across households. A tenant that fails is reported, not retried, and does
+not stop the others.
+
+Usage:
+    python batch_runner.py households/ --jobs plan shopping --start 2026-11-01 --end 2026-11-07
+    python batch_runner.py a.db b.db --workers 8 --output nightly.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from functools import partial
+
+import db_operations
+import feasibility
+import optimizer
+from db.database import dispose_engine, dispose_engines, tenant_url
+from helpers import format_table, parse_date
+
+# Jobs always run in this order, so the shopping list includes the meals just planned
+JOBS = ("plan", "shopping", "feasibility")
+
+
+def tenant_paths(paths):
+    """Expand directories to the *.db files in them; keep files as given."""
+    tenants = []
+    for path in paths:
+        if os.path.isdir(path):
+            tenants.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith(".db")
+            ))
+        else:
+            tenants.append(path)
+    return tenants
+
+
+def run_tenant(path, jobs, start, end, meals_per_day=1, no_repeat_days=7, seed=None, dry_run=False):
+    """
+    Run jobs against one tenant database. Never raises: a failure is
+    reported as {"ok": False, "error": ...} alongside whatever finished.
+    """
+    started = time.perf_counter()
+    result = {"tenant": path, "ok": True, "error": None}
+    url = tenant_url(path)
+    output = io.StringIO()
+    try:
+        # SQLite would quietly create an empty file for a mistyped path
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Tenant database '{path}' not found")
+        with contextlib.redirect_stdout(output), db_operations.use_database(url):
+            if "plan" in jobs:
+                result["plan"] = optimizer.plan_meals(start, end, meals_per_day, no_repeat_days, seed, dry_run)
+            if "shopping" in jobs:
+                result["shopping"] = db_operations.shopping_list(start, end)
+            if "feasibility" in jobs:
+                result["feasibility"] = feasibility.cookable_recipes()
+    except Exception as exc:
+        result.update(ok=False, error=f"{type(exc).__name__}: {exc}")
+    finally:
+        dispose_engine(url)
+    # db_operations reports some failures by printing them
+    result["messages"] = output.getvalue().splitlines()
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def merge(results):
+    """Combine per-tenant results into totals and one shopping list across tenants."""
+    shopping = {}
+    for result in results:
+        for item in result.get("shopping", ()):
+            total = shopping.setdefault(
+                (item["name"], item["unit"]),
+                {"name": item["name"], "needed": 0.0, "to_buy": 0.0, "unit": item["unit"], "tenants": 0},
+            )
+            total["needed"] += item["needed"]
+            total["to_buy"] += item["to_buy"]
+            total["tenants"] += 1
+    plans = [r["plan"] for r in results if "plan" in r]
+    return {
+        "tenants": len(results),
+        "failed": [{"tenant": r["tenant"], "error": r["error"]} for r in results if not r["ok"]],
+        "meals_planned": sum(len(p["plan"]) for p in plans),
+        "meals_saved": sum(len(p["created"]) for p in plans),
+        "unfilled": sum(p["unfilled"] for p in plans),
+        "cookable": sum(len(r["feasibility"]) for r in results if "feasibility" in r),
+        "shopping": sorted(
+            (item for item in shopping.values() if item["to_buy"] > 0), key=lambda item: item["name"]
+        ),
+        "worker_seconds": round(sum(r["seconds"] for r in results), 3),
+    }
+
+
+def _init_worker():
+    # Engines inherited through fork hold the parent's connections
+    dispose_engines(close=False)
+
+
+def run_batch(paths, jobs=JOBS, start=None, end=None, workers=None, **options):
+    """
+    Run jobs for every tenant file in paths on a pool of worker processes
+    (default: one per core; workers=1 runs in this process). start and end
+    default to the next seven days. Return {"results": [...], "summary": merge(...)}.
+    """
+    unknown = set(jobs) - set(JOBS)
+    if unknown:
+        raise ValueError(f"Unknown job(s) {', '.join(sorted(unknown))}. Choose from: {', '.join(JOBS)}")
+    start = db_operations._to_date(start) if start is not None else date.today()
+    end = db_operations._to_date(end) if end is not None else start + timedelta(days=6)
+    if end < start:
+        raise ValueError("End date is before start date")
+
+    task = partial(run_tenant, jobs=tuple(jobs), start=start, end=end, **options)
+    workers = min(workers or os.cpu_count() or 1, max(len(paths), 1))
+    if workers == 1:
+        results = [task(path) for path in paths]
+    else:
+        # A few chunks per worker keeps pickling overhead down without leaving cores idle at the end
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+            results = list(pool.map(task, paths, chunksize=chunksize))
+    return {"results": results, "summary": merge(results)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run planning jobs across many household databases.")
+    parser.add_argument("paths", nargs="+", help="Tenant database files, or directories of *.db files")
+    parser.add_argument("--jobs", nargs="+", choices=JOBS, default=list(JOBS))
+    parser.add_argument("--start", help="First date (YYYY-MM-DD, default: today)")
+    parser.add_argument("--end", help="Last date (YYYY-MM-DD, default: start + 6 days)")
+    parser.add_argument("--meals-per-day", type=int, default=1)
+    parser.add_argument("--no-repeat-days", type=int, default=7)
+    parser.add_argument("--seed", type=int, help="Seed for the optimizer's tie-breaking")
+    parser.add_argument("--dry-run", action="store_true", help="Plan without saving meal plans")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--output", help="Also write every tenant's results to this JSON file")
+    args = parser.parse_args(argv)
+
+    dates = {}
+    for name in ("start", "end"):
+        value = getattr(args, name)
+        if value is not None:
+            dates[name] = parse_date(value)
+            if dates[name] is None:
+                parser.error(f"--{name} must be YYYY-MM-DD")
+
+    paths = tenant_paths(args.paths)
+    if not paths:
+        parser.error("no tenant databases found")
+
+    started = time.perf_counter()
+    batch = run_batch(
+        paths, args.jobs, workers=args.workers, meals_per_day=args.meals_per_day,
+        no_repeat_days=args.no_repeat_days, seed=args.seed, dry_run=args.dry_run, **dates,
+    )
+    elapsed = time.perf_counter() - started
+    summary = batch["summary"]
+
+    print(format_table(
+        [(summary["tenants"], len(summary["failed"]), summary["meals_planned"], summary["meals_saved"],
+          summary["unfilled"], summary["cookable"], round(elapsed, 2))],
+        headers=["Tenants", "Failed", "Meals planned", "Saved", "Unfilled", "Cookable", "Seconds"],
+    ))
+    if summary["shopping"]:
+        print("\nTo buy across all tenants:")
+        print(format_table(
+            [(i["name"], round(i["to_buy"], 2), i["unit"], i["tenants"]) for i in summary["shopping"]],
+            headers=["Ingredient", "To buy", "Unit", "Tenants"],
+        ))
+    for failure in summary["failed"]:
+        print(f"{failure['tenant']}: {failure['error']}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(batch, f, indent=2, default=str)
+        print(f"\nResults written to {args.output}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
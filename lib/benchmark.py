@@ -0,0 +1,261 @@
+"""
+Benchmark harness for the public functions in db_operations.
+
+Generates a seeded synthetic database with datagen, points db_operations at
+it, and times every scenario below. Reports p50/p95/p99 latency and SQL
+statements per call, and writes the results as JSON so runs can be compared
+across commits.
+
+Usage:
+    python benchmark.py --recipes 20000 --iterations 200 --output bench_results.json
+"""
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, select
+
+import datagen
+import db_operations
+from db.database import get_engine
+from db.models import Ingredient, MealPlan, Recipe
+from helpers import format_table
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement != "BEGIN":
+            self.count += 1
+
+
+class Fixture:
+    """
+    Names and ids from the generated database that scenarios draw from.
+    """
+
+    def __init__(self, engine, seed):
+        self.rng = random.Random(seed)
+        with engine.connect() as conn:
+            self.ingredients = conn.execute(select(Ingredient.name, Ingredient.unit)).all()
+            self.recipes = [
+                {"id": rid, "name": name} for rid, name in conn.execute(select(Recipe.id, Recipe.name)).all()
+            ]
+            self.plan_dates = list(conn.scalars(select(MealPlan.date).distinct().order_by(MealPlan.date)))
+        # Deletes consume names, so they get their own disjoint pools
+        shuffled = list(self.ingredients)
+        self.rng.shuffle(shuffled)
+        self.deletable_ingredients = [name for name, _ in shuffled]
+        shuffled = list(self.recipes)
+        self.rng.shuffle(shuffled)
+        self.deletable_recipes = [r["name"] for r in shuffled]
+        self.counter = 0
+
+    def next_id(self):
+        self.counter += 1
+        return self.counter
+
+
+def _ingredient_list(fx, size):
+    return [
+        {"name": name, "quantity": round(fx.rng.uniform(1, 500), 1), "unit": unit}
+        for name, unit in fx.rng.sample(fx.ingredients, size)
+    ]
+
+
+# Each scenario returns a zero-argument callable for one timed call.
+SCENARIOS = {
+    "list_recipes": lambda fx: (lambda: db_operations.list_recipes()),
+    "check_inventory": lambda fx: (lambda r=fx.rng.choice(fx.recipes): db_operations.check_inventory(r)),
+    "recipe_requirements": lambda fx: (
+        lambda r=fx.rng.choice(fx.recipes): db_operations.recipe_requirements(r["id"])
+    ),
+    "check_inventory_bulk": lambda fx: (
+        lambda ids=[r["id"] for r in fx.rng.sample(fx.recipes, min(40, len(fx.recipes)))]:
+        db_operations.check_inventory_bulk(ids)
+    ),
+    "list_recipes_page": lambda fx: (
+        lambda after=fx.rng.choice(fx.recipes)["id"]: db_operations.list_recipes_page(after, 100)
+    ),
+    "iter_recipes": lambda fx: (lambda: sum(1 for _ in db_operations.iter_recipes())),
+    "load_inventory": lambda fx: (lambda: db_operations.load_inventory()),
+    "load_inventory_page": lambda fx: (
+        lambda after=fx.rng.randrange(len(fx.ingredients)): db_operations.load_inventory_page(after, 100)
+    ),
+    "iter_inventory": lambda fx: (lambda: sum(1 for _ in db_operations.iter_inventory())),
+    "save_ingredient": lambda fx: (
+        lambda ing=fx.rng.choice(fx.ingredients): db_operations.save_ingredient(ing[0], 10, ing[1])
+    ),
+    "save_recipe_with_ingredients": lambda fx: (
+        lambda name=f"Bench recipe {fx.next_id()}", ings=_ingredient_list(fx, 6):
+        db_operations.save_recipe_with_ingredients(name, ings)
+    ),
+    "create_meal_plan": lambda fx: (
+        lambda d=(date(2030, 1, 1) + timedelta(days=fx.next_id())).isoformat(), r=fx.rng.choice(fx.recipes):
+        db_operations.create_meal_plan(d, r)
+    ),
+    "create_meal_plans": lambda fx: (
+        lambda start=date(2040, 1, 1) + timedelta(days=30 * fx.next_id()), rs=fx.rng.sample(fx.recipes, 3):
+        db_operations.create_meal_plans([(start + timedelta(days=i), r["id"]) for i in range(30) for r in rs])
+    ),
+    "get_stock": lambda fx: (lambda name=fx.rng.choice(fx.ingredients)[0]: db_operations.get_stock(name)),
+    "update_ingredient_quantity": lambda fx: (
+        lambda name=fx.rng.choice(fx.ingredients)[0]: db_operations.update_ingredient_quantity(name, 100)
+    ),
+    "shopping_list": lambda fx: (
+        lambda start=datagen.START_DATE + timedelta(days=fx.rng.randrange(60)):
+        db_operations.shopping_list(start, start + timedelta(days=6))
+    ),
+    "consume_recipes": lambda fx: (
+        lambda ids=[r["id"] for r in fx.rng.sample(fx.recipes, 3)]: db_operations.consume_recipes(ids)
+    ),
+    "cook": lambda fx: (
+        lambda d=fx.rng.choice(fx.plan_dates): db_operations.cook(d)
+    ),
+    "delete_recipe": lambda fx: (lambda name=fx.deletable_recipes.pop(): db_operations.delete_recipe(name)),
+    "delete_ingredient": lambda fx: (
+        lambda name=fx.deletable_ingredients.pop(): db_operations.delete_ingredient(name)
+    ),
+    "stock_at": lambda fx: (
+        lambda when=datagen.START_DATE + timedelta(days=fx.rng.randrange(90)): db_operations.stock_at(when)
+    ),
+    "list_stock_movements": lambda fx: (
+        lambda name=fx.rng.choice(fx.ingredients)[0]: db_operations.list_stock_movements(name, limit=100)
+    ),
+    "checkpoint_stock": lambda fx: (lambda: db_operations.checkpoint_stock()),
+    "rebuild_inventory": lambda fx: (lambda: db_operations.rebuild_inventory()),
+}
+
+
+# Cache, listener and transaction plumbing rather than data access
+NOT_BENCHMARKED = {
+    "add_change_listener", "batch_transaction", "cache_stats", "invalidate_caches", "retry_on_conflict",
+    "use_database",
+}
+
+
+def public_functions(module):
+    return sorted(
+        name for name, obj in inspect.getmembers(module, inspect.isfunction)
+        if not name.startswith("_") and obj.__module__ == module.__name__
+    )
+
+
+def run_scenario(name, fixture, counter, iterations, warmup):
+    make_call = SCENARIOS[name]
+    timings = []
+    queries = 0
+    sink = io.StringIO()
+    for i in range(warmup + iterations):
+        call = make_call(fixture)
+        before = counter.count
+        with contextlib.redirect_stdout(sink):
+            start = time.perf_counter()
+            call()
+            elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries += counter.count - before
+        sink.seek(0)
+        sink.truncate()
+
+    timings.sort()
+    return {
+        "calls": iterations,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "queries_per_call": round(queries / iterations, 2),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark db_operations against a synthetic database.")
+    datagen.add_generator_arguments(parser)
+    parser.add_argument("--iterations", type=int, default=100, help="Timed calls per function")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", nargs="+", metavar="FUNCTION", help="Benchmark only these functions")
+    parser.add_argument("--db", help="Where to build the database (default: a temporary file)")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"No benchmark scenario for: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "bench.db")
+        print(f"Generating database at {db_path} ...")
+        dataset = datagen.generate(db_path, **datagen.generator_kwargs(args))
+
+        engine = get_engine(f"sqlite:///{db_path}")
+        db_operations.engine = engine
+        db_operations.Session.configure(bind=engine)
+        counter = QueryCounter(engine)
+        fixture = Fixture(engine, args.seed)
+
+        results = {}
+        for name in names:
+            print(f"Running {name} ...")
+            results[name] = run_scenario(name, fixture, counter, args.iterations, args.warmup)
+        engine.dispose()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "dataset": dataset,
+        "iterations": args.iterations,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    rows = [
+        (name, r["p50_ms"], r["p95_ms"], r["p99_ms"], r["queries_per_call"])
+        for name, r in results.items()
+    ]
+    print()
+    print(format_table(rows, headers=["Function", "p50 ms", "p95 ms", "p99 ms", "Queries/call"]))
+
+    missing = set(public_functions(db_operations)) - set(SCENARIOS) - NOT_BENCHMARKED
+    if missing:
+        print(f"\nNo scenario for: {', '.join(sorted(missing))}")
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
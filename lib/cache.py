@@ -0,0 +1,85 @@
+"""
+Small in-process LRU cache with hit/miss counters.
+
+Used by db_operations to keep rarely changing catalog data (recipe list,
+ingredient map, recipe requirements) in memory between calls. Callers are
+responsible for invalidating entries when the underlying rows change.
+"""
+from collections import OrderedDict
+from threading import RLock
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, name, maxsize=1024):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def peek(self, key, default=None):
+        """Return the cached value without touching LRU order or counters."""
+        return self._data.get(key, default)
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader() to fill it on a miss.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
@@ -1,19 +1,19 @@
-from helpers import get_user_input, validate_positive_number, format_table, parse_date,confirm_action
-from db_operations import list_recipes, check_inventory, create_meal_plan, save_ingredient, save_recipe_with_ingredients, load_inventory
-from db_operations import (
-    list_recipes,
-    check_inventory,
-    save_ingredient,
-    create_meal_plan,
-    save_recipe_with_ingredients,
-    update_ingredient_quantity,
-    delete_ingredient,
-    delete_recipe
-)
-
-
-
-def main():
+import itertools
+import sys
+
+from helpers import get_user_input, validate_positive_number, format_table, parse_date,confirm_action, stream_table
+
+# plan_meal asks for a search term instead of listing more recipes than this
+MAX_LISTED_RECIPES = 20
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        # Scriptable mode: python cli.py <subcommand> ...
+        from commands import run
+        return run(argv)
+
     print("Welcome to Meal Mate!")
     while True:
         print("\nChoose an option:")
@@ -24,7 +24,9 @@ def main():
         print("5. Update Ingredient Quantity")
         print("6. Delete Ingredient")
         print("7. Delete Recipe")
-        print("8. Exit")
+        print("8. Shopping List")
+        print("9. Cookable Recipes")
+        print("10. Exit")
         choice = input("Enter choice: ").strip()
 
         if choice == '1':
@@ -42,6 +44,10 @@ def main():
         elif choice == '7':
             delete_recipe_cli()
         elif choice == '8':
+            shopping_list_cli()
+        elif choice == '9':
+            cookable_recipes_cli()
+        elif choice == '10':
             print("Goodbye!")
             break
         else:
@@ -49,6 +55,7 @@ def main():
 
 
 def add_ingredient():
+    from db_operations import save_ingredient
     name = get_user_input("Enter ingredient name: ")
     quantity_input = get_user_input("Enter quantity: ")
     qty = validate_positive_number(quantity_input)
@@ -58,11 +65,12 @@ def add_ingredient():
         quantity_input = get_user_input("Enter quantity: ")
         qty = validate_positive_number(quantity_input)
 
-    unit = get_user_input("Enter unit (e.g., grams, ml, pcs): ")
+    unit = get_user_input("Enter unit (e.g., grams, kg, ml, cup, pcs): ")
     save_ingredient(name, qty, unit)
     print(f"Ingredient '{name}' with quantity {qty} {unit} added to inventory.")
 
 def plan_meal():
+    from db_operations import check_inventory_bulk, create_meal_plans, list_recipes
     while True:
         meal_date_str = get_user_input("Enter meal date (YYYY-MM-DD): ")
         meal_date = parse_date(meal_date_str)
@@ -77,6 +85,15 @@ def plan_meal():
         print("No recipes available.")
         return
 
+    if len(recipes) > MAX_LISTED_RECIPES:
+        # Too many to list; narrow down with a search first
+        import search
+        term = get_user_input("Search recipes (part of the name): ")
+        recipes = search.search_recipes(term, limit=MAX_LISTED_RECIPES)
+        if not recipes:
+            print("No matching recipes.")
+            return
+
     print("\nAvailable recipes:")
     for idx, recipe in enumerate(recipes, 1):
         print(f"{idx}. {recipe['name']}")
@@ -98,12 +115,8 @@ def plan_meal():
             print(f"Recipe number {i+1} is invalid.")
             return
 
-    # Aggregate missing ingredients across all recipes
-    all_missing = []
-    for recipe in selected_recipes:
-        missing = check_inventory(recipe)
-        if missing:
-            all_missing.extend(missing)
+    # Aggregate missing ingredients across all recipes in one query
+    all_missing = check_inventory_bulk([recipe['id'] for recipe in selected_recipes])
 
     if all_missing:
         print("You are missing the following ingredients:")
@@ -112,23 +125,29 @@ def plan_meal():
     else:
         print("You have all ingredients needed for the selected recipes.")
 
-    for recipe in selected_recipes:
-        create_meal_plan(meal_date_str, recipe)
+    result = create_meal_plans([(meal_date, recipe['id']) for recipe in selected_recipes])
+    if result["skipped"]:
+        names = {recipe['id']: recipe['name'] for recipe in selected_recipes}
+        print("Already planned: " + ", ".join(names[entry['recipe_id']] for entry in result["skipped"]))
 
-    print(f"Meal plan for {meal_date_str} with {len(selected_recipes)} recipes saved.")
+    print(f"Meal plan for {meal_date_str} with {len(result['created'])} recipes saved.")
 
 
 def view_inventory():
-    inventory = load_inventory()
+    from db_operations import iter_inventory
+    # Streamed page by page; column widths come from the first rows
+    inventory = iter_inventory()
+    first = next(inventory, None)
 
-    if not inventory:
+    if first is None:
         print("Inventory is empty.")
         return
 
     print("\nCurrent Inventory:")
-    print(format_table(inventory, headers=["Ingredient", "Quantity", "Unit"]))
+    stream_table(itertools.chain([first], inventory), headers=["Ingredient", "Quantity", "Unit"])
 
 def add_recipe():
+    from db_operations import save_recipe_with_ingredients
     name = get_user_input("Enter recipe name: ")
     ingredients = []
 
@@ -145,7 +164,7 @@ def add_recipe():
             quantity_input = get_user_input("Enter quantity: ")
             qty = validate_positive_number(quantity_input)
 
-        unit = get_user_input("Enter unit (e.g., grams, ml, pcs): ")
+        unit = get_user_input("Enter unit (e.g., grams, kg, ml, cup, pcs): ")
         ingredients.append({"name": ing_name, "quantity": qty, "unit": unit})
 
     success = save_recipe_with_ingredients(name, ingredients)
@@ -155,6 +174,7 @@ def add_recipe():
         print("Failed to add recipe.")
         
 def update_ingredient_quantity_cli():
+    from db_operations import update_ingredient_quantity
     name = get_user_input("Enter ingredient name to update: ")
     quantity_input = get_user_input("Enter new quantity: ")
     qty = validate_positive_number(quantity_input)
@@ -170,6 +190,7 @@ def update_ingredient_quantity_cli():
 
 
 def delete_ingredient_cli():
+    from db_operations import delete_ingredient
     name = get_user_input("Enter ingredient name to delete: ")
     if confirm_action(f"Are you sure you want to delete ingredient '{name}'? This action cannot be undone (y/n): "):
         success = delete_ingredient(name)
@@ -180,6 +201,7 @@ def delete_ingredient_cli():
 
 
 def delete_recipe_cli():
+    from db_operations import delete_recipe
     name = get_user_input("Enter recipe name to delete: ")
     if confirm_action(f"Are you sure you want to delete recipe '{name}'? This action cannot be undone (y/n): "):
         success = delete_recipe(name)
@@ -187,5 +209,42 @@ def delete_recipe_cli():
             print(f"Recipe '{name}' deleted.")
     else:
         print("Deletion cancelled.")
+
+
+def shopping_list_cli():
+    from db_operations import shopping_list
+    while True:
+        start_str = get_user_input("Enter start date (YYYY-MM-DD): ")
+        end_str = get_user_input("Enter end date (YYYY-MM-DD): ")
+        start, end = parse_date(start_str), parse_date(end_str)
+        if start is None or end is None:
+            print("Invalid date format. Please enter date as YYYY-MM-DD.")
+        elif start > end:
+            print("Start date must not be after end date.")
+        else:
+            break
+
+    items = [item for item in shopping_list(start, end) if item["to_buy"] > 0]
+    if not items:
+        print(f"Nothing to buy for {start_str} to {end_str}.")
+        return
+
+    print(f"\nShopping list for {start_str} to {end_str}:")
+    rows = [(i["name"], i["needed"], i["in_stock"], i["to_buy"], i["unit"]) for i in items]
+    print(format_table(rows, headers=["Ingredient", "Needed", "In Stock", "To Buy", "Unit"]))
+
+
+def cookable_recipes_cli():
+    from feasibility import cookable_recipes
+    recipes = cookable_recipes()
+    if not recipes:
+        print("No recipes can be cooked with the current inventory.")
+        return
+
+    print("\nRecipes you can cook right now:")
+    rows = [(r["name"], r["servings"]) for r in recipes]
+    print(format_table(rows, headers=["Recipe", "Servings"]))
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,493 @@
+"""
+Non-interactive subcommands for the Meal Mate CLI.
+
+    python cli.py add-ingredient Flour 500 grams
+    python cli.py add-recipe Pancakes Flour:200:grams Milk:1.25:cup Eggs:2:pcs
+    python cli.py plan 2026-10-20 Pancakes "Tomato Soup" --format json
+    python cli.py inventory --format csv
+    python cli.py recipes --limit 50 --after-id 1200
+    python cli.py cook 2026-10-20
+    python cli.py search "tomatoe sou"
+    python cli.py stock-at 2026-09-01
+    python cli.py movements Flour --limit 20
+    python cli.py forecast --within 14
+    python cli.py batch ops.txt          # or: ... | python cli.py batch
+
+A batch file holds one subcommand per line (same syntax as above, '#' starts
+a comment). All lines run in one process and one database transaction; the
+first failure rolls everything back unless --keep-going is given.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import shlex
+import sys
+from datetime import datetime, timedelta
+
+from helpers import format_table, lazy_import, parse_date, stream_table, validate_positive_number
+
+# Loaded on the first database call, so --help and argument errors stay fast
+db_operations = lazy_import("db_operations")
+
+
+class CommandError(Exception):
+    pass
+
+
+def positive_number(value):
+    number = validate_positive_number(value)
+    if number is None:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a positive number")
+    return number
+
+
+def date_arg(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a date (YYYY-MM-DD)")
+    return parsed
+
+
+def when_arg(value):
+    parsed = parse_date(value)
+    if parsed is not None:
+        return parsed
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a date (YYYY-MM-DD) or time (YYYY-MM-DDTHH:MM)")
+
+
+def ingredient_arg(value):
+    try:
+        name, quantity, unit = value.rsplit(":", 2)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not NAME:QUANTITY:UNIT")
+    return {"name": name, "quantity": positive_number(quantity), "unit": unit}
+
+
+def _recipes_by_name(names):
+    recipes = {r["name"]: r for r in db_operations.list_recipes()}
+    unknown = [name for name in names if name not in recipes]
+    if unknown:
+        import search
+        hints = []
+        for name in unknown:
+            close = search.suggest("recipe", name)
+            hints.append(f"{name} (did you mean: {', '.join(close)}?)" if close else name)
+        raise CommandError(f"Unknown recipe(s): {', '.join(hints)}")
+    return [recipes[name] for name in names]
+
+
+def cmd_add_ingredient(args):
+    db_operations.save_ingredient(args.name, args.quantity, args.unit, args.density)
+    return [{"ingredient": args.name, "quantity": args.quantity, "unit": args.unit, "status": "added"}]
+
+
+def cmd_add_recipe(args):
+    if not db_operations.save_recipe_with_ingredients(args.name, args.ingredients):
+        raise CommandError(f"Could not add recipe '{args.name}'")
+    return [{"recipe": args.name, "ingredients": len(args.ingredients), "status": "added"}]
+
+
+def cmd_update_quantity(args):
+    if not db_operations.update_ingredient_quantity(args.name, args.quantity, args.expected_version, args.unit):
+        raise CommandError(f"Could not update ingredient '{args.name}'")
+    return [{"ingredient": args.name, "quantity": args.quantity, "status": "updated"}]
+
+
+def cmd_stock(args):
+    stock = db_operations.get_stock(args.name)
+    if stock is None:
+        raise CommandError(f"No stock recorded for '{args.name}'")
+    return [stock]
+
+
+def cmd_delete_ingredient(args):
+    if not db_operations.delete_ingredient(args.name):
+        raise CommandError(f"Ingredient '{args.name}' not found")
+    return [{"ingredient": args.name, "status": "deleted"}]
+
+
+def cmd_delete_recipe(args):
+    if not db_operations.delete_recipe(args.name):
+        raise CommandError(f"Recipe '{args.name}' not found")
+    return [{"recipe": args.name, "status": "deleted"}]
+
+
+def _page_or_stream(args, load_page, iterate):
+    # --limit asks for one keyset page; otherwise rows are streamed to the output
+    if args.limit is None:
+        return iterate()
+    page = load_page(args.after_id, args.limit)
+    if page["next_after_id"] is not None:
+        print(f"More rows: --after-id {page['next_after_id']}", file=sys.stderr)
+    return page["items"]
+
+
+def cmd_recipes(args):
+    return _page_or_stream(args, db_operations.list_recipes_page, db_operations.iter_recipes)
+
+
+def cmd_inventory(args):
+    return _page_or_stream(args, db_operations.load_inventory_page, db_operations.iter_inventory)
+
+
+def cmd_stock_at(args):
+    return db_operations.stock_at(args.when)
+
+
+def cmd_movements(args):
+    page = db_operations.list_stock_movements(args.name, args.after_id, args.limit)
+    if page["next_after_id"] is not None:
+        print(f"More rows: --after-id {page['next_after_id']}", file=sys.stderr)
+    return page["items"]
+
+
+def cmd_checkpoint(args):
+    checkpoint = db_operations.checkpoint_stock()
+    return [checkpoint] if checkpoint else []
+
+
+def cmd_rebuild_inventory(args):
+    return db_operations.rebuild_inventory()
+
+
+def cmd_forecast(args):
+    import forecast
+    kwargs = dict(as_of=args.as_of, method=args.method, alpha=args.alpha, window=args.window,
+                  history_days=args.history_days)
+    if args.within is not None:
+        return forecast.reorder_list(args.within, **kwargs)
+    return forecast.forecast(**kwargs)
+
+
+def cmd_plan(args):
+    recipes = _recipes_by_name(args.recipes)
+    # Every recipe is planned once per day, so check the stock for all days
+    rows = [
+        {"type": "missing", "name": m["name"], "needed": m["needed"], "have": m["have"], "unit": m["unit"]}
+        for m in db_operations.check_inventory_bulk([r["id"] for r in recipes], servings=args.days)
+    ]
+    names = {r["id"]: r["name"] for r in recipes}
+    dates = [args.date + timedelta(days=offset) for offset in range(args.days)]
+    result = db_operations.create_meal_plans([(d, r["id"]) for d in dates for r in recipes])
+    for status, key in (("planned", "created"), ("skipped", "skipped")):
+        rows.extend(
+            {"type": status, "name": names[entry["recipe_id"]], "date": entry["date"].isoformat()}
+            for entry in result[key]
+        )
+    return rows
+
+
+def _consumption_rows(result):
+    if result["ok"]:
+        return [{"status": "consumed", **c} for c in result["consumed"]]
+    rows = [{"status": "short", **s} for s in result["shortfalls"]]
+    raise CommandError(
+        "Not enough stock, nothing was consumed: "
+        + ", ".join(f"{r['name']} (need {r['needed']}, have {r['have']})" for r in rows)
+    )
+
+
+def cmd_cook(args):
+    return _consumption_rows(db_operations.cook(args.date, args.servings))
+
+
+def cmd_consume(args):
+    recipes = _recipes_by_name(args.recipes)
+    return _consumption_rows(db_operations.consume_recipes([r["id"] for r in recipes], args.servings))
+
+
+def cmd_shopping_list(args):
+    items = db_operations.shopping_list(args.start, args.end)
+    if not args.all:
+        items = [item for item in items if item["to_buy"] > 0]
+    return items
+
+
+def cmd_cookable(args):
+    from feasibility import cookable_recipes
+    return cookable_recipes()
+
+
+def cmd_search(args):
+    import search
+    if args.using:
+        return search.recipes_with_ingredients(args.using, match_all=not args.any, limit=args.limit)
+    if not args.query:
+        raise CommandError("Give a search term or --using INGREDIENT")
+    if args.ingredients:
+        return search.search_ingredients(args.query, args.limit)
+    return search.search_recipes(args.query, args.limit)
+
+
+def cmd_optimize(args):
+    import optimizer
+    result = optimizer.plan_meals(
+        args.start, args.end, args.meals_per_day, args.no_repeat_days, args.seed, args.dry_run
+    )
+    status = "planned" if not args.dry_run else "proposed"
+    saved = {(e["date"], e["recipe_id"]) for e in result["skipped"]}
+    rows = [
+        {"type": "skipped" if (p["date"], p["recipe_id"]) in saved else status,
+         "name": p["name"], "date": p["date"].isoformat(), "quantity": p["purchase"]}
+        for p in result["plan"]
+    ]
+    rows.extend({"type": "buy", "name": p["name"], "quantity": p["quantity"], "unit": p["unit"]}
+                for p in result["purchases"])
+    return rows
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--format", choices=["table", "json", "csv"], default="table",
+                        help="Output format (default: table)")
+    common.add_argument("--metrics", choices=["json", "prometheus"],
+                        help="Record per-function query counts and timings and print them to stderr")
+    parser = argparse.ArgumentParser(prog="cli.py", description="Meal Mate command line.")
+    sub = parser.add_subparsers(dest="command", metavar="COMMAND")
+    add_parser = lambda name, **kwargs: sub.add_parser(name, parents=[common], **kwargs)
+
+    p = add_parser("add-ingredient", help="Add stock for an ingredient")
+    p.add_argument("name")
+    p.add_argument("quantity", type=positive_number)
+    p.add_argument("unit", help="grams, kg, mg, oz, lb, ml, l, tsp, tbsp, cup or pcs")
+    p.add_argument("--density", type=positive_number, help="Grams per ml, to convert between volume and mass")
+    p.set_defaults(handler=cmd_add_ingredient)
+
+    p = add_parser("add-recipe", help="Add a recipe with NAME:QUANTITY:UNIT ingredients")
+    p.add_argument("name")
+    p.add_argument("ingredients", nargs="+", type=ingredient_arg, metavar="NAME:QUANTITY:UNIT")
+    p.set_defaults(handler=cmd_add_recipe)
+
+    p = add_parser("update-quantity", help="Set the stock of an ingredient")
+    p.add_argument("name")
+    p.add_argument("quantity", type=positive_number)
+    p.add_argument("--unit", help="Unit of QUANTITY (default: the ingredient's base unit)")
+    p.add_argument("--expected-version", type=int,
+                   help="Only update if the stock is still at this version (see 'stock')")
+    p.set_defaults(handler=cmd_update_quantity)
+
+    p = add_parser("stock", help="Show the stock and version of one ingredient")
+    p.add_argument("name")
+    p.set_defaults(handler=cmd_stock)
+
+    p = add_parser("delete-ingredient", help="Delete an ingredient and its stock")
+    p.add_argument("name")
+    p.set_defaults(handler=cmd_delete_ingredient)
+
+    p = add_parser("delete-recipe", help="Delete a recipe and its meal plans")
+    p.add_argument("name")
+    p.set_defaults(handler=cmd_delete_recipe)
+
+    for name, handler, help_text in (("recipes", cmd_recipes, "List recipes"),
+                                     ("inventory", cmd_inventory, "List inventory")):
+        p = add_parser(name, help=help_text)
+        p.add_argument("--limit", type=int, help="Show one page of this many rows")
+        p.add_argument("--after-id", type=int, help="Start the page after this id (printed with the previous page)")
+        p.set_defaults(handler=handler)
+
+    p = add_parser("stock-at", help="Stock per ingredient at the end of a date, or at a time")
+    p.add_argument("when", type=when_arg)
+    p.set_defaults(handler=cmd_stock_at)
+
+    p = add_parser("movements", help="Stock ledger entries, oldest first")
+    p.add_argument("name", nargs="?", help="Only this ingredient")
+    p.add_argument("--limit", type=int, default=100)
+    p.add_argument("--after-id", type=int, help="Start the page after this id (printed with the previous page)")
+    p.set_defaults(handler=cmd_movements)
+
+    p = add_parser("checkpoint", help="Snapshot stock so point-in-time queries start from here")
+    p.set_defaults(handler=cmd_checkpoint)
+
+    p = add_parser("rebuild-inventory", help="Correct inventory from the stock ledger; lists what changed")
+    p.set_defaults(handler=cmd_rebuild_inventory)
+
+    p = add_parser("forecast", help="When ingredients run out, from meal-plan history and upcoming plans")
+    p.add_argument("--within", type=int, help="Only ingredients that run out within this many days")
+    p.add_argument("--as-of", type=date_arg, help="Forecast from this date (default: today)")
+    p.add_argument("--method", choices=["ewma", "rolling"], default="ewma")
+    p.add_argument("--alpha", type=float, default=0.1, help="Smoothing factor for ewma (default: 0.1)")
+    p.add_argument("--window", type=int, default=28, help="Days averaged by rolling (default: 28)")
+    p.add_argument("--history-days", type=int, default=365, help="History used for the rate (default: 365)")
+    p.set_defaults(handler=cmd_forecast)
+
+    p = add_parser("plan", help="Plan recipes for a date")
+    p.add_argument("date", type=date_arg)
+    p.add_argument("recipes", nargs="+", metavar="RECIPE")
+    p.add_argument("--days", type=int, default=1, help="Repeat the plan for this many consecutive days")
+    p.set_defaults(handler=cmd_plan)
+
+    p = add_parser("cook", help="Use up stock for every recipe planned on a date")
+    p.add_argument("date", type=date_arg)
+    p.add_argument("--servings", type=positive_number, default=1)
+    p.set_defaults(handler=cmd_cook)
+
+    p = add_parser("consume", help="Use up stock for the given recipes")
+    p.add_argument("recipes", nargs="+", metavar="RECIPE")
+    p.add_argument("--servings", type=positive_number, default=1)
+    p.set_defaults(handler=cmd_consume)
+
+    p = add_parser("shopping-list", help="What to buy for a date range")
+    p.add_argument("start", type=date_arg)
+    p.add_argument("end", type=date_arg)
+    p.add_argument("--all", action="store_true", help="Include ingredients already in stock")
+    p.set_defaults(handler=cmd_shopping_list)
+
+    p = add_parser("search", help="Find recipes or ingredients by name, tolerating typos")
+    p.add_argument("query", nargs="?", default="", help="Name or name prefix")
+    p.add_argument("--ingredients", action="store_true", help="Search ingredient names instead of recipes")
+    p.add_argument("--using", nargs="+", metavar="INGREDIENT", help="Recipes that use these ingredients")
+    p.add_argument("--any", action="store_true", help="With --using, match recipes using any of them")
+    p.add_argument("--limit", type=int, default=10)
+    p.set_defaults(handler=cmd_search)
+
+    p = add_parser("optimize", help="Plan a date range so as little as possible has to be bought")
+    p.add_argument("start", type=date_arg)
+    p.add_argument("end", type=date_arg)
+    p.add_argument("--meals-per-day", type=int, default=1)
+    p.add_argument("--no-repeat-days", type=int, default=7, help="Days before a recipe may repeat (default: 7)")
+    p.add_argument("--seed", type=int, help="Seed for tie-breaking between equally good recipes")
+    p.add_argument("--dry-run", action="store_true", help="Show the plan without saving it")
+    p.set_defaults(handler=cmd_optimize)
+
+    p = add_parser("cookable", help="Recipes cookable from current stock")
+    p.set_defaults(handler=cmd_cookable)
+
+    p = add_parser("batch", help="Run subcommands from a file or stdin in one transaction")
+    p.add_argument("file", nargs="?", default="-")
+    p.add_argument("--keep-going", action="store_true", help="Keep going after a failed line")
+    # Dispatched by run(), which needs the parser to read each line
+
+    return parser
+
+
+def emit(rows, fmt, out=None):
+    out = out or sys.stdout
+    if not isinstance(rows, list):
+        _emit_stream(rows, fmt, out)
+    elif fmt == "json":
+        json.dump(rows, out, default=str)
+        out.write("\n")
+    elif fmt == "csv":
+        if rows:
+            fields = list(dict.fromkeys(key for row in rows for key in row))
+            writer = csv.DictWriter(out, fieldnames=fields, lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(rows)
+    elif rows:
+        headers = list(dict.fromkeys(key for row in rows for key in row))
+        table = [tuple(row.get(h, "") for h in headers) for row in rows]
+        print(format_table(table, headers=headers), file=out)
+    else:
+        print(format_table(rows), file=out)
+
+
+def _emit_stream(rows, fmt, out):
+    # Rows from a generator are written as they arrive, never collected
+    if fmt == "json":
+        out.write("[")
+        for i, row in enumerate(rows):
+            out.write((", " if i else "") + json.dumps(row, default=str))
+        out.write("]\n")
+    elif fmt == "csv":
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is not None:
+            writer = csv.DictWriter(out, fieldnames=list(first), lineterminator="\n")
+            writer.writeheader()
+            writer.writerow(first)
+            writer.writerows(rows)
+    elif not stream_table(rows, out=out):
+        print(format_table([]), file=out)
+
+
+def _database_error():
+    # Looked up only while handling an exception, so help never loads SQLAlchemy
+    from sqlalchemy.exc import SQLAlchemyError
+    return SQLAlchemyError
+
+
+def _message(error):
+    # Database errors carry the driver's message; the wrapped SQL is noise here
+    return str(getattr(error, "orig", None) or error)
+
+
+def _execute(args):
+    # db_operations reports progress with print(); keep stdout for results only
+    with contextlib.redirect_stdout(sys.stderr):
+        return args.handler(args)
+
+
+def _run_batch(parser, args):
+    stream = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+    results = []
+    failed = 0
+    committed = False
+    try:
+        with db_operations.batch_transaction():
+            for line_no, line in enumerate(stream, start=1):
+                tokens = shlex.split(line, comments=True)
+                if not tokens:
+                    continue
+                try:
+                    line_args = parser.parse_args(tokens)
+                    if line_args.command in (None, "batch"):
+                        raise CommandError("expected a subcommand")
+                    for row in _execute(line_args):
+                        results.append({"line": line_no, "command": tokens[0], "ok": True, **row})
+                except (CommandError, ValueError, SystemExit, _database_error()) as e:
+                    failed += 1
+                    message = _message(e) if not isinstance(e, SystemExit) else "invalid arguments"
+                    results.append({"line": line_no, "command": tokens[0], "ok": False, "error": message})
+                    if not args.keep_going:
+                        raise CommandError(f"line {line_no}: {message}")
+        committed = True
+    except (CommandError, _database_error()) as e:
+        print(f"Batch rolled back: {_message(e)}", file=sys.stderr)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    for result in results:
+        result["committed"] = committed
+    return results, failed
+
+
+def _dump_metrics(fmt):
+    import instrumentation
+    registry = instrumentation.registry
+    print(registry.to_json(indent=2) if fmt == "json" else registry.to_prometheus(), file=sys.stderr)
+
+
+def run(argv):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+
+    if args.metrics:
+        import instrumentation
+        instrumentation.enable()
+        try:
+            return _run_command(parser, args)
+        finally:
+            _dump_metrics(args.metrics)
+    return _run_command(parser, args)
+
+
+def _run_command(parser, args):
+    if args.command == "batch":
+        results, failed = _run_batch(parser, args)
+        emit(results, args.format)
+        return 1 if failed else 0
+
+    try:
+        # Streamed rows are only read while they are written, so emit fails here too
+        emit(_execute(args), args.format)
+    except (CommandError, ValueError, _database_error()) as e:
+        print(f"Error: {_message(e)}", file=sys.stderr)
+        return 1
+    return 0
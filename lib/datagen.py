@@ -0,0 +1,226 @@
+"""
+Reproducible synthetic data generator for large Meal Mate databases.
+
+Builds a fresh SQLite database with N ingredients, M recipes with a
+configurable ingredient fan-out, stock for a share of the ingredients and
+K days of meal plans, optionally with a stock ledger history of L movements.
+The same seed always produces the same database.
+
+Usage:
+    python datagen.py /tmp/bench.db --ingredients 5000 --recipes 50000 --days 365
+    python datagen.py /tmp/ledger.db --movements 10000000
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+from db.database import get_engine
+from db.models import (
+    ALLOWED_UNITS, Base, Ingredient, Inventory, MealPlan, Recipe, RecipeIngredient, StockCheckpoint, StockMovement,
+    StockSnapshot,
+)
+
+BATCH_SIZE = 10000
+START_DATE = date(2026, 1, 1)
+
+
+def _batched_insert(conn, model, rows):
+    for i in range(0, len(rows), BATCH_SIZE):
+        conn.execute(insert(model.__table__), rows[i:i + BATCH_SIZE])
+
+
+def _write_ledger(conn, inventory_rows, movements, days, start_date, rng, checkpoint_every):
+    """
+    Open the stock ledger with one movement per stocked ingredient, then add
+    `movements` random adds and consumptions spread evenly over the days,
+    checkpointing every checkpoint_every movements and at the end. Inventory
+    rows are set to the final balances. Rows are inserted as they are made.
+    Return (movements written, checkpoints written).
+    """
+    opening = {row["ingredient_id"]: row["quantity_in_stock"] for row in inventory_rows}
+    balances = dict.fromkeys(opening, 0.0)
+    stocked = list(opening)
+    opened_at = datetime.combine(start_date, datetime.min.time())
+    step = timedelta(days=days) / max(movements, 1)
+
+    def history():
+        for ingredient_id, quantity in opening.items():
+            yield ingredient_id, "add", quantity, opened_at
+        for i in range(1, movements + 1):
+            ingredient_id = rng.choice(stocked)
+            quantity = round(rng.uniform(1, 500), 1)
+            if rng.random() < 0.5 and balances[ingredient_id] >= quantity:
+                yield ingredient_id, "consume", -quantity, opened_at + step * i
+            else:
+                yield ingredient_id, "add", quantity, opened_at + step * i
+
+    batch = []
+    checkpoints = 0
+    movement_id = 0
+    created_at = opened_at
+
+    def checkpoint():
+        nonlocal checkpoints
+        _batched_insert(conn, StockMovement, batch)
+        batch.clear()
+        checkpoints += 1
+        conn.execute(insert(StockCheckpoint.__table__), [
+            {"id": checkpoints, "movement_id": movement_id, "as_of": created_at}
+        ])
+        _batched_insert(conn, StockSnapshot, [
+            {"checkpoint_id": checkpoints, "ingredient_id": ingredient_id, "quantity": quantity}
+            for ingredient_id, quantity in balances.items()
+            if quantity
+        ])
+
+    for ingredient_id, kind, quantity, created_at in history():
+        movement_id += 1
+        balances[ingredient_id] += quantity
+        batch.append({
+            "id": movement_id, "ingredient_id": ingredient_id, "kind": kind,
+            "quantity": quantity, "created_at": created_at,
+        })
+        if movement_id % checkpoint_every == 0:
+            checkpoint()
+        elif len(batch) >= BATCH_SIZE:
+            _batched_insert(conn, StockMovement, batch)
+            batch.clear()
+    if movement_id and movement_id % checkpoint_every:
+        checkpoint()
+
+    for row in inventory_rows:
+        row["quantity_in_stock"] = round(balances[row["ingredient_id"]], 6)
+    return movement_id, checkpoints
+
+
+def generate(
+    db_path,
+    ingredients=1000,
+    recipes=5000,
+    fan_out=(3, 10),
+    days=90,
+    plans_per_day=3,
+    stock_ratio=0.8,
+    seed=42,
+    start_date=START_DATE,
+    movements=0,
+    checkpoint_every=10000,
+):
+    """
+    Create db_path from scratch and fill it with synthetic data.
+    Return a dict describing what was generated.
+    """
+    if ingredients < fan_out[1]:
+        raise ValueError("Need at least as many ingredients as the maximum fan-out")
+    if recipes < plans_per_day:
+        raise ValueError("Need at least as many recipes as plans per day")
+
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    rng = random.Random(seed)
+    units = sorted(ALLOWED_UNITS)
+    engine = get_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+
+    ingredient_rows = [
+        {"id": i, "name": f"Ingredient {i:06d}", "unit": rng.choice(units)}
+        for i in range(1, ingredients + 1)
+    ]
+    inventory_rows = [
+        {
+            "ingredient_id": ing["id"],
+            "quantity_in_stock": round(rng.uniform(0, 2000), 1),
+            "unit": ing["unit"],
+        }
+        for ing in ingredient_rows
+        if rng.random() < stock_ratio
+    ]
+    recipe_rows = [{"id": i, "name": f"Recipe {i:06d}"} for i in range(1, recipes + 1)]
+
+    link_rows = []
+    ingredient_ids = range(1, ingredients + 1)
+    for recipe in recipe_rows:
+        for ingredient_id in rng.sample(ingredient_ids, rng.randint(*fan_out)):
+            link_rows.append({
+                "recipe_id": recipe["id"],
+                "ingredient_id": ingredient_id,
+                "quantity_needed": round(rng.uniform(1, 500), 1),
+                "unit": ingredient_rows[ingredient_id - 1]["unit"],
+            })
+
+    plan_rows = []
+    recipe_ids = range(1, recipes + 1)
+    for day in range(days):
+        plan_date = start_date + timedelta(days=day)
+        for recipe_id in rng.sample(recipe_ids, plans_per_day):
+            plan_rows.append({"date": plan_date, "recipe_id": recipe_id})
+
+    with engine.begin() as conn:
+        _batched_insert(conn, Ingredient, ingredient_rows)
+        ledger_rows, checkpoints = _write_ledger(
+            conn, inventory_rows, movements, days, start_date, rng, checkpoint_every
+        )
+        _batched_insert(conn, Inventory, inventory_rows)
+        _batched_insert(conn, Recipe, recipe_rows)
+        _batched_insert(conn, RecipeIngredient, link_rows)
+        _batched_insert(conn, MealPlan, plan_rows)
+    engine.dispose()
+
+    return {
+        "ingredients": ingredients,
+        "recipes": recipes,
+        "fan_out": list(fan_out),
+        "recipe_ingredients": len(link_rows),
+        "inventory": len(inventory_rows),
+        "days": days,
+        "meal_plans": len(plan_rows),
+        "stock_movements": ledger_rows,
+        "stock_checkpoints": checkpoints,
+        "seed": seed,
+    }
+
+
+def add_generator_arguments(parser):
+    parser.add_argument("--ingredients", type=int, default=1000, help="Number of ingredients (N)")
+    parser.add_argument("--recipes", type=int, default=5000, help="Number of recipes (M)")
+    parser.add_argument("--fan-out", type=int, nargs=2, default=[3, 10], metavar=("MIN", "MAX"),
+                        help="Ingredients per recipe")
+    parser.add_argument("--days", type=int, default=90, help="Days of meal plans (K)")
+    parser.add_argument("--plans-per-day", type=int, default=3)
+    parser.add_argument("--stock-ratio", type=float, default=0.8, help="Share of ingredients with stock")
+    parser.add_argument("--movements", type=int, default=0,
+                        help="Random stock movements on top of the opening ones (L)")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def generator_kwargs(args):
+    return {
+        "ingredients": args.ingredients,
+        "recipes": args.recipes,
+        "fan_out": tuple(args.fan_out),
+        "days": args.days,
+        "plans_per_day": args.plans_per_day,
+        "stock_ratio": args.stock_ratio,
+        "seed": args.seed,
+        "movements": args.movements,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Meal Mate database.")
+    parser.add_argument("db_path", help="SQLite file to create (overwritten if it exists)")
+    add_generator_arguments(parser)
+    args = parser.parse_args(argv)
+
+    summary = generate(args.db_path, **generator_kwargs(args))
+    print(", ".join(f"{key}={value}" for key, value in summary.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Shared engine factory for every module that talks to the database.
+
+Settings are resolved in this order:
+    1. MEAL_MATE_<SETTING> environment variables (e.g. MEAL_MATE_DATABASE_URL, MEAL_MATE_BUSY_TIMEOUT)
+    2. the [database] section of the file named by MEAL_MATE_CONFIG, or meal_mate.ini next to this module
+    3. the defaults below
+
+SQLite connections get WAL journaling, relaxed fsync, a larger page cache,
+memory-mapped I/O, foreign keys and a busy timeout applied on connect, so
+several worker processes can share one database file.
+"""
+import configparser
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+DB_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_SETTINGS = {
+    "database_url": f"sqlite:///{os.path.join(DB_DIR, 'meal_mate.db')}",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": "-64000",  # negative means KiB, so 64 MB
+    "mmap_size": "268435456",
+    "busy_timeout": "5000",  # milliseconds
+    "foreign_keys": "ON",
+    "temp_store": "MEMORY",
+    "pool_size": "5",
+    "max_overflow": "10",
+    "pool_timeout": "30",
+    "pool_recycle": "3600",
+}
+
+_engines = {}
+_async_engines = {}
+
+
+def load_settings():
+    """
+    Return the effective settings as a dict of strings.
+    """
+    settings = dict(DEFAULT_SETTINGS)
+
+    config_path = os.environ.get("MEAL_MATE_CONFIG", os.path.join(DB_DIR, "meal_mate.ini"))
+    if os.path.exists(config_path):
+        parser = configparser.ConfigParser()
+        parser.read(config_path)
+        if parser.has_section("database"):
+            for key, value in parser.items("database"):
+                # Accept "url" as shorthand for database_url in config files
+                settings["database_url" if key == "url" else key] = value
+
+    for key in settings:
+        env_value = os.environ.get(f"MEAL_MATE_{key.upper()}")
+        if env_value is not None:
+            settings[key] = env_value
+
+    return settings
+
+
+def database_url():
+    return load_settings()["database_url"]
+
+
+def _apply_sqlite_pragmas(engine, settings, in_memory):
+    pragmas = [
+        ("busy_timeout", settings["busy_timeout"]),
+        ("foreign_keys", settings["foreign_keys"]),
+        ("synchronous", settings["synchronous"]),
+        ("cache_size", settings["cache_size"]),
+        ("mmap_size", settings["mmap_size"]),
+        ("temp_store", settings["temp_store"]),
+    ]
+    if not in_memory:
+        pragmas.insert(0, ("journal_mode", settings["journal_mode"]))
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself so SAVEPOINTs work (pysqlite's
+        # implicit transaction handling breaks them)
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def do_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def _engine_kwargs(parsed, settings, in_memory):
+    kwargs = {}
+    if parsed.get_backend_name() == "sqlite":
+        # sqlite3's own timeout is in seconds and covers the connect itself
+        kwargs["connect_args"] = {"timeout": int(settings["busy_timeout"]) / 1000}
+    if not in_memory:
+        kwargs.update(
+            pool_size=int(settings["pool_size"]),
+            max_overflow=int(settings["max_overflow"]),
+            pool_timeout=float(settings["pool_timeout"]),
+            pool_recycle=int(settings["pool_recycle"]),
+        )
+    return kwargs
+
+
+def get_engine(url=None):
+    """
+    Return the engine for url (default: the configured database), creating it
+    on first use. Engines are cached so each process holds one pool per database.
+    """
+    settings = load_settings()
+    url = url or settings["database_url"]
+    if url in _engines:
+        return _engines[url]
+
+    parsed = make_url(url)
+    in_memory = parsed.database in (None, "", ":memory:")
+    engine = create_engine(url, **_engine_kwargs(parsed, settings, in_memory))
+    if parsed.get_backend_name() == "sqlite":
+        _apply_sqlite_pragmas(engine, settings, in_memory)
+
+    _engines[url] = engine
+    return engine
+
+
+def tenant_url(path):
+    """The database URL for one tenant's (household's) SQLite file."""
+    return f"sqlite:///{os.path.abspath(path)}"
+
+
+def dispose_engine(url):
+    """Close and forget the cached engine for url, e.g. when done with a tenant."""
+    engine = _engines.pop(url, None)
+    if engine is not None:
+        engine.dispose()
+
+
+def dispose_engines(close=True):
+    """
+    Close every cached engine's pool, e.g. after forking worker processes.
+    In a forked child pass close=False: the pooled connections belong to the
+    parent and are dropped without being closed.
+    """
+    for engine in _engines.values():
+        engine.dispose(close=close)
+    _engines.clear()
+
+
+def async_database_url(url=None):
+    """The asyncio form of url: plain sqlite:// URLs switch to the aiosqlite driver."""
+    parsed = make_url(url or database_url())
+    if parsed.get_backend_name() == "sqlite" and parsed.get_driver_name() == "pysqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+def get_async_engine(url=None):
+    """
+    Return the AsyncEngine for url (default: the configured database) with
+    the same pool settings and pragmas as get_engine(). Cached per URL; one
+    engine serves every coroutine in the process.
+    """
+    # Imported here so the sync code paths do not need greenlet installed
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    settings = load_settings()
+    url = async_database_url(url or settings["database_url"])
+    if url in _async_engines:
+        return _async_engines[url]
+
+    parsed = make_url(url)
+    in_memory = parsed.database in (None, "", ":memory:")
+    engine = create_async_engine(url, **_engine_kwargs(parsed, settings, in_memory))
+    if parsed.get_backend_name() == "sqlite":
+        # Pool events live on the sync engine that AsyncEngine wraps
+        _apply_sqlite_pragmas(engine.sync_engine, settings, in_memory)
+
+    _async_engines[url] = engine
+    return engine
+
+
+async def dispose_async_engines():
+    for engine in _async_engines.values():
+        await engine.dispose()
+    _async_engines.clear()
@@ -0,0 +1,369 @@
+"""
+Streaming bulk loader for ingredients and recipes.
+
+Reads CSV or JSON Lines in chunks and writes ingredients, recipes and
+recipe_ingredients with executemany batches, one transaction per chunk.
+
+CSV columns: recipe, ingredient, quantity, unit, and optionally density
+JSON Lines: either the same flat keys per line, or one recipe per line as
+    {"recipe": "Pancakes", "ingredients": [{"name": "Flour", "quantity": 200, "unit": "grams"}]}
+
+Rows with an empty recipe only create the ingredient. Quantities in any
+known unit (kg, cup, tbsp, ...) are converted to the ingredient's base unit;
+density (grams per ml) is only used when a row creates the ingredient.
+A new recipe is imported whole or not at all: when one of its rows is
+rejected, its other rows are reported as skipped, even rows an earlier
+chunk already loaded.
+
+Usage:
+    python import_data.py recipes.csv
+    python import_data.py - --format jsonl < recipes.jsonl
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+
+from sqlalchemy import delete, insert, select
+from database import get_engine
+from models import Ingredient, Recipe, RecipeIngredient
+import units
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def read_csv_rows(stream):
+    reader = csv.DictReader(stream)
+    for line_no, row in enumerate(reader, start=2):
+        yield line_no, row
+
+
+def read_jsonl_rows(stream):
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, {"_error": f"Invalid JSON: {e}"}
+            continue
+        if not isinstance(record, dict):
+            yield line_no, record
+        elif "ingredients" in record:
+            ingredients = record["ingredients"] or []
+            if not isinstance(ingredients, list):
+                yield line_no, {"recipe": record.get("recipe"), "_error": "'ingredients' must be a list"}
+                continue
+            for ing in ingredients:
+                if not isinstance(ing, dict):
+                    yield line_no, {"recipe": record.get("recipe"), "_error": "Ingredient entry is not an object"}
+                    continue
+                yield line_no, {
+                    "recipe": record.get("recipe"),
+                    "ingredient": ing.get("name"),
+                    "quantity": ing.get("quantity"),
+                    "unit": ing.get("unit"),
+                    "density": ing.get("density"),
+                }
+        else:
+            yield line_no, record
+
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"'{key}' must be a string")
+    return value.strip()
+
+
+def _recipe_of(row):
+    """The recipe a raw row belongs to, or None; never raises."""
+    try:
+        return _text(row, "recipe") or None
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_row(row):
+    """
+    Validate a raw row and return (recipe, ingredient, quantity, unit, density).
+    Raise ValueError with a readable message if the row is invalid.
+    """
+    if not isinstance(row, dict):
+        raise ValueError(f"Expected a JSON object, got {type(row).__name__}")
+    if "_error" in row:
+        raise ValueError(row["_error"])
+
+    recipe = _text(row, "recipe") or None
+    ingredient = _text(row, "ingredient")
+    if not ingredient:
+        raise ValueError("Ingredient name is required")
+    try:
+        unit = units.normalize(row.get("unit"))
+    except units.UnitError:
+        raise ValueError(f"Invalid unit '{row.get('unit')}' for ingredient {ingredient}")
+
+    density = row.get("density")
+    if density in (None, ""):
+        density = None
+    else:
+        try:
+            density = float(density)
+        except (TypeError, ValueError):
+            density = -1
+        if density <= 0:
+            raise ValueError(f"Invalid density '{row.get('density')}' for ingredient {ingredient}")
+
+    quantity = None
+    if recipe is not None:
+        try:
+            quantity = float(row.get("quantity"))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid quantity '{row.get('quantity')}' for ingredient {ingredient}")
+        if quantity <= 0:
+            raise ValueError(f"Quantity must be positive for ingredient {ingredient}")
+
+    return recipe, ingredient, quantity, unit, density
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Importer:
+    """
+    Holds the in-memory name->id maps shared by all chunks of one load.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.errors = []
+        self.rows_loaded = 0
+
+        with engine.connect() as conn:
+            rows = conn.execute(select(Ingredient.name, Ingredient.id, Ingredient.unit, Ingredient.density)).all()
+            self.ingredient_ids = {name: ingredient_id for name, ingredient_id, _, _ in rows}
+            # name -> (base unit, density) for converting quantities
+            self.ingredient_units = {name: (unit, density) for name, _, unit, density in rows}
+            self.recipe_ids = dict(conn.execute(select(Recipe.name, Recipe.id)).all())
+        # Recipes present before the load are never extended, matching save_recipe_with_ingredients
+        self.existing_recipes = set(self.recipe_ids)
+        # recipe -> {ingredient: line} for the rows this load committed
+        self.recipe_rows = {}
+        # recipe -> first rejected line, for new recipes skipped whole
+        self.failed_recipes = {}
+
+    def load_chunk(self, chunk):
+        parsed = []
+        rejected = []
+        failed = {}
+        for line_no, row in chunk:
+            try:
+                parsed.append((line_no,) + parse_row(row))
+            except ValueError as e:
+                self.errors.append((line_no, str(e)))
+                recipe = _recipe_of(row)
+                if recipe is not None:
+                    failed.setdefault(recipe, line_no)
+
+        # Check every link by name first, so a recipe with a bad row is never inserted
+        new_ingredients = {}
+        checked = []
+        link_keys = set()
+        for line_no, recipe, ingredient, quantity, unit, density in parsed:
+            if ingredient not in self.ingredient_ids and ingredient not in new_ingredients:
+                new_ingredients[ingredient] = (units.base_unit(unit), density)
+            if recipe is None:
+                continue
+            if recipe in self.existing_recipes:
+                rejected.append((line_no, f"Recipe '{recipe}' already exists."))
+                continue
+            if ingredient in self.recipe_rows.get(recipe, ()) or (recipe, ingredient) in link_keys:
+                rejected.append((line_no, f"Duplicate ingredient {ingredient} for recipe '{recipe}'"))
+                failed.setdefault(recipe, line_no)
+                continue
+            base_unit, density = self.ingredient_units.get(ingredient) or new_ingredients[ingredient]
+            try:
+                quantity_needed = units.convert(quantity, unit, base_unit, density)
+            except units.UnitError as e:
+                rejected.append((line_no, f"{e} for ingredient {ingredient}"))
+                failed.setdefault(recipe, line_no)
+                continue
+            link_keys.add((recipe, ingredient))
+            checked.append((line_no, recipe, ingredient, quantity, unit, base_unit, quantity_needed))
+
+        failed = {
+            recipe: line_no for recipe, line_no in failed.items()
+            if recipe not in self.existing_recipes and recipe not in self.failed_recipes
+        }
+        skipped = {**failed, **self.failed_recipes}
+        kept = []
+        for line_no, recipe, ingredient, *rest in checked:
+            if recipe in skipped:
+                rejected.append((line_no, _skipped(recipe, skipped[recipe])))
+            else:
+                kept.append((line_no, recipe, ingredient, *rest))
+        new_recipes = list(dict.fromkeys(r for _, r, *_ in kept if r not in self.recipe_ids))
+        # Recipes earlier chunks of this load inserted are taken out again
+        discarded = [recipe for recipe in failed if recipe in self.recipe_ids]
+
+        try:
+            with self.engine.begin() as conn:
+                ingredient_ids = self._insert_names(
+                    conn, Ingredient,
+                    [{"name": n, "unit": u, "density": d} for n, (u, d) in new_ingredients.items()],
+                )
+                recipe_ids = self._insert_names(conn, Recipe, [{"name": n} for n in new_recipes])
+                self._delete_recipes(conn, discarded)
+
+                links = []
+                for line_no, recipe, ingredient, quantity, unit, base_unit, quantity_needed in kept:
+                    entered = unit != base_unit
+                    links.append({
+                        "recipe_id": self.recipe_ids.get(recipe) or recipe_ids[recipe],
+                        "ingredient_id": self.ingredient_ids.get(ingredient) or ingredient_ids[ingredient],
+                        "quantity_needed": quantity_needed,
+                        "unit": base_unit,
+                        "quantity_entered": quantity if entered else None,
+                        "unit_entered": unit if entered else None,
+                    })
+
+                if links:
+                    conn.execute(insert(RecipeIngredient.__table__), links)
+        except Exception as e:
+            for line_no, *_ in parsed:
+                self.errors.append((line_no, f"Chunk rolled back: {e}"))
+            # These recipes just lost rows, so none of them can be imported,
+            # including the ones earlier chunks started
+            touched = {
+                recipe: line_no for line_no, recipe, *_ in reversed(parsed)
+                if recipe is not None and recipe not in self.existing_recipes
+            }
+            started = {recipe: line_no for recipe, line_no in touched.items() if recipe in self.recipe_rows}
+            try:
+                with self.engine.begin() as conn:
+                    self._delete_recipes(conn, started)
+            except Exception as e:
+                self.errors.append((chunk[0][0], f"Could not remove partly loaded recipes: {e}"))
+            else:
+                self.errors.extend(self._forget(started))
+            for recipe, line_no in touched.items():
+                self.failed_recipes.setdefault(recipe, line_no)
+            return 0
+
+        # Only publish ids once the chunk has committed
+        self.ingredient_ids.update(ingredient_ids)
+        self.ingredient_units.update(new_ingredients)
+        self.recipe_ids.update(recipe_ids)
+        for line_no, recipe, ingredient, *_ in kept:
+            self.recipe_rows.setdefault(recipe, {})[ingredient] = line_no
+        loaded = len(parsed) - len(rejected)
+        self.rows_loaded += loaded
+        self.errors.extend(rejected)
+        self.errors.extend(self._forget({recipe: failed[recipe] for recipe in discarded}))
+        return loaded
+
+    def _forget(self, failed):
+        """
+        Drop recipes whose rows were deleted after a failure from the maps
+        and return errors for the rows earlier chunks had loaded.
+        """
+        errors = []
+        for recipe, failed_line in failed.items():
+            self.failed_recipes[recipe] = failed_line
+            del self.recipe_ids[recipe]
+            earlier = self.recipe_rows.pop(recipe).values()
+            errors.extend((line_no, _skipped(recipe, failed_line)) for line_no in earlier)
+            self.rows_loaded -= len(earlier)
+        return errors
+
+    def _delete_recipes(self, conn, names):
+        recipe_ids = [self.recipe_ids[name] for name in names]
+        if recipe_ids:
+            conn.execute(delete(RecipeIngredient.__table__).where(RecipeIngredient.recipe_id.in_(recipe_ids)))
+            conn.execute(delete(Recipe.__table__).where(Recipe.id.in_(recipe_ids)))
+
+    @staticmethod
+    def _insert_names(conn, model, values):
+        if not values:
+            return {}
+        conn.execute(insert(model.__table__), values)
+        names = [v["name"] for v in values]
+        return dict(conn.execute(select(model.name, model.id).where(model.name.in_(names))).all())
+
+
+def _skipped(recipe, line_no):
+    return f"Recipe '{recipe}' skipped: line {line_no} was rejected"
+
+
+def run_import(engine, stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE, out=sys.stdout):
+    reader = read_csv_rows if fmt == "csv" else read_jsonl_rows
+    importer = Importer(engine)
+    start = time.perf_counter()
+    rows_seen = 0
+
+    for chunk_no, chunk in enumerate(chunked(reader(stream), chunk_size), start=1):
+        importer.load_chunk(chunk)
+        rows_seen += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(f"Chunk {chunk_no}: {rows_seen} rows read, {rows_seen / elapsed:.0f} rows/s", file=out)
+
+    elapsed = time.perf_counter() - start
+    rate = rows_seen / elapsed if elapsed else 0
+    print(
+        f"Imported {importer.rows_loaded} of {rows_seen} rows in {elapsed:.2f}s "
+        f"({rate:.0f} rows/s), {len(importer.errors)} errors.",
+        file=out,
+    )
+    return importer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import recipes and ingredients.")
+    parser.add_argument("path", help="CSV or JSON Lines file, or '-' for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from file extension)")
+    parser.add_argument("--db", help="Database URL (default: the configured database)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--errors", help="Write per-row errors to this CSV file")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        if args.path == "-":
+            parser.error("--format is required when reading from stdin")
+        fmt = "csv" if args.path.lower().endswith(".csv") else "jsonl"
+
+    engine = get_engine(args.db)
+    if args.path == "-":
+        importer = run_import(engine, sys.stdin, fmt, args.chunk_size)
+    else:
+        with open(args.path, newline="", encoding="utf-8") as stream:
+            importer = run_import(engine, stream, fmt, args.chunk_size)
+
+    if args.errors:
+        with open(args.errors, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["line", "error"])
+            writer.writerows(importer.errors)
+    else:
+        for line_no, message in importer.errors[:20]:
+            print(f"Line {line_no}: {message}", file=sys.stderr)
+        if len(importer.errors) > 20:
+            print(f"... {len(importer.errors) - 20} more errors", file=sys.stderr)
+
+    return 0 if not importer.errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,6 +20,10 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 from models import Base
 target_metadata = Base.metadata
+
+# Use the same database as the application (MEAL_MATE_DATABASE_URL / meal_mate.ini)
+from database import database_url
+config.set_main_option("sqlalchemy.url", database_url())
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
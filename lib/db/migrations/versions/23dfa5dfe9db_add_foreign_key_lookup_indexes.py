@@ -0,0 +1,31 @@
+"""Add indexes for foreign key lookups
+
+Revision ID: 23dfa5dfe9db
+Revises: 67b122e7b217
+Create Date: 2026-10-18 09:12:41.208377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '23dfa5dfe9db'
+down_revision: Union[str, None] = '67b122e7b217'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Per-ingredient lookups (delete_ingredient, FK checks) scanned recipe_ingredients
+    op.create_index('ix_recipe_ingredients_ingredient_recipe', 'recipe_ingredients', ['ingredient_id', 'recipe_id', 'quantity_needed'])
+    # Per-recipe meal plan lookups (delete_recipe, FK checks) scanned meal_plans.
+    # Per-date lookups are already served by the (date, recipe_id) unique index.
+    op.create_index('ix_meal_plans_recipe_date', 'meal_plans', ['recipe_id', 'date'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_meal_plans_recipe_date', table_name='meal_plans')
+    op.drop_index('ix_recipe_ingredients_ingredient_recipe', table_name='recipe_ingredients')
@@ -0,0 +1,29 @@
+"""Add version column to inventory for optimistic locking
+
+Revision ID: 5b0e7c3a91d4
+Revises: 23dfa5dfe9db
+Create Date: 2026-10-18 11:02:17.534910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0e7c3a91d4'
+down_revision: Union[str, None] = '23dfa5dfe9db'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows start at version 1, matching new rows
+    with op.batch_alter_table('inventory') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('inventory') as batch_op:
+        batch_op.drop_column('version')
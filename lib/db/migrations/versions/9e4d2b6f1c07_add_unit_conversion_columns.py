@@ -0,0 +1,35 @@
+"""Add ingredient density and entered recipe quantities for unit conversion
+
+Revision ID: 9e4d2b6f1c07
+Revises: 5b0e7c3a91d4
+Create Date: 2026-10-18 14:26:53.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4d2b6f1c07'
+down_revision: Union[str, None] = '5b0e7c3a91d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing quantities are already in base units, so no data changes
+    with op.batch_alter_table('ingredients') as batch_op:
+        batch_op.add_column(sa.Column('density', sa.Float(), nullable=True))
+    with op.batch_alter_table('recipe_ingredients') as batch_op:
+        batch_op.add_column(sa.Column('quantity_entered', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('unit_entered', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('recipe_ingredients') as batch_op:
+        batch_op.drop_column('unit_entered')
+        batch_op.drop_column('quantity_entered')
+    with op.batch_alter_table('ingredients') as batch_op:
+        batch_op.drop_column('density')
@@ -0,0 +1,78 @@
+"""Add stock movement ledger with checkpoints and snapshots
+
+Revision ID: c41f8a2e6d93
+Revises: 9e4d2b6f1c07
+Create Date: 2026-10-18 16:40:12.904317
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f8a2e6d93'
+down_revision: Union[str, None] = '9e4d2b6f1c07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stock_movements',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ingredient_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_stock_movements_ingredient_id', 'stock_movements', ['ingredient_id', 'id'])
+    op.create_table(
+        'stock_checkpoints',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('movement_id', sa.Integer(), nullable=False),
+        sa.Column('as_of', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('movement_id'),
+    )
+    op.create_index('ix_stock_checkpoints_as_of', 'stock_checkpoints', ['as_of'])
+    op.create_table(
+        'stock_snapshots',
+        sa.Column('checkpoint_id', sa.Integer(), nullable=False),
+        sa.Column('ingredient_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['checkpoint_id'], ['stock_checkpoints.id']),
+        sa.PrimaryKeyConstraint('checkpoint_id', 'ingredient_id'),
+    )
+
+    # Open the ledger with today's stock, and checkpoint it
+    now = datetime.now()
+    op.execute(
+        sa.text(
+            "INSERT INTO stock_movements (ingredient_id, kind, quantity, created_at) "
+            "SELECT ingredient_id, 'adjust', quantity_in_stock, :now FROM inventory "
+            "WHERE quantity_in_stock != 0 ORDER BY ingredient_id"
+        ).bindparams(now=now)
+    )
+    op.execute(
+        sa.text(
+            "INSERT INTO stock_checkpoints (movement_id, as_of) "
+            "SELECT max(id), :now FROM stock_movements HAVING max(id) IS NOT NULL"
+        ).bindparams(now=now)
+    )
+    op.execute(
+        "INSERT INTO stock_snapshots (checkpoint_id, ingredient_id, quantity) "
+        "SELECT (SELECT max(id) FROM stock_checkpoints), ingredient_id, quantity FROM stock_movements "
+        "WHERE EXISTS (SELECT 1 FROM stock_checkpoints)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stock_snapshots')
+    op.drop_index('ix_stock_checkpoints_as_of', table_name='stock_checkpoints')
+    op.drop_table('stock_checkpoints')
+    op.drop_index('ix_stock_movements_ingredient_id', table_name='stock_movements')
+    op.drop_table('stock_movements')
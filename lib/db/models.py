@@ -1,16 +1,22 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint, Date
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint, Date, DateTime, Index
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+# Base units quantities are stored in; other units are converted on write (see units.py)
 ALLOWED_UNITS = {"grams", "ml", "pcs"}
 
+# What caused a stock movement
+MOVEMENT_KINDS = {"add", "consume", "adjust", "delete"}
+
 class Ingredient(Base):
     __tablename__ = "ingredients"
     id = Column(Integer, primary_key=True)
     name = Column(String, unique=True, nullable=False)
     unit = Column(String, nullable=False)
+    # Grams per ml, used to convert between volume and mass units
+    density = Column(Float)
 
     inventory = relationship("Inventory", uselist=False, back_populates="ingredient")
     recipe_ingredients = relationship("RecipeIngredient", back_populates="ingredient")
@@ -21,6 +27,12 @@ class Ingredient(Base):
             raise ValueError(f"Invalid unit '{unit}'. Allowed units: {ALLOWED_UNITS}")
         return unit
 
+    @validates('density')
+    def validate_density(self, key, density):
+        if density is not None and density <= 0:
+            raise ValueError("Density must be positive")
+        return density
+
     def __repr__(self):
         return f"<Ingredient(name={self.name}, unit={self.unit})>"
 
@@ -31,9 +43,13 @@ class Inventory(Base):
     ingredient_id = Column(Integer, ForeignKey("ingredients.id"), unique=True, nullable=False)
     quantity_in_stock = Column(Float, nullable=False)
     unit = Column(String, nullable=False)
+    version = Column(Integer, nullable=False, server_default="1")
 
     ingredient = relationship("Ingredient", back_populates="inventory")
 
+    # Optimistic concurrency: ORM updates check and bump the version
+    __mapper_args__ = {"version_id_col": version}
+
     @validates('quantity_in_stock')
     def validate_quantity(self, key, quantity):
         if quantity < 0:
@@ -68,13 +84,20 @@ class RecipeIngredient(Base):
     id = Column(Integer, primary_key=True)
     recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False)
     ingredient_id = Column(Integer, ForeignKey("ingredients.id"), nullable=False)
+    # Always in the ingredient's base unit, so it compares directly with stock
     quantity_needed = Column(Float, nullable=False)
     unit = Column(String, nullable=False)
+    # The amount as written in the recipe when it was not in the base unit
+    quantity_entered = Column(Float)
+    unit_entered = Column(String)
 
     recipe = relationship("Recipe", back_populates="recipe_ingredients")
     ingredient = relationship("Ingredient", back_populates="recipe_ingredients")
 
-    __table_args__ = (UniqueConstraint("recipe_id", "ingredient_id"),)
+    __table_args__ = (
+        UniqueConstraint("recipe_id", "ingredient_id"),
+        Index("ix_recipe_ingredients_ingredient_recipe", "ingredient_id", "recipe_id", "quantity_needed"),
+    )
 
     @validates('quantity_needed')
     def validate_quantity(self, key, quantity):
@@ -100,7 +123,70 @@ class MealPlan(Base):
 
     recipe = relationship("Recipe", back_populates="meal_plans")
 
-    __table_args__ = (UniqueConstraint("date", "recipe_id"),)
+    __table_args__ = (
+        UniqueConstraint("date", "recipe_id"),
+        Index("ix_meal_plans_recipe_date", "recipe_id", "date"),
+    )
 
     def __repr__(self):
         return f"<MealPlan(date={self.date}, recipe={self.recipe.name})>"
+
+
+class StockMovement(Base):
+    """
+    Append-only ledger of stock changes. Inventory holds the running total;
+    the ledger is the history behind it.
+    """
+    __tablename__ = "stock_movements"
+    id = Column(Integer, primary_key=True)
+    # No foreign key: history outlives deleted ingredients
+    ingredient_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)
+    # Signed change, in the ingredient's base unit
+    quantity = Column(Float, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_stock_movements_ingredient_id", "ingredient_id", "id"),
+    )
+
+    @validates('kind')
+    def validate_kind(self, key, kind):
+        if kind not in MOVEMENT_KINDS:
+            raise ValueError(f"Invalid movement kind '{kind}'. Allowed kinds: {MOVEMENT_KINDS}")
+        return kind
+
+    def __repr__(self):
+        return f"<StockMovement(ingredient_id={self.ingredient_id}, kind={self.kind}, qty={self.quantity})>"
+
+
+class StockCheckpoint(Base):
+    """
+    Stock per ingredient after every movement up to movement_id, stored in
+    stock_snapshots. as_of is the time of that last movement.
+    """
+    __tablename__ = "stock_checkpoints"
+    id = Column(Integer, primary_key=True)
+    movement_id = Column(Integer, unique=True, nullable=False)
+    as_of = Column(DateTime, nullable=False)
+
+    snapshots = relationship("StockSnapshot", back_populates="checkpoint")
+
+    __table_args__ = (
+        Index("ix_stock_checkpoints_as_of", "as_of"),
+    )
+
+    def __repr__(self):
+        return f"<StockCheckpoint(movement_id={self.movement_id}, as_of={self.as_of})>"
+
+
+class StockSnapshot(Base):
+    __tablename__ = "stock_snapshots"
+    checkpoint_id = Column(Integer, ForeignKey("stock_checkpoints.id"), primary_key=True)
+    ingredient_id = Column(Integer, primary_key=True)
+    quantity = Column(Float, nullable=False)
+
+    checkpoint = relationship("StockCheckpoint", back_populates="snapshots")
+
+    def __repr__(self):
+        return f"<StockSnapshot(checkpoint_id={self.checkpoint_id}, ingredient_id={self.ingredient_id}, qty={self.quantity})>"
@@ -1,15 +1,20 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from datetime import date
-from models import Base, Ingredient, Recipe, RecipeIngredient, Inventory, MealPlan
+from datetime import date, datetime
+from database import get_engine
+from models import (
+    Ingredient, Recipe, RecipeIngredient, Inventory, MealPlan, StockCheckpoint, StockMovement, StockSnapshot,
+)
 
-engine = create_engine("sqlite:///./meal_mate.db")
+engine = get_engine()
 Session = sessionmaker(bind=engine)
 session = Session()
 
 def seed():
     # Clear existing data (optional)
     session.query(MealPlan).delete()
+    session.query(StockSnapshot).delete()
+    session.query(StockCheckpoint).delete()
+    session.query(StockMovement).delete()
     session.query(Inventory).delete()
     session.query(RecipeIngredient).delete()
     session.query(Recipe).delete()
@@ -39,12 +44,18 @@ def seed():
     ])
     session.commit()
 
-    # Inventory stock
-    session.add_all([
+    # Inventory stock, with matching opening entries in the stock ledger
+    stock = [
         Inventory(ingredient=flour, quantity_in_stock=500, unit="grams"),
         Inventory(ingredient=milk, quantity_in_stock=1000, unit="ml"),
         Inventory(ingredient=eggs, quantity_in_stock=6, unit="pcs"),
         Inventory(ingredient=sugar, quantity_in_stock=300, unit="grams"),
+    ]
+    session.add_all(stock)
+    now = datetime.now()
+    session.add_all([
+        StockMovement(ingredient_id=item.ingredient.id, kind="add", quantity=item.quantity_in_stock, created_at=now)
+        for item in stock
     ])
     session.commit()
 
@@ -0,0 +1,84 @@
+"""
+Units of measure and conversions.
+
+Every ingredient stores its quantities in one base unit: grams for mass,
+ml for volume, pcs for countable items. Quantities entered in other units
+(kg, mg, l, tsp, tbsp, cup, oz, lb) are converted once, when they are
+written, so inventory and aggregation queries compare plain numbers.
+Volume and mass convert into each other through an ingredient's density
+in grams per ml.
+"""
+
+MASS, VOLUME, COUNT = "mass", "volume", "count"
+
+# Base unit per dimension; these are the only units stored on Ingredient and Inventory
+BASE_UNITS = {MASS: "grams", VOLUME: "ml", COUNT: "pcs"}
+
+# unit -> (dimension, size in the dimension's base unit)
+UNITS = {
+    "mg": (MASS, 0.001),
+    "grams": (MASS, 1.0),
+    "kg": (MASS, 1000.0),
+    "oz": (MASS, 28.349523125),
+    "lb": (MASS, 453.59237),
+    "ml": (VOLUME, 1.0),
+    "l": (VOLUME, 1000.0),
+    # US customary measures
+    "tsp": (VOLUME, 4.92892159375),
+    "tbsp": (VOLUME, 14.78676478125),
+    "cup": (VOLUME, 236.5882365),
+    "pcs": (COUNT, 1.0),
+}
+
+ALIASES = {
+    "g": "grams", "gram": "grams", "gr": "grams",
+    "milligram": "mg", "milligrams": "mg",
+    "kilogram": "kg", "kilograms": "kg", "kilo": "kg", "kilos": "kg",
+    "ounce": "oz", "ounces": "oz",
+    "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml",
+    "liter": "l", "liters": "l", "litre": "l", "litres": "l",
+    "teaspoon": "tsp", "teaspoons": "tsp",
+    "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "cups": "cup",
+    "pc": "pcs", "piece": "pcs", "pieces": "pcs",
+}
+
+
+class UnitError(ValueError):
+    pass
+
+
+def normalize(unit):
+    """Return the canonical spelling of a unit, e.g. 'Kilograms' -> 'kg'."""
+    key = (unit or "").strip().lower()
+    key = ALIASES.get(key, key)
+    if key not in UNITS:
+        raise UnitError(f"Unknown unit '{unit}'. Known units: {', '.join(sorted(UNITS))}")
+    return key
+
+
+def dimension(unit):
+    return UNITS[normalize(unit)][0]
+
+
+def base_unit(unit):
+    """The base unit quantities in this unit are stored in, e.g. 'cup' -> 'ml'."""
+    return BASE_UNITS[dimension(unit)]
+
+
+def convert(quantity, from_unit, to_unit, density=None):
+    """
+    Convert quantity between units. Mass and volume convert through
+    density (grams per ml); counts only convert to counts.
+    """
+    from_dim, from_size = UNITS[normalize(from_unit)]
+    to_dim, to_size = UNITS[normalize(to_unit)]
+    value = quantity * from_size
+    if from_dim != to_dim:
+        if {from_dim, to_dim} != {MASS, VOLUME}:
+            raise UnitError(f"Cannot convert {from_unit} to {to_unit}")
+        if not density:
+            raise UnitError(f"Converting {from_unit} to {to_unit} needs the ingredient's density")
+        value = value * density if from_dim == VOLUME else value / density
+    return value / to_size
@@ -1,206 +1,1306 @@
-from db.models import Ingredient, Inventory, MealPlan, Recipe, RecipeIngredient
+from contextlib import contextmanager
+from functools import wraps
+from cache import LRUCache
+from instrumentation import instrumented
+from db import units
+from db.database import get_engine
+from db.models import (
+    Ingredient, Inventory, MealPlan, Recipe, RecipeIngredient, StockCheckpoint, StockMovement, StockSnapshot,
+)
 from sqlalchemy.orm import sessionmaker, joinedload
-from sqlalchemy import create_engine
-from datetime import datetime
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy import DateTime, bindparam, case, func, insert, literal, select, union_all, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from collections import Counter
+from datetime import date, datetime, time as dt_time
+import random
+import time
 
-engine = create_engine("sqlite:///lib/db/meal_mate.db")
+engine = get_engine()
 Session = sessionmaker(bind=engine)
 
+# Read-through caches for data that is read far more often than it changes.
+# "recipes" holds the recipe list, "ingredients" the name -> (id, unit) map.
+_catalog_cache = LRUCache("catalog", maxsize=8)
+# recipe_id -> tuple of (ingredient_id, name, quantity_needed, unit)
+_requirements_cache = LRUCache("requirements", maxsize=10000)
+# (start, end) -> shopping list items
+_shopping_list_cache = LRUCache("shopping_list", maxsize=64)
 
+_change_listeners = []
+
+# Rows per multi-row INSERT; keeps bound parameters well under SQLite's limit
+_INSERT_CHUNK = 500
+
+# A process checkpoints the stock ledger after writing this many movements
+CHECKPOINT_EVERY = 10000
+_movements_since_checkpoint = 0
+# Ledger balances closer to zero than this count as zero (float sums drift)
+_LEDGER_EPSILON = 1e-6
+
+
+def add_change_listener(callback):
+    """
+    Register callback(event, **details) to run after every committed write.
+
+    Events: "ingredient_added" (ingredient_id, name, unit, density),
+    "ingredient_changed" (ingredient_id), "ingredient_deleted"
+    (ingredient_id), "inventory_changed" (ingredient_ids), "recipe_added"
+    (recipe_id), "recipe_deleted" (recipe_id), "meal_plans_changed",
+    "caches_invalidated".
+    """
+    _change_listeners.append(callback)
+
+
+def _notify(event, **details):
+    for callback in list(_change_listeners):
+        callback(event, **details)
+
+
+def _invalidate_caches(event, **details):
+    if event == "ingredient_added":
+        ingredients = _catalog_cache.peek("ingredients")
+        if ingredients is not None:
+            ingredients[details["name"]] = (details["ingredient_id"], details["unit"], details["density"])
+    elif event == "ingredient_changed":
+        _catalog_cache.invalidate("ingredients")
+    elif event == "ingredient_deleted":
+        _catalog_cache.invalidate("ingredients")
+        # Any recipe may have used the ingredient
+        _requirements_cache.clear()
+    elif event in ("recipe_added", "recipe_deleted"):
+        _catalog_cache.invalidate("recipes")
+        _requirements_cache.invalidate(details["recipe_id"])
+
+    if event not in ("ingredient_added", "ingredient_changed"):
+        _shopping_list_cache.clear()
+
+
+add_change_listener(_invalidate_caches)
+
+
+def invalidate_caches():
+    """Drop every cached entry, e.g. after another process changed the database."""
+    for cache in (_catalog_cache, _requirements_cache, _shopping_list_cache):
+        cache.clear()
+    _notify("caches_invalidated")
+
+
+@contextmanager
+def use_database(url):
+    """
+    Point db_operations at another database for the block, e.g. one
+    household's file in a multi-tenant deployment, and back afterwards.
+
+    Engines are cached per URL (see get_engine), so switching back and forth
+    reuses each tenant's pool. Caches and the indexes other modules build on
+    change events are dropped on every switch. The binding is process-wide:
+    serve one tenant at a time per process, and run tenants in parallel in
+    separate processes.
+    """
+    global engine, _movements_since_checkpoint
+    previous = engine, dict(Session.kw), _movements_since_checkpoint
+    engine = get_engine(url)
+    Session.configure(bind=engine)
+    _movements_since_checkpoint = 0
+    invalidate_caches()
+    try:
+        yield engine
+    finally:
+        engine, kw, _movements_since_checkpoint = previous
+        Session.kw.clear()
+        Session.kw.update(kw)
+        invalidate_caches()
+
+
+@contextmanager
+def batch_transaction():
+    """
+    Run several db_operations calls in one database transaction.
+
+    Each call's commit becomes a savepoint release; everything is committed
+    once at the end, or rolled back together if the block raises.
+    """
+    previous = dict(Session.kw)
+    with previous.get("bind", engine).connect() as conn:
+        trans = conn.begin()
+        Session.configure(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            yield
+            trans.commit()
+        except BaseException:
+            trans.rollback()
+            # Change events already fired for work that is now undone
+            invalidate_caches()
+            raise
+        finally:
+            Session.kw.clear()
+            Session.kw.update(previous)
+
+
+# Unique keys that a concurrent writer can take between our check and our
+# insert. Other unique failures (e.g. a recipe listing an ingredient twice)
+# come from the input and are not retried.
+_RACE_CONSTRAINTS = (
+    "ingredients.name",
+    "recipes.name",
+    "inventory.ingredient_id",
+    "meal_plans.date, meal_plans.recipe_id",
+    "stock_checkpoints.movement_id",
+)
+
+
+def _is_retryable(exc):
+    """
+    Errors caused by another writer rather than by bad input: SQLite lock
+    contention, unique-key races and optimistic version conflicts.
+    """
+    if isinstance(exc, StaleDataError):
+        return True
+    message = str(getattr(exc, "orig", exc)).lower()
+    if isinstance(exc, OperationalError):
+        return "database is locked" in message or "database is busy" in message
+    if isinstance(exc, IntegrityError):
+        prefix = "unique constraint failed: "
+        return message.startswith(prefix) and message[len(prefix):] in _RACE_CONSTRAINTS
+    return False
+
+
+def retry_on_conflict(max_attempts=5, base_delay=0.02, max_delay=1.0):
+    """
+    Re-run a write transaction with jittered exponential backoff when it
+    loses a race with another writer. Inside batch_transaction() errors are
+    raised immediately, since the outer transaction cannot be replayed.
+    """
+    def decorator(operation):
+        @wraps(operation)
+        def wrapper(*args, **kwargs):
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    return operation(*args, **kwargs)
+                except Exception as exc:
+                    in_batch = isinstance(Session.kw.get("bind"), Connection)
+                    if in_batch or attempt == max_attempts or not _is_retryable(exc):
+                        raise
+                    delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+                    time.sleep(delay * random.uniform(0.5, 1.5))
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    return [cache.stats() for cache in (_catalog_cache, _requirements_cache, _shopping_list_cache)]
+
+
+# Prebuilt statements for the small lookups and writes that run on every
+# call. They are plain Core statements over the tables with bound
+# parameters, built once at import: a call skips building the expression
+# and the ORM's query compilation, and the engine finds the compiled SQL in
+# its statement cache under the statement's memoized cache key.
+_ingredients = Ingredient.__table__
+_inventory = Inventory.__table__
+_recipe_ingredients = RecipeIngredient.__table__
+_meal_plans = MealPlan.__table__
+
+_INGREDIENT_BY_NAME = (
+    select(_ingredients.c.id, _ingredients.c.unit, _ingredients.c.density)
+    .where(_ingredients.c.name == bindparam("name"))
+    .limit(1)
+)
+_REQUIREMENTS = (
+    select(
+        _recipe_ingredients.c.ingredient_id,
+        _ingredients.c.name,
+        _recipe_ingredients.c.quantity_needed,
+        _ingredients.c.unit,
+    )
+    .join_from(_recipe_ingredients, _ingredients)
+    .where(_recipe_ingredients.c.recipe_id == bindparam("recipe_id"))
+)
+_STOCK_FOR_INGREDIENTS = (
+    select(_inventory.c.ingredient_id, _inventory.c.quantity_in_stock)
+    .where(_inventory.c.ingredient_id.in_(bindparam("ingredient_ids", expanding=True)))
+)
+_STOCK_BY_NAME = (
+    select(_inventory.c.quantity_in_stock, _inventory.c.unit, _inventory.c.version)
+    .join_from(_inventory, _ingredients)
+    .where(_ingredients.c.name == bindparam("name"))
+    .limit(1)
+)
+# Names other than the columns' own: those are reserved for UPDATE ... SET
+_ADD_STOCK = (
+    update(_inventory)
+    .where(_inventory.c.ingredient_id == bindparam("target_id"))
+    .values(
+        quantity_in_stock=_inventory.c.quantity_in_stock + bindparam("amount"),
+        version=_inventory.c.version + 1,
+    )
+)
+_MEAL_PLAN_ID = (
+    select(_meal_plans.c.id)
+    .where(_meal_plans.c.date == bindparam("date"), _meal_plans.c.recipe_id == bindparam("recipe_id"))
+    .limit(1)
+)
+_INSERT_MOVEMENT = insert(StockMovement.__table__)
+# ORM select: update_ingredient_quantity needs the mapped row for its version check
+_INVENTORY_FOR_INGREDIENT = select(Inventory).where(Inventory.ingredient_id == bindparam("ingredient_id")).limit(1)
+
+
+# Every public function below is a thin wrapper that opens a Session and
+# calls a private core taking that session. async_db_operations runs the
+# same cores through AsyncSession.run_sync, so both APIs share one
+# implementation.
+
+@contextmanager
+def _reuse(session):
+    """Yield session if one is given, else a new Session closed afterwards."""
+    if session is not None:
+        yield session
+    else:
+        with Session() as new_session:
+            yield new_session
+
+
+def _ingredient_map(session=None):
+    def load():
+        with _reuse(session) as s:
+            rows = s.query(Ingredient.id, Ingredient.name, Ingredient.unit, Ingredient.density).all()
+            return {name: (ingredient_id, unit, density) for ingredient_id, name, unit, density in rows}
+
+    return _catalog_cache.get_or_load("ingredients", load)
+
+
+def _lookup_ingredient(session, name):
+    """
+    Return (id, base unit, density) for an ingredient name, or None if it
+    does not exist. Misses fall back to the database in case another process added it.
+    """
+    found = _ingredient_map(session).get(name)
+    if found is None:
+        row = session.execute(_INGREDIENT_BY_NAME, {"name": name}).first()
+        if row:
+            found = (row.id, row.unit, row.density)
+            _ingredient_map(session)[name] = found
+    return found
+
+
+def _to_base(quantity, unit, found, name):
+    """Convert a quantity to the ingredient's base unit, naming the ingredient on failure."""
+    _, base, density = found
+    try:
+        return units.convert(quantity, unit, base, density)
+    except units.UnitError as e:
+        raise units.UnitError(f"{e} (ingredient {name} is stored in {base})")
+
+
+def _requirements(recipe_id, session=None):
+    def load():
+        with _reuse(session) as s:
+            rows = s.execute(_REQUIREMENTS, {"recipe_id": recipe_id}).all()
+            return tuple(tuple(row) for row in rows)
+
+    return _requirements_cache.get_or_load(recipe_id, load)
+
+
+def _to_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _to_datetime(value):
+    """A datetime as is; a date or YYYY-MM-DD string means the end of that day."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date) or len(value) == 10:
+        return datetime.combine(_to_date(value), dt_time.max)
+    return datetime.fromisoformat(value)
+
+
+def _record_movements(session, kind, changes):
+    """
+    Append (ingredient_id, signed quantity) pairs to the stock ledger in the
+    caller's transaction, as multi-row INSERTs. Return how many were written.
+    """
+    now = datetime.now()
+    rows = [
+        {"ingredient_id": ingredient_id, "kind": kind, "quantity": quantity, "created_at": now}
+        for ingredient_id, quantity in changes
+        if quantity
+    ]
+    if len(rows) == 1:
+        # The common single-movement case reuses one prebuilt statement
+        session.execute(_INSERT_MOVEMENT, rows[0])
+        return 1
+    for start in range(0, len(rows), _INSERT_CHUNK):
+        session.execute(insert(StockMovement.__table__).values(rows[start:start + _INSERT_CHUNK]))
+    return len(rows)
+
+
+def _after_movements(session, count):
+    """Checkpoint the ledger once this process has written CHECKPOINT_EVERY movements."""
+    global _movements_since_checkpoint
+    _movements_since_checkpoint += count
+    if _movements_since_checkpoint < CHECKPOINT_EVERY:
+        return
+    _movements_since_checkpoint = 0
+    try:
+        _checkpoint_stock(session)
+    except (OperationalError, IntegrityError):
+        # Another process holds the lock or checkpointed first; a later write tries again
+        pass
+
+
+@instrumented
 def list_recipes():
+    return _list_recipes()
+
+
+def _list_recipes(session=None):
+    def load():
+        with _reuse(session) as s:
+            return tuple(tuple(row) for row in s.query(Recipe.id, Recipe.name).all())
+
+    return [{"id": recipe_id, "name": name} for recipe_id, name in _catalog_cache.get_or_load("recipes", load)]
+
+
+def _keyset(query, key, after_id, limit):
+    """
+    Rows of query with key > after_id in key order, plus the after_id for
+    the following page (None on the last one). One extra row is fetched to
+    tell whether there is a next page. Each page is a primary-key range
+    scan, so page 1000 costs the same as page 1, unlike OFFSET.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    if after_id is not None:
+        query = query.filter(key > after_id)
+    rows = query.order_by(key).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1][0]
+    return rows, None
+
+
+@instrumented
+def list_recipes_page(after_id=None, limit=100):
+    """
+    One page of recipes ordered by id, as {"items": [{"id", "name"}],
+    "next_after_id"}. Pass next_after_id back as after_id for the next page.
+    """
     with Session() as session:
-        recipes = session.query(Recipe).all()
-        return [{"id": r.id, "name": r.name} for r in recipes]
+        return _list_recipes_page(session, after_id, limit)
+
 
+def _list_recipes_page(session, after_id, limit):
+    rows, next_after_id = _keyset(session.query(Recipe.id, Recipe.name), Recipe.id, after_id, limit)
+    return {"items": [{"id": recipe_id, "name": name} for recipe_id, name in rows], "next_after_id": next_after_id}
+
+
+@instrumented
+def iter_recipes(batch_size=1000):
+    """
+    Yield every recipe as {"id", "name"}, one keyset page of batch_size at a
+    time, without loading the whole table or holding a read transaction open.
+    """
+    after_id = None
+    while True:
+        page = list_recipes_page(after_id, batch_size)
+        yield from page["items"]
+        after_id = page["next_after_id"]
+        if after_id is None:
+            return
+
+
+@instrumented
+def recipe_requirements(recipe_id):
+    """
+    Return the cached ingredient requirements of a recipe.
+    """
+    with Session() as session:
+        return _recipe_requirements(session, recipe_id)
 
+
+def _recipe_requirements(session, recipe_id):
+    return [
+        {"ingredient_id": ingredient_id, "name": name, "quantity": quantity, "unit": unit}
+        for ingredient_id, name, quantity, unit in _requirements(recipe_id, session)
+    ]
+
+
+@instrumented
 def check_inventory(recipe_dict):
     """
-    Check inventory in a single query with joins to avoid N+1 problem.
+    Check inventory using the cached requirement vector and one stock query.
+    """
+    with Session() as session:
+        return _check_inventory(session, recipe_dict['id'])
+
+
+def _check_inventory(session, recipe_id):
+    reqs = _requirements(recipe_id, session)
+    if not reqs:
+        return []
+
+    stock = dict(session.execute(_STOCK_FOR_INGREDIENTS, {"ingredient_ids": [req[0] for req in reqs]}).all())
+
+    missing = []
+    for ingredient_id, name, quantity_needed, unit in reqs:
+        have = stock.get(ingredient_id, 0)
+        if have < quantity_needed:
+            missing.append({
+                "name": name,
+                "needed": quantity_needed,
+                "have": have,
+                "unit": unit,
+            })
+    return missing
+
+
+@instrumented
+def check_inventory_bulk(recipe_ids, servings=1):
+    """
+    Check inventory for many recipes in a single grouped query.
+
+    Demand is summed per ingredient across all recipes, so shortages caused
+    by two recipes sharing an ingredient are reported too. servings scales
+    the demand, e.g. to the number of days the recipes are planned for.
     """
     with Session() as session:
-        recipe_id = recipe_dict['id']
-        # Query RecipeIngredients with Ingredients and Inventories joined
-        reqs = (
-            session.query(RecipeIngredient)
-            .join(RecipeIngredient.ingredient)
-            .outerjoin(Inventory, Inventory.ingredient_id == RecipeIngredient.ingredient_id)
-            .filter(RecipeIngredient.recipe_id == recipe_id)
-            .all()
+        return _check_inventory_bulk(session, recipe_ids, servings)
+
+
+def _check_inventory_bulk(session, recipe_ids, servings=1):
+    recipe_ids = list(set(recipe_ids))
+    if not recipe_ids:
+        return []
+    if servings <= 0:
+        raise ValueError("Servings must be positive")
+
+    rows = (
+        session.query(
+            Ingredient.name,
+            func.sum(RecipeIngredient.quantity_needed),
+            func.coalesce(Inventory.quantity_in_stock, 0),
+            Ingredient.unit,
         )
+        .join(RecipeIngredient.ingredient)
+        .outerjoin(Inventory, Inventory.ingredient_id == RecipeIngredient.ingredient_id)
+        .filter(RecipeIngredient.recipe_id.in_(recipe_ids))
+        .group_by(Ingredient.id, Ingredient.name, Ingredient.unit, Inventory.quantity_in_stock)
+        .order_by(Ingredient.name)
+        .all()
+    )
 
-        missing = []
-        for req in reqs:
-            have = req.ingredient.inventory.quantity_in_stock if req.ingredient.inventory else 0
-            if have < req.quantity_needed:
-                missing.append({
-                    "name": req.ingredient.name,
-                    "needed": req.quantity_needed,
-                    "have": have,
-                    "unit": req.unit,
-                })
-        return missing
+    return [
+        {"name": name, "needed": needed * servings, "have": have, "unit": unit}
+        for name, needed, have, unit in rows
+        if have < needed * servings
+    ]
 
 
-def save_ingredient(name, quantity, unit):
+@instrumented
+@retry_on_conflict()
+def save_ingredient(name, quantity, unit, density=None):
     """
     Save or update ingredient and inventory atomically.
+    Stock is incremented server-side, so concurrent adds are never lost.
+
+    quantity may be in any known unit (kg, cup, ...); it is converted to the
+    ingredient's base unit before it is stored. density (grams per ml) is
+    recorded on the ingredient and enables volume <-> mass conversion.
     """
-    if unit not in {"grams", "ml", "pcs"}:
-        raise ValueError(f"Invalid unit '{unit}'")
+    with Session() as session:
+        return _save_ingredient(session, name, quantity, unit, density)
+
+
+def _save_ingredient(session, name, quantity, unit, density=None):
+    unit = units.normalize(unit)
 
     if quantity <= 0:
         raise ValueError("Quantity must be positive")
+    # The bulk UPDATE below bypasses Ingredient.validate_density
+    if density is not None and density <= 0:
+        raise ValueError("Density must be positive")
 
-    with Session() as session:
-        try:
-            ingredient = session.query(Ingredient).filter_by(name=name).first()
-            if not ingredient:
-                ingredient = Ingredient(name=name, unit=unit)
-                session.add(ingredient)
-                session.flush()  # To get id without commit
+    try:
+        created = changed = False
+        found = _lookup_ingredient(session, name)
+        if found:
+            ingredient_id = found[0]
+            if density is not None and density != found[2]:
+                session.query(Ingredient).filter_by(id=ingredient_id).update({"density": density})
+                found = (ingredient_id, found[1], density)
+                changed = True
+        else:
+            ingredient = Ingredient(name=name, unit=units.base_unit(unit), density=density)
+            session.add(ingredient)
+            session.flush()  # To get id without commit
+            ingredient_id = ingredient.id
+            found = (ingredient_id, ingredient.unit, density)
+            created = True
+        base_unit = found[1]
+        quantity = _to_base(quantity, unit, found, name)
 
-            inventory = session.query(Inventory).filter_by(ingredient_id=ingredient.id).first()
-            if inventory:
-                inventory.quantity_in_stock += quantity
-            else:
-                inventory = Inventory(ingredient_id=ingredient.id, quantity_in_stock=quantity, unit=unit)
-                session.add(inventory)
+        updated = session.execute(_ADD_STOCK, {"target_id": ingredient_id, "amount": quantity}).rowcount
+        if not updated:
+            # A concurrent insert trips the unique ingredient_id and is retried as an update
+            session.add(Inventory(ingredient_id=ingredient_id, quantity_in_stock=quantity, unit=base_unit))
+        movements = _record_movements(session, "add", [(ingredient_id, quantity)])
 
-            session.commit()
-        except Exception:
-            session.rollback()
-            raise
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
 
+    if created:
+        _notify("ingredient_added", ingredient_id=ingredient_id, name=name, unit=base_unit, density=density)
+    elif changed:
+        _notify("ingredient_changed", ingredient_id=ingredient_id)
+    _notify("inventory_changed", ingredient_ids=[ingredient_id])
+    _after_movements(session, movements)
 
+
+@instrumented
+@retry_on_conflict()
 def save_recipe_with_ingredients(recipe_name, ingredients):
     """
     Save a recipe and all its ingredients atomically.
+
+    Each ingredient is {"name", "quantity", "unit"} plus an optional
+    "density" for new ingredients. Quantities are stored converted to the
+    ingredient's base unit; the amount as written is kept alongside.
     """
     with Session() as session:
-        try:
-            existing = session.query(Recipe).filter_by(name=recipe_name).first()
-            if existing:
-                print(f"Recipe '{recipe_name}' already exists.")
-                return False
-
-            recipe = Recipe(name=recipe_name)
-            session.add(recipe)
-            session.flush()  # To get recipe.id
-
-            for ing in ingredients:
-                if ing['unit'] not in {"grams", "ml", "pcs"}:
-                    raise ValueError(f"Invalid unit '{ing['unit']}' for ingredient {ing['name']}")
-                if ing['quantity'] <= 0:
-                    raise ValueError(f"Quantity must be positive for ingredient {ing['name']}")
-
-                ingredient = session.query(Ingredient).filter_by(name=ing['name']).first()
-                if not ingredient:
-                    ingredient = Ingredient(name=ing['name'], unit=ing['unit'])
-                    session.add(ingredient)
-                    session.flush()
-
-                recipe_ing = RecipeIngredient(
-                    recipe_id=recipe.id,
-                    ingredient_id=ingredient.id,
-                    quantity_needed=ing['quantity'],
-                    unit=ing['unit']
-                )
-                session.add(recipe_ing)
-
-            session.commit()
-            return True
-        except Exception as e:
-            session.rollback()
-            print(f"Error saving recipe: {e}")
+        return _save_recipe_with_ingredients(session, recipe_name, ingredients)
+
+
+def _save_recipe_with_ingredients(session, recipe_name, ingredients):
+    try:
+        names = [ing['name'] for ing in ingredients]
+        repeated = sorted({name for name in names if names.count(name) > 1})
+        if repeated:
+            raise ValueError(f"Ingredient(s) listed more than once: {', '.join(repeated)}")
+
+        existing = session.query(Recipe.id).filter_by(name=recipe_name).first()
+        if existing:
+            print(f"Recipe '{recipe_name}' already exists.")
             return False
-        
+
+        recipe = Recipe(name=recipe_name)
+        session.add(recipe)
+        session.flush()  # To get recipe.id
+        recipe_id = recipe.id
+
+        created = []
+        for ing in ingredients:
+            try:
+                unit = units.normalize(ing['unit'])
+            except units.UnitError as e:
+                raise ValueError(f"{e} for ingredient {ing['name']}")
+            if ing['quantity'] <= 0:
+                raise ValueError(f"Quantity must be positive for ingredient {ing['name']}")
+
+            found = _lookup_ingredient(session, ing['name'])
+            if found:
+                ingredient_id = found[0]
+            else:
+                density = ing.get('density')
+                ingredient = Ingredient(name=ing['name'], unit=units.base_unit(unit), density=density)
+                session.add(ingredient)
+                session.flush()
+                ingredient_id = ingredient.id
+                found = (ingredient_id, ingredient.unit, density)
+                created.append(found + (ing['name'],))
+
+            base_unit = found[1]
+            recipe_ing = RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                quantity_needed=_to_base(ing['quantity'], unit, found, ing['name']),
+                unit=base_unit,
+                quantity_entered=ing['quantity'] if unit != base_unit else None,
+                unit_entered=unit if unit != base_unit else None,
+            )
+            session.add(recipe_ing)
+
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        if _is_retryable(e):
+            raise
+        print(f"Error saving recipe: {e}")
+        return False
+
+    for ingredient_id, unit, density, name in created:
+        _notify("ingredient_added", ingredient_id=ingredient_id, name=name, unit=unit, density=density)
+    _notify("recipe_added", recipe_id=recipe_id)
+    return True
+
+
+def _inventory_query(session):
+    # Plain column tuples: no ORM identity map, no lazy loads per row
+    return (
+        session.query(Ingredient.name, Inventory.quantity_in_stock, Inventory.unit)
+        .join(Inventory.ingredient)
+    )
+
+
+def _inventory_page(session, after_id, limit):
+    query = (
+        session.query(Inventory.id, Ingredient.name, Inventory.quantity_in_stock, Inventory.unit)
+        .join(Inventory.ingredient)
+    )
+    return _keyset(query, Inventory.id, after_id, limit)
+
+
+@instrumented
 def load_inventory():
     with Session() as session:
-        inventories = (
-            session.query(Inventory)
-            .join(Ingredient)
-            .all()
-        )
-        return [
-            {
-                "Ingredient": inv.ingredient.name,
-                "Quantity": inv.quantity_in_stock,
-                "Unit": inv.unit
-            } for inv in inventories
-        ]
+        return _load_inventory(session)
 
 
+def _load_inventory(session):
+    return [
+        {
+            "Ingredient": name,
+            "Quantity": quantity,
+            "Unit": unit
+        } for name, quantity, unit in _inventory_query(session).all()
+    ]
 
+
+@instrumented
+def load_inventory_page(after_id=None, limit=100):
+    """
+    One page of inventory ordered by inventory id, as {"items": [{"id",
+    "Ingredient", "Quantity", "Unit"}], "next_after_id"}. Pass next_after_id
+    back as after_id for the next page; it is None on the last page.
+    """
+    with Session() as session:
+        return _load_inventory_page(session, after_id, limit)
+
+
+def _load_inventory_page(session, after_id, limit):
+    rows, next_after_id = _inventory_page(session, after_id, limit)
+    return {
+        "items": [
+            {"id": inventory_id, "Ingredient": name, "Quantity": quantity, "Unit": unit}
+            for inventory_id, name, quantity, unit in rows
+        ],
+        "next_after_id": next_after_id,
+    }
+
+
+@instrumented
+def iter_inventory(batch_size=1000):
+    """
+    Stream inventory rows like load_inventory, one keyset page of
+    batch_size rows at a time, so very large inventories never sit in
+    memory all at once and no read transaction stays open while the
+    caller works through the rows.
+    """
+    after_id = None
+    while True:
+        with Session() as session:
+            rows, after_id = _inventory_page(session, after_id, batch_size)
+        for _, name, quantity, unit in rows:
+            yield {"Ingredient": name, "Quantity": quantity, "Unit": unit}
+        if after_id is None:
+            return
+
+
+
+@instrumented
+@retry_on_conflict()
 def create_meal_plan(date_str, recipe_dict):
     """
     Save meal plan; handle unique constraint error gracefully.
     """
     with Session() as session:
-        try:
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-
-            # Check for existing meal plan for date & recipe
-            existing_plan = session.query(MealPlan).filter_by(date=date_obj, recipe_id=recipe_dict['id']).first()
-            if existing_plan:
-                print(f"Meal plan for {date_str} already exists with ID {existing_plan.id}.")
-                return False
-
-            new_plan = MealPlan(date=date_obj, recipe_id=recipe_dict['id'])
-            session.add(new_plan)
-            session.commit()
-            print(f"Meal plan for {date_str} added successfully with ID {new_plan.id}.")
-            return True
-        except Exception as e:
-            session.rollback()
-            print(f"Failed to create meal plan: {e}")
+        return _create_meal_plan(session, date_str, recipe_dict)
+
+
+def _create_meal_plan(session, date_str, recipe_dict):
+    try:
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+
+        # Check for existing meal plan for date & recipe
+        existing_id = session.scalar(_MEAL_PLAN_ID, {"date": date_obj, "recipe_id": recipe_dict['id']})
+        if existing_id is not None:
+            print(f"Meal plan for {date_str} already exists with ID {existing_id}.")
             return False
-        
-        
-def update_ingredient_quantity (name:str, new_quantity:float) -> bool:
+
+        new_plan = MealPlan(date=date_obj, recipe_id=recipe_dict['id'])
+        session.add(new_plan)
+        session.commit()
+        print(f"Meal plan for {date_str} added successfully with ID {new_plan.id}.")
+    except Exception as e:
+        session.rollback()
+        if _is_retryable(e):
+            raise
+        print(f"Failed to create meal plan: {e}")
+        return False
+
+    _notify("meal_plans_changed")
+    return True
+
+
+
+@instrumented
+@retry_on_conflict()
+def create_meal_plans(entries):
+    """
+    Schedule many (date, recipe_id) pairs at once with INSERT ... ON CONFLICT
+    DO NOTHING, in one transaction. Pairs that are already planned (or listed
+    twice) are skipped rather than failing the batch.
+
+    Return {"created": [...], "skipped": [...]}, each a list of
+    {"date", "recipe_id"} in input order.
+    """
     with Session() as session:
-        ingredient = session.query(Ingredient).filter_by(name=name).first()
-        if not ingredient:
-            print(f"Ingredient '{name}' not found.") 
-            return False
-        inventory = session.query(Inventory).filter_by(ingredient_id=ingredient.id).first()
-        if not inventory:
-            print(f"No inventory record found for ingredient '{name}'.")
-            return False
+        return _create_meal_plans(session, entries)
 
-        inventory.quantity_in_stock=new_quantity
+
+def _create_meal_plans(session, entries):
+    pairs = list(dict.fromkeys((_to_date(d), recipe_id) for d, recipe_id in entries))
+    if not pairs:
+        return {"created": [], "skipped": []}
+
+    try:
+        recipe_ids = {recipe_id for _, recipe_id in pairs}
+        known = set(session.scalars(select(Recipe.id).where(Recipe.id.in_(recipe_ids))))
+        unknown = recipe_ids - known
+        if unknown:
+            raise ValueError(f"Unknown recipe id(s): {', '.join(map(str, sorted(unknown)))}")
+
+        created = set()
+        for start in range(0, len(pairs), _INSERT_CHUNK):
+            chunk = pairs[start:start + _INSERT_CHUNK]
+            stmt = (
+                sqlite_insert(MealPlan)
+                .values([{"date": d, "recipe_id": recipe_id} for d, recipe_id in chunk])
+                .on_conflict_do_nothing(index_elements=["date", "recipe_id"])
+                .returning(MealPlan.date, MealPlan.recipe_id)
+            )
+            created.update(tuple(row) for row in session.execute(stmt))
         session.commit()
-        print(f"Updated '{name}' quantity to {new_quantity}.")
-        return True
-def delete_ingredient(name: str) -> bool:
+    except Exception:
+        session.rollback()
+        raise
+
+    if created:
+        _notify("meal_plans_changed")
+    result = {"created": [], "skipped": []}
+    for d, recipe_id in pairs:
+        result["created" if (d, recipe_id) in created else "skipped"].append({"date": d, "recipe_id": recipe_id})
+    return result
+
+
+@instrumented
+def get_stock(name):
+    """
+    Return {"ingredient", "quantity", "unit", "version"} for an ingredient's
+    stock, or None. Pass the version to update_ingredient_quantity to make
+    the update conditional on nobody else having changed it.
+    """
     with Session() as session:
-        ingredient = session.query(Ingredient).filter_by(name=name).first()
-        if not ingredient:
-            print(f"Ingredient '{name}' not found.")
+        return _get_stock(session, name)
+
+
+def _get_stock(session, name):
+    row = session.execute(_STOCK_BY_NAME, {"name": name}).first()
+    if row is None:
+        return None
+    return {"ingredient": name, "quantity": row.quantity_in_stock, "unit": row.unit, "version": row.version}
+
+
+@instrumented
+@retry_on_conflict()
+def update_ingredient_quantity (name:str, new_quantity:float, expected_version=None, unit=None) -> bool:
+    with Session() as session:
+        return _update_ingredient_quantity(session, name, new_quantity, expected_version, unit)
+
+
+def _update_ingredient_quantity(session, name:str, new_quantity:float, expected_version=None, unit=None) -> bool:
+    found = _lookup_ingredient(session, name)
+    if not found:
+        print(f"Ingredient '{name}' not found.") 
+        return False
+    inventory = session.scalars(_INVENTORY_FOR_INGREDIENT, {"ingredient_id": found[0]}).first()
+    if not inventory:
+        print(f"No inventory record found for ingredient '{name}'.")
+        return False
+    if expected_version is not None and inventory.version != expected_version:
+        print(f"Inventory for '{name}' changed since version {expected_version}.")
+        return False
+
+    if unit is not None:
+        try:
+            new_quantity = _to_base(new_quantity, unit, found, name)
+        except units.UnitError as e:
+            print(e)
             return False
 
-        # Also delete related inventory and recipe ingredients (cascade optional)
-        session.query(Inventory).filter_by(ingredient_id=ingredient.id).delete()
-        session.query(RecipeIngredient).filter_by(ingredient_id=ingredient.id).delete()
-        session.delete(ingredient)
-        session.commit()
-        print(f"Ingredient '{name}' and related data deleted.")
-        return True
+    # The mapper's version_id_col turns this into UPDATE ... WHERE version = :read_version
+    movements = _record_movements(session, "adjust", [(found[0], new_quantity - inventory.quantity_in_stock)])
+    inventory.quantity_in_stock=new_quantity
+    session.commit()
+    _notify("inventory_changed", ingredient_ids=[found[0]])
+    _after_movements(session, movements)
+    print(f"Updated '{name}' quantity to {new_quantity} {found[1]}.")
+    return True
+
+
+@instrumented
+@retry_on_conflict()
+def delete_ingredient(name: str) -> bool:
+    with Session() as session:
+        return _delete_ingredient(session, name)
+
+
+def _delete_ingredient(session, name: str) -> bool:
+    found = _lookup_ingredient(session, name)
+    if not found:
+        print(f"Ingredient '{name}' not found.")
+        return False
+    ingredient_id = found[0]
+
+    # The ledger records the stock that goes away with the ingredient
+    inventory = Inventory.__table__
+    movements = session.execute(
+        insert(StockMovement.__table__).from_select(
+            ["ingredient_id", "kind", "quantity", "created_at"],
+            select(
+                inventory.c.ingredient_id,
+                literal("delete"),
+                -inventory.c.quantity_in_stock,
+                literal(datetime.now(), DateTime()),
+            ).where(inventory.c.ingredient_id == ingredient_id, inventory.c.quantity_in_stock != 0),
+        )
+    ).rowcount
+
+    # Also delete related inventory and recipe ingredients (cascade optional)
+    session.query(Inventory).filter_by(ingredient_id=ingredient_id).delete()
+    session.query(RecipeIngredient).filter_by(ingredient_id=ingredient_id).delete()
+    deleted = session.query(Ingredient).filter_by(id=ingredient_id).delete()
+    session.commit()
+    # A stale cache entry means another process already deleted it
+    _notify("ingredient_deleted", ingredient_id=ingredient_id)
+    _after_movements(session, movements)
+    if not deleted:
+        print(f"Ingredient '{name}' not found.")
+        return False
+    print(f"Ingredient '{name}' and related data deleted.")
+    return True
 
 
+@instrumented
+@retry_on_conflict()
 def delete_recipe(recipe_name: str) -> bool:
     with Session() as session:
-        recipe = session.query(Recipe).filter_by(name=recipe_name).first()
-        if not recipe:
-            print(f"Recipe '{recipe_name}' not found.")
-            return False
+        return _delete_recipe(session, recipe_name)
+
+
+def _delete_recipe(session, recipe_name: str) -> bool:
+    recipe_id = session.query(Recipe.id).filter_by(name=recipe_name).scalar()
+    if recipe_id is None:
+        print(f"Recipe '{recipe_name}' not found.")
+        return False
+
+    # Delete recipe ingredients first
+    session.query(RecipeIngredient).filter_by(recipe_id=recipe_id).delete()
+    # Delete meal plans linked to this recipe
+    session.query(MealPlan).filter_by(recipe_id=recipe_id).delete()
+    session.query(Recipe).filter_by(id=recipe_id).delete()
+    session.commit()
+    _notify("recipe_deleted", recipe_id=recipe_id)
+    print(f"Recipe '{recipe_name}' and related data deleted.")
+    return True
+
+
+@instrumented
+def shopping_list(start_date, end_date, use_cache=False):
+    """
+    Return per-ingredient totals needed, in stock and to buy for all meal
+    plans between start_date and end_date (inclusive), in one GROUP BY query.
+    With use_cache, repeated calls for the same range are served from memory
+    until plans, recipes or inventory change.
+    """
+    with Session() as session:
+        return _shopping_list(session, start_date, end_date, use_cache)
+
+
+def _shopping_list(session, start_date, end_date, use_cache=False):
+    start, end = _to_date(start_date), _to_date(end_date)
+    key = (start, end)
+    if use_cache:
+        cached = _shopping_list_cache.get(key)
+        if cached is not None:
+            return [dict(item) for item in cached]
+
+    needed = func.sum(RecipeIngredient.quantity_needed)
+    in_stock = func.coalesce(Inventory.quantity_in_stock, 0)
+    rows = (
+        session.query(
+            Ingredient.name,
+            Ingredient.unit,
+            needed,
+            in_stock,
+            case((needed > in_stock, needed - in_stock), else_=0),
+        )
+        .select_from(MealPlan)
+        .join(RecipeIngredient, RecipeIngredient.recipe_id == MealPlan.recipe_id)
+        .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+        .outerjoin(Inventory, Inventory.ingredient_id == Ingredient.id)
+        .filter(MealPlan.date.between(start, end))
+        .group_by(Ingredient.id, Ingredient.name, Ingredient.unit, Inventory.quantity_in_stock)
+        .order_by(Ingredient.name)
+        .all()
+    )
+
+    items = [
+        {"name": name, "needed": total, "in_stock": have, "to_buy": to_buy, "unit": unit}
+        for name, unit, total, have, to_buy in rows
+    ]
+    if use_cache:
+        _shopping_list_cache.put(key, [dict(item) for item in items])
+    return items
+
 
-        # Delete recipe ingredients first
-        session.query(RecipeIngredient).filter_by(recipe_id=recipe.id).delete()
-        # Delete meal plans linked to this recipe
-        session.query(MealPlan).filter_by(recipe_id=recipe.id).delete()
-        session.delete(recipe)
+def _consume(session, portions):
+    """
+    Subtract the combined requirements of {recipe_id: servings} from stock
+    with one UPDATE ... FROM. Nothing is changed if any ingredient is short.
+    Return (consumed, shortfalls) as lists of dicts.
+    """
+    servings = case(portions, value=RecipeIngredient.recipe_id)
+    demand = (
+        session.query(
+            RecipeIngredient.ingredient_id.label("ingredient_id"),
+            func.sum(RecipeIngredient.quantity_needed * servings).label("needed"),
+        )
+        .filter(RecipeIngredient.recipe_id.in_(list(portions)))
+        .group_by(RecipeIngredient.ingredient_id)
+        .subquery("demand")
+    )
+
+    rows = (
+        session.query(
+            Ingredient.id,
+            Ingredient.name,
+            Ingredient.unit,
+            demand.c.needed,
+            func.coalesce(Inventory.quantity_in_stock, 0),
+        )
+        .select_from(demand)
+        .join(Ingredient, Ingredient.id == demand.c.ingredient_id)
+        .outerjoin(Inventory, Inventory.ingredient_id == demand.c.ingredient_id)
+        .order_by(Ingredient.name)
+        .all()
+    )
+    shortfalls = [
+        {"name": name, "needed": needed, "have": have, "unit": unit}
+        for _, name, unit, needed, have in rows
+        if have < needed
+    ]
+    if shortfalls:
+        return [], shortfalls
+
+    # The stock guard keeps the non-negative rule even if stock changed since the read
+    inventory = Inventory.__table__
+    result = session.execute(
+        update(inventory)
+        .values(
+            quantity_in_stock=inventory.c.quantity_in_stock - demand.c.needed,
+            version=inventory.c.version + 1,
+        )
+        .where(inventory.c.ingredient_id == demand.c.ingredient_id)
+        .where(inventory.c.quantity_in_stock >= demand.c.needed)
+    )
+    if result.rowcount != len(rows):
+        # Another writer got in between; retry_on_conflict re-reads and tries again
+        raise StaleDataError("Inventory changed while consuming; no stock was used")
+
+    consumed = [
+        {"ingredient_id": ingredient_id, "name": name, "quantity": needed, "unit": unit}
+        for ingredient_id, name, unit, needed, _ in rows
+    ]
+    return consumed, []
+
+
+@instrumented
+@retry_on_conflict()
+def consume_recipes(recipe_ids, servings=1):
+    """
+    Atomically use up stock for cooking recipes. A recipe id listed twice is
+    cooked twice; servings multiplies every recipe, or maps recipe_id -> servings.
+
+    Return {"ok", "consumed", "shortfalls"}. When anything is short, no stock
+    is changed and every shortfall is reported. Unknown recipe ids raise
+    ValueError.
+    """
+    with Session() as session:
+        return _consume_recipes(session, recipe_ids, servings)
+
+
+def _consume_recipes(session, recipe_ids, servings=1):
+    counts = Counter(recipe_ids)
+    if isinstance(servings, dict):
+        portions = {rid: count * servings.get(rid, 1) for rid, count in counts.items()}
+    else:
+        portions = {rid: count * servings for rid, count in counts.items()}
+    if any(p <= 0 for p in portions.values()):
+        raise ValueError("Servings must be positive")
+    if not portions:
+        return {"ok": True, "consumed": [], "shortfalls": []}
+
+    try:
+        known = set(session.scalars(select(Recipe.id).where(Recipe.id.in_(list(portions)))))
+        unknown = set(portions) - known
+        if unknown:
+            raise ValueError(f"Unknown recipe id(s): {', '.join(map(str, sorted(unknown)))}")
+        consumed, shortfalls = _consume(session, portions)
+        if shortfalls:
+            session.rollback()
+            return {"ok": False, "consumed": [], "shortfalls": shortfalls}
+        movements = _record_movements(session, "consume", [(c["ingredient_id"], -c["quantity"]) for c in consumed])
         session.commit()
-        print(f"Recipe '{recipe_name}' and related data deleted.")
-        return True
-    
-      
+    except Exception:
+        session.rollback()
+        raise
+
+    if consumed:
+        _notify("inventory_changed", ingredient_ids=[c["ingredient_id"] for c in consumed])
+        _after_movements(session, movements)
+    return {"ok": True, "consumed": consumed, "shortfalls": []}
+
+
+@instrumented
+def cook(date_str, servings=1):
+    """
+    Consume stock for every recipe planned on a date, all or nothing.
+    """
+    with Session() as session:
+        recipe_ids = _planned_recipe_ids(session, date_str)
+    return consume_recipes(recipe_ids, servings)
+
+
+def _planned_recipe_ids(session, date_str):
+    return [rid for (rid,) in session.query(MealPlan.recipe_id).filter(MealPlan.date == _to_date(date_str))]
+
+
+# Stock ledger. Inventory keeps the current stock, updated in the same
+# transaction as every movement. Checkpoints store the stock after a given
+# movement, each built from the previous checkpoint plus the movements since,
+# so neither point-in-time queries nor checkpoints ever sum the whole ledger.
+
+def _latest_checkpoint(session):
+    return (
+        session.query(StockCheckpoint.id, StockCheckpoint.movement_id)
+        .order_by(StockCheckpoint.movement_id.desc())
+        .first()
+    )
+
+
+def _balances(checkpoint, movements):
+    """
+    Select (ingredient_id, quantity): a checkpoint's snapshot (or nothing)
+    plus the given movements, summed per ingredient, zero balances dropped.
+    """
+    parts = movements
+    if checkpoint is not None:
+        parts = union_all(
+            select(StockSnapshot.ingredient_id, StockSnapshot.quantity)
+            .where(StockSnapshot.checkpoint_id == checkpoint.id),
+            movements.where(StockMovement.id > checkpoint.movement_id),
+        )
+    parts = parts.subquery("parts")
+    total = func.sum(parts.c.quantity)
+    return (
+        select(parts.c.ingredient_id, total.label("quantity"))
+        .group_by(parts.c.ingredient_id)
+        .having(func.abs(total) > _LEDGER_EPSILON)
+    )
+
+
+@instrumented
+def stock_at(when):
+    """
+    Stock per ingredient at a point in time (a datetime, or a date for the
+    end of that day), as [{"ingredient_id", "name", "quantity", "unit"}]
+    ordered by name. Ingredients with no stock are left out; name and unit
+    are None for ingredients deleted since.
+
+    Starts from the last checkpoint before when and adds only the movements
+    between it and when, so the cost does not grow with the ledger.
+    """
+    with Session() as session:
+        return _stock_at(session, when)
+
+
+def _stock_at(session, when):
+    when = _to_datetime(when)
+    checkpoint = (
+        session.query(StockCheckpoint.id, StockCheckpoint.movement_id)
+        .filter(StockCheckpoint.as_of <= when)
+        .order_by(StockCheckpoint.as_of.desc())
+        .first()
+    )
+    # Movements after the next checkpoint are all later than when
+    following = (
+        session.query(StockCheckpoint.movement_id)
+        .filter(StockCheckpoint.as_of > when)
+        .order_by(StockCheckpoint.as_of)
+        .limit(1)
+        .scalar()
+    )
+    movements = select(StockMovement.ingredient_id, StockMovement.quantity).where(StockMovement.created_at <= when)
+    if following is not None:
+        movements = movements.where(StockMovement.id <= following)
+
+    balances = _balances(checkpoint, movements).subquery("balances")
+    rows = (
+        session.query(balances.c.ingredient_id, Ingredient.name, balances.c.quantity, Ingredient.unit)
+        .select_from(balances)
+        .outerjoin(Ingredient, Ingredient.id == balances.c.ingredient_id)
+        .order_by(Ingredient.name, balances.c.ingredient_id)
+        .all()
+    )
+    return [
+        {"ingredient_id": ingredient_id, "name": name, "quantity": round(quantity, 6), "unit": unit}
+        for ingredient_id, name, quantity, unit in rows
+    ]
+
+
+@instrumented
+def list_stock_movements(name=None, after_id=None, limit=100):
+    """
+    One page of the stock ledger in the order it was written, optionally for
+    one ingredient, as {"items": [{"id", "ingredient_id", "name", "kind",
+    "quantity", "unit", "created_at"}], "next_after_id"}. quantity is the
+    signed change in the ingredient's base unit.
+    """
+    with Session() as session:
+        return _list_stock_movements(session, name, after_id, limit)
+
+
+def _list_stock_movements(session, name, after_id, limit):
+    query = (
+        session.query(
+            StockMovement.id,
+            StockMovement.ingredient_id,
+            Ingredient.name,
+            StockMovement.kind,
+            StockMovement.quantity,
+            Ingredient.unit,
+            StockMovement.created_at,
+        )
+        .outerjoin(Ingredient, Ingredient.id == StockMovement.ingredient_id)
+    )
+    if name is not None:
+        found = _lookup_ingredient(session, name)
+        if found is None:
+            return {"items": [], "next_after_id": None}
+        query = query.filter(StockMovement.ingredient_id == found[0])
+    rows, next_after_id = _keyset(query, StockMovement.id, after_id, limit)
+    return {
+        "items": [
+            {
+                "id": movement_id, "ingredient_id": ingredient_id, "name": ingredient_name, "kind": kind,
+                "quantity": quantity, "unit": unit, "created_at": created_at,
+            }
+            for movement_id, ingredient_id, ingredient_name, kind, quantity, unit, created_at in rows
+        ],
+        "next_after_id": next_after_id,
+    }
+
+
+@instrumented
+@retry_on_conflict()
+def checkpoint_stock():
+    """
+    Snapshot the stock after the newest movement, from the previous
+    checkpoint plus the movements since. Writes call this on their own every
+    CHECKPOINT_EVERY movements. Return {"checkpoint_id", "movement_id",
+    "as_of", "ingredients"}, or None when nothing moved since the last one.
+    """
+    with Session() as session:
+        return _checkpoint_stock(session)
+
+
+def _checkpoint_stock(session):
+    latest = _latest_checkpoint(session)
+    last = session.query(StockMovement.id, StockMovement.created_at).order_by(StockMovement.id.desc()).first()
+    if last is None or (latest is not None and last.id <= latest.movement_id):
+        return None
+
+    try:
+        checkpoint = StockCheckpoint(movement_id=last.id, as_of=last.created_at)
+        session.add(checkpoint)
+        session.flush()
+        checkpoint_id = checkpoint.id
+        movements = select(StockMovement.ingredient_id, StockMovement.quantity).where(StockMovement.id <= last.id)
+        balances = _balances(latest, movements).subquery("balances")
+        written = session.execute(
+            insert(StockSnapshot.__table__).from_select(
+                ["checkpoint_id", "ingredient_id", "quantity"],
+                select(literal(checkpoint_id), balances.c.ingredient_id, balances.c.quantity),
+            )
+        ).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return {"checkpoint_id": checkpoint_id, "movement_id": last.id, "as_of": last.created_at, "ingredients": written}
+
+
+@instrumented
+@retry_on_conflict()
+def rebuild_inventory():
+    """
+    Replay the ledger onto inventory: the last checkpoint plus the movements
+    since give each ingredient's stock, and inventory rows that disagree are
+    corrected. Return the corrections as [{"name", "was", "now"}]; an empty
+    list means inventory and ledger agree.
+    """
+    with Session() as session:
+        return _rebuild_inventory(session)
+
+
+def _rebuild_inventory(session):
+    movements = select(StockMovement.ingredient_id, StockMovement.quantity)
+    balances = _balances(_latest_checkpoint(session), movements).subquery("balances")
+    ledger = func.coalesce(balances.c.quantity, 0)
+    rows = (
+        session.query(Inventory.ingredient_id, Ingredient.name, Inventory.quantity_in_stock, ledger)
+        .join(Inventory.ingredient)
+        .outerjoin(balances, balances.c.ingredient_id == Inventory.ingredient_id)
+        .filter(func.abs(Inventory.quantity_in_stock - ledger) > _LEDGER_EPSILON)
+        .order_by(Ingredient.name)
+        .all()
+    )
+    if not rows:
+        return []
+
+    corrected = {ingredient_id: max(round(quantity, 6), 0) for ingredient_id, _, _, quantity in rows}
+    inventory = Inventory.__table__
+    try:
+        session.execute(
+            update(inventory)
+            .where(inventory.c.ingredient_id.in_(list(corrected)))
+            .values(
+                quantity_in_stock=case(corrected, value=inventory.c.ingredient_id),
+                version=inventory.c.version + 1,
+            )
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    _notify("inventory_changed", ingredient_ids=list(corrected))
+    return [
+        {"name": name, "was": was, "now": corrected[ingredient_id]}
+        for ingredient_id, name, was, _ in rows
+    ]
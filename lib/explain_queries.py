@@ -0,0 +1,124 @@
+"""
+Query plan checker for db_operations.
+
+Runs every benchmark scenario once against a small synthetic database,
+captures the SQL each function emits and runs EXPLAIN QUERY PLAN on it.
+Full table scans are flagged, and the exit status is non-zero when a
+function scans a table it is not expected to, so regressions fail CI.
+
+Usage:
+    python explain_queries.py
+    python explain_queries.py --verbose
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from sqlalchemy import event
+
+import benchmark
+import datagen
+import db_operations
+from db.database import get_engine
+
+# Functions that read whole tables by design
+EXPECTED_SCANS = {
+    "list_recipes": {"recipes"},
+    "load_inventory": {"inventory", "ingredients"},
+    # Keyset pages scan only up to LIMIT rows in primary-key order
+    "iter_inventory": {"inventory"},
+    "iter_recipes": {"recipes"},
+    # Newest movement: a reverse primary-key scan that stops after one row
+    "checkpoint_stock": {"stock_movements"},
+}
+
+
+def capture_statements(engine, call):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        # Batched inserts may arrive as a list of parameter sets
+        if executemany and parameters and isinstance(parameters[0], (list, tuple, dict)):
+            parameters = parameters[0]
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            call()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return statements
+
+
+def explain(engine, statement, parameters):
+    with engine.connect() as conn:
+        cursor = conn.connection.cursor()
+        try:
+            return [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())]
+        finally:
+            cursor.close()
+
+
+def scanned_tables(plan):
+    """Return tables read by a full scan, i.e. SCAN without an index."""
+    tables = set()
+    subqueries = set()
+    for detail in plan:
+        parts = detail.split()
+        if parts[:1] in (["MATERIALIZE"], ["CO-ROUTINE"]):
+            subqueries.add(parts[1])
+        elif parts[:1] == ["SCAN"] and "USING" not in parts and parts[-2:] != ["CONSTANT", "ROWS"]:
+            tables.add(parts[1])
+    # Scanning an already filtered subquery result is fine
+    return tables - subqueries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flag table scans in db_operations queries.")
+    parser.add_argument("--verbose", action="store_true", help="Print every statement and its plan")
+    args = parser.parse_args(argv)
+
+    problems = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "explain.db")
+        datagen.generate(db_path, ingredients=200, recipes=500, days=30)
+        engine = get_engine(f"sqlite:///{db_path}")
+        db_operations.engine = engine
+        db_operations.Session.configure(bind=engine)
+        fixture = benchmark.Fixture(engine, seed=42)
+
+        for name, make_call in benchmark.SCENARIOS.items():
+            # Check steady-state plans: catalog cache fills are whole-table reads by design
+            db_operations.list_recipes()
+            db_operations._ingredient_map()
+            statements = capture_statements(engine, make_call(fixture))
+            allowed = EXPECTED_SCANS.get(name, set())
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")):
+                    continue
+                plan = explain(engine, statement, parameters)
+                unexpected = scanned_tables(plan) - allowed
+                if unexpected:
+                    problems += 1
+                    print(f"[SCAN] {name}: {', '.join(sorted(unexpected))}")
+                    print(f"    {' '.join(statement.split())}")
+                elif args.verbose:
+                    print(f"[ok]   {name}: {' '.join(statement.split())}")
+                if args.verbose or unexpected:
+                    for detail in plan:
+                        print(f"        {detail}")
+        engine.dispose()
+
+    if problems:
+        print(f"\n{problems} statement(s) with unexpected table scans.")
+        return 1
+    print("No unexpected table scans.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Vectorized "what can I cook right now?" engine.
+
+Keeps a sparse recipe x ingredient requirement matrix (COO arrays sorted by
+recipe row) built from recipe_ingredients, and compares it against the stock
+vector from inventory with NumPy in a single pass over all recipes. The
+matrix follows db_operations change events, so adding or deleting recipes
+and ingredients updates it in place instead of rebuilding from the database.
+Server threads read the matrix while listeners change it, so both go through
+its lock, and readers compute on a snapshot.
+"""
+import copy
+from threading import RLock
+
+import numpy as np
+
+import db_operations
+from db.models import Inventory, Recipe, RecipeIngredient
+
+
+class FeasibilityResult:
+    """
+    Per-recipe feasibility for one stock vector. All arrays are aligned with recipe_ids.
+    """
+
+    def __init__(self, recipe_ids, names, cookable, missing_count, servings, entries):
+        self.recipe_ids = recipe_ids
+        self.names = names
+        self.cookable = cookable
+        self.missing_count = missing_count
+        self.servings = servings
+        # (rows, ingredient_ids, needed, have) for every entry that is short
+        self._short_entries = entries
+
+    def cookable_ids(self):
+        return self.recipe_ids[self.cookable].tolist()
+
+    def shortfall(self, recipe_id):
+        """Return [{"ingredient_id", "needed", "have", "short"}] for one recipe."""
+        rows, ingredient_ids, needed, have = self._short_entries
+        row = np.flatnonzero(self.recipe_ids == recipe_id)
+        if not row.size:
+            return []
+        mask = rows == row[0]
+        return [
+            {"ingredient_id": int(i), "needed": float(n), "have": float(h), "short": float(n - h)}
+            for i, n, h in zip(ingredient_ids[mask], needed[mask], have[mask])
+        ]
+
+    def to_dicts(self, only_cookable=False):
+        indexes = np.flatnonzero(self.cookable) if only_cookable else range(len(self.recipe_ids))
+        return [
+            {
+                "id": int(self.recipe_ids[i]),
+                "name": self.names[i],
+                "cookable": bool(self.cookable[i]),
+                "missing": int(self.missing_count[i]),
+                "servings": int(self.servings[i]),
+            }
+            for i in indexes
+        ]
+
+
+class RequirementMatrix:
+    def __init__(self):
+        self.loaded = False
+        self.lock = RLock()
+        self._reset()
+
+    def _reset(self):
+        self.recipe_ids = np.empty(0, dtype=np.int64)
+        self.names = []
+        self.active = np.empty(0, dtype=bool)
+        self.row_of = {}
+        self.ingredient_ids = np.empty(0, dtype=np.int64)
+        self.column_of = {}
+        # COO entries, kept sorted by row
+        self.rows = np.empty(0, dtype=np.int64)
+        self.cols = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+        # Recipes added since the last read; fetched by ensure_loaded()
+        self.pending = set()
+
+    def load(self):
+        """Build the matrix from the database with two column selects."""
+        with self.lock:
+            self._load()
+
+    def _load(self):
+        self._reset()
+        with db_operations.Session() as session:
+            recipes = session.query(Recipe.id, Recipe.name).order_by(Recipe.id).all()
+            entries = (
+                session.query(
+                    RecipeIngredient.recipe_id,
+                    RecipeIngredient.ingredient_id,
+                    RecipeIngredient.quantity_needed,
+                )
+                .order_by(RecipeIngredient.recipe_id)
+                .all()
+            )
+        self._add_recipes(recipes, entries)
+        self.loaded = True
+
+    def ensure_loaded(self):
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            elif self.pending:
+                self._add_pending()
+
+    def snapshot(self):
+        """
+        Return a loaded copy of the matrix that later change events leave
+        alone. The COO arrays are only ever replaced, so the copy shares them.
+        """
+        with self.lock:
+            self.ensure_loaded()
+            matrix = copy.copy(self)
+            matrix.lock = RLock()
+            matrix.names = list(self.names)
+            matrix.active = self.active.copy()
+            matrix.row_of = dict(self.row_of)
+            matrix.column_of = dict(self.column_of)
+            matrix.pending = set()
+            return matrix
+
+    def _add_pending(self):
+        recipe_ids, self.pending = [i for i in self.pending if i not in self.row_of], set()
+        if not recipe_ids:
+            return
+        with db_operations.Session() as session:
+            recipes = session.query(Recipe.id, Recipe.name).filter(Recipe.id.in_(recipe_ids)).order_by(Recipe.id).all()
+            entries = (
+                session.query(
+                    RecipeIngredient.recipe_id,
+                    RecipeIngredient.ingredient_id,
+                    RecipeIngredient.quantity_needed,
+                )
+                .filter(RecipeIngredient.recipe_id.in_(recipe_ids))
+                .order_by(RecipeIngredient.recipe_id)
+                .all()
+            )
+        self._add_recipes(recipes, entries)
+
+    def _columns_for(self, ingredient_ids):
+        new = [i for i in dict.fromkeys(ingredient_ids) if i not in self.column_of]
+        if new:
+            start = len(self.ingredient_ids)
+            self.column_of.update((i, start + n) for n, i in enumerate(new))
+            self.ingredient_ids = np.concatenate([self.ingredient_ids, np.array(new, dtype=np.int64)])
+        return np.array([self.column_of[i] for i in ingredient_ids], dtype=np.int64)
+
+    def _add_recipes(self, recipes, entries):
+        start = len(self.recipe_ids)
+        ids = np.array([r[0] for r in recipes], dtype=np.int64)
+        self.recipe_ids = np.concatenate([self.recipe_ids, ids])
+        self.names.extend(r[1] for r in recipes)
+        self.active = np.concatenate([self.active, np.ones(len(ids), dtype=bool)])
+        self.row_of.update((recipe_id, start + n) for n, recipe_id in enumerate(ids.tolist()))
+
+        if entries:
+            # New rows all sort after existing ones, so appending keeps entries ordered
+            rows = np.array([self.row_of[e[0]] for e in entries], dtype=np.int64)
+            order = np.argsort(rows, kind="stable")
+            self.rows = np.concatenate([self.rows, rows[order]])
+            self.cols = np.concatenate([self.cols, self._columns_for([e[1] for e in entries])[order]])
+            self.values = np.concatenate(
+                [self.values, np.array([e[2] for e in entries], dtype=np.float64)[order]]
+            )
+
+    def _drop_entries(self, keep):
+        self.rows = self.rows[keep]
+        self.cols = self.cols[keep]
+        self.values = self.values[keep]
+
+    def on_change(self, event, **details):
+        with self.lock:
+            self._on_change(event, details)
+
+    def _on_change(self, event, details):
+        if not self.loaded:
+            return
+        # Listeners run inside the writer's call (on the event loop for the
+        # async API), so they only record what changed and never query
+        if event == "recipe_added":
+            self.pending.add(details["recipe_id"])
+        elif event == "recipe_deleted":
+            self.pending.discard(details["recipe_id"])
+            row = self.row_of.pop(details["recipe_id"], None)
+            if row is not None:
+                self.active[row] = False
+                self._drop_entries(self.rows != row)
+        elif event == "caches_invalidated":
+            self.loaded = False
+        elif event == "ingredient_deleted":
+            col = self.column_of.get(details["ingredient_id"])
+            if col is not None:
+                self._drop_entries(self.cols != col)
+
+    def stock_vector(self):
+        """Current stock aligned with the matrix columns (0 where there is none)."""
+        with db_operations.Session() as session:
+            stock = session.query(Inventory.ingredient_id, Inventory.quantity_in_stock).all()
+        vector = np.zeros(len(self.ingredient_ids), dtype=np.float64)
+        for ingredient_id, quantity in stock:
+            col = self.column_of.get(ingredient_id)
+            if col is not None:
+                vector[col] = quantity
+        return vector
+
+    def evaluate(self, stock=None):
+        """
+        Compare every recipe with the stock vector in one vectorized pass.
+        """
+        matrix = self.snapshot()
+        if stock is None:
+            stock = matrix.stock_vector()
+        return matrix._evaluate(stock)
+
+    def _evaluate(self, stock):
+        n_rows = len(self.recipe_ids)
+        have = stock[self.cols]
+        short = have < self.values
+        missing = np.bincount(self.rows, weights=short, minlength=n_rows).astype(np.int64)
+        # A recipe without ingredients has nothing to cook from stock
+        has_entries = np.bincount(self.rows, minlength=n_rows) > 0
+
+        # Servings = min over ingredients of floor(have / needed); recipes without entries get 0
+        servings = np.full(n_rows, np.inf)
+        np.minimum.at(servings, self.rows, np.floor(have / self.values))
+        servings[np.isinf(servings)] = 0
+
+        active = np.flatnonzero(self.active)
+        entries = (
+            np.searchsorted(active, self.rows[short]),
+            self.ingredient_ids[self.cols[short]],
+            self.values[short],
+            have[short],
+        )
+        return FeasibilityResult(
+            self.recipe_ids[active],
+            [self.names[i] for i in active],
+            (missing[active] == 0) & has_entries[active],
+            missing[active],
+            servings[active].astype(np.int64),
+            entries,
+        )
+
+
+_matrix = RequirementMatrix()
+db_operations.add_change_listener(_matrix.on_change)
+
+
+def evaluate(stock=None):
+    """Return a FeasibilityResult for every recipe against current (or given) stock."""
+    return _matrix.evaluate(stock)
+
+
+def cookable_recipes():
+    """Return [{"id", "name", "cookable", "missing", "servings"}] for recipes cookable right now."""
+    return _matrix.evaluate().to_dicts(only_cookable=True)
+
+
+def requirement_matrix():
+    """Return a snapshot of the RequirementMatrix, loading it on first use. Treat it as read-only."""
+    return _matrix.snapshot()
+
+
+def reload():
+    """Rebuild the matrix from the database, e.g. after another process changed recipes."""
+    _matrix.load()
@@ -0,0 +1,255 @@
+"""
+Ingredient consumption forecasting from meal-plan history.
+
+Meal plans in the date range are joined with the feasibility module's
+in-memory recipe x ingredient requirement matrix and summed per day and
+ingredient in one bincount, giving a day x ingredient consumption matrix.
+NumPy smooths all ingredients at once (rolling mean or bias-corrected
+exponential smoothing) and projects when current stock runs out: meals
+already planned from the forecast date on count as they are, and after the
+last planned day each ingredient is used at its smoothed daily rate.
+
+Usage:
+    python forecast.py --within 14
+    python forecast.py --method rolling --window 28 --as-of 2026-09-01
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+
+import db_operations
+import feasibility
+from db.models import Ingredient, Inventory, MealPlan
+from helpers import format_table, parse_date
+
+METHODS = ("ewma", "rolling")
+# Run-outs further away than this are reported as None
+MAX_PROJECTION_DAYS = 3650
+
+
+class ConsumptionSeries:
+    """
+    Planned consumption per day and ingredient: matrix[day, column] is the
+    amount of ingredient_ids[column] used on start + day, in base units.
+    """
+
+    def __init__(self, start, ingredient_ids, matrix):
+        self.start = start
+        self.ingredient_ids = ingredient_ids
+        self.matrix = matrix
+
+    def dates(self):
+        return [self.start + timedelta(days=day) for day in range(len(self.matrix))]
+
+    def split(self, day):
+        """(days before day, days from day on) as two matrices."""
+        return self.matrix[:day], self.matrix[day:]
+
+
+def _expand(matrix, rows):
+    """Requirement entry indexes for each recipe row, concatenated, and how many each row has."""
+    # Entries are sorted by row, so each recipe's requirements are one slice
+    starts = np.searchsorted(matrix.rows, rows, side="left")
+    counts = np.searchsorted(matrix.rows, rows, side="right") - starts
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(counts.sum()), counts
+
+
+def consumption_series(start_date, end_date, ingredient_ids=None):
+    """
+    Daily consumption from start_date to end_date (inclusive). Columns
+    follow ingredient_ids (sorted ascending) when given, otherwise every
+    ingredient in the requirement matrix, in id order.
+
+    Only (day, recipe) pairs come from the database. They are joined with
+    the feasibility module's in-memory requirement matrix and summed per
+    day and ingredient with a single bincount.
+    """
+    start, end = db_operations._to_date(start_date), db_operations._to_date(end_date)
+    if end < start:
+        raise ValueError("End date is before start date")
+
+    matrix = feasibility.requirement_matrix()
+    day = cast(func.julianday(MealPlan.date) - func.julianday(start.isoformat()), Integer)
+    with db_operations.Session() as session:
+        plans = session.execute(
+            select(day, MealPlan.recipe_id).where(MealPlan.date.between(start, end))
+        ).all()
+    plan_days = np.fromiter((d for d, _ in plans), dtype=np.int64, count=len(plans))
+    plan_rows = np.fromiter((matrix.row_of.get(r, -1) for _, r in plans), dtype=np.int64, count=len(plans))
+    # Plans for recipes the matrix no longer has (deleted since) use nothing
+    known = plan_rows >= 0
+    entries, counts = _expand(matrix, plan_rows[known])
+    days = np.repeat(plan_days[known], counts)
+
+    if ingredient_ids is None:
+        ingredient_ids = np.sort(matrix.ingredient_ids)
+    ingredient_ids = np.asarray(ingredient_ids, dtype=np.int64)
+    # Matrix column -> output column, or -1 for ingredients not asked for
+    column_ids = matrix.ingredient_ids
+    columns = np.searchsorted(ingredient_ids, column_ids)
+    found = columns < len(ingredient_ids)
+    found[found] = ingredient_ids[columns[found]] == column_ids[found]
+    columns[~found] = -1
+
+    cols = columns[matrix.cols[entries]]
+    keep = cols >= 0
+    n_days, n_cols = (end - start).days + 1, len(ingredient_ids)
+    flat = np.bincount(
+        days[keep] * n_cols + cols[keep], weights=matrix.values[entries][keep], minlength=n_days * n_cols
+    )
+    return ConsumptionSeries(start, ingredient_ids, flat.reshape(n_days, n_cols))
+
+
+def rolling_mean(matrix, window):
+    """Mean over the last window days for every day and column; shorter at the start."""
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    totals = np.cumsum(matrix, axis=0)
+    totals[window:] -= totals[:-window].copy()
+    counts = np.minimum(np.arange(1, len(matrix) + 1), window)
+    return totals / counts[:, None]
+
+
+def exponential_smoothing(matrix, alpha):
+    """
+    Exponentially weighted mean for every day and column. Starts from zero
+    and is bias-corrected, so early days are not dragged towards day one.
+    """
+    if not 0 < alpha <= 1:
+        raise ValueError("alpha must be in (0, 1]")
+    smoothed = np.empty_like(matrix)
+    level = np.zeros(matrix.shape[1], dtype=np.float64)
+    # One vector update per day covers all ingredients
+    for day, row in enumerate(matrix):
+        level += alpha * (row - level)
+        smoothed[day] = level
+    return smoothed / (1 - (1 - alpha) ** np.arange(1, len(matrix) + 1))[:, None]
+
+
+def daily_rates(history, method="ewma", alpha=0.1, window=28):
+    """Latest smoothed daily consumption per column of a history matrix."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}'. Choose from: {', '.join(METHODS)}")
+    if not len(history):
+        return np.zeros(history.shape[1], dtype=np.float64)
+    if method == "rolling":
+        return rolling_mean(history, window)[-1]
+    return exponential_smoothing(history, alpha)[-1]
+
+
+def run_out_days(stock, planned, rates):
+    """
+    Days from the first planned day until each column runs out, or inf.
+
+    planned covers the days with known demand; after its last row demand
+    continues at rates. Running out means the day's demand exceeds what is left.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if not len(planned):
+            return np.floor(np.where(rates > 0, stock / rates, np.inf))
+        used = np.cumsum(planned, axis=0)
+        over = used > stock
+        after_plan = len(used) + np.floor(np.where(rates > 0, (stock - used[-1]) / rates, np.inf))
+    return np.where(over.any(axis=0), over.argmax(axis=0), after_plan)
+
+
+def _catalog():
+    with db_operations.Session() as session:
+        rows = (
+            session.query(Ingredient.id, Ingredient.name, Ingredient.unit, Inventory.quantity_in_stock)
+            .outerjoin(Inventory, Inventory.ingredient_id == Ingredient.id)
+            .order_by(Ingredient.id)
+            .all()
+        )
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    stock = np.array([row[3] or 0.0 for row in rows], dtype=np.float64)
+    return ids, [(row[1], row[2]) for row in rows], stock
+
+
+def forecast(as_of=None, method="ewma", alpha=0.1, window=28, history_days=365, horizon_days=365):
+    """
+    Project when each ingredient runs out, from as_of (default: today).
+
+    The daily rate is smoothed over the history_days before as_of. Meals
+    planned within horizon_days from as_of are used as they are; beyond the
+    last planned day the rate takes over. Return [{"ingredient_id", "name",
+    "unit", "stock", "daily_rate", "planned", "days_left", "run_out"}] for
+    every ingredient with past or planned use, soonest run-out first;
+    days_left and run_out are None when stock lasts longer than
+    MAX_PROJECTION_DAYS.
+    """
+    as_of = db_operations._to_date(as_of) if as_of is not None else date.today()
+    if history_days < 1 or horizon_days < 1:
+        raise ValueError("history_days and horizon_days must be at least 1")
+
+    ids, names, stock = _catalog()
+    series = consumption_series(as_of - timedelta(days=history_days), as_of + timedelta(days=horizon_days - 1), ids)
+    history, future = series.split(history_days)
+
+    planned_days = np.flatnonzero(future.any(axis=1))
+    planned = future[:planned_days[-1] + 1] if planned_days.size else future[:0]
+    rates = daily_rates(history, method, alpha, window)
+    days_left = run_out_days(stock, planned, rates)
+
+    used = history.any(axis=0) | planned.any(axis=0)
+    columns = np.flatnonzero(used)
+    columns = columns[np.argsort(days_left[columns], kind="stable")]
+    planned_total = planned.sum(axis=0)
+    result = []
+    for col in columns.tolist():
+        left = days_left[col]
+        finite = left <= MAX_PROJECTION_DAYS
+        result.append({
+            "ingredient_id": int(ids[col]),
+            "name": names[col][0],
+            "unit": names[col][1],
+            "stock": float(stock[col]),
+            "daily_rate": round(float(rates[col]), 6),
+            "planned": float(planned_total[col]),
+            "days_left": int(left) if finite else None,
+            "run_out": as_of + timedelta(days=int(left)) if finite else None,
+        })
+    return result
+
+
+def reorder_list(within_days=7, **kwargs):
+    """forecast() entries that run out within within_days of as_of."""
+    return [
+        item for item in forecast(**kwargs)
+        if item["days_left"] is not None and item["days_left"] < within_days
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forecast when ingredients run out.")
+    parser.add_argument("--as-of", help="Forecast from this date (YYYY-MM-DD, default: today)")
+    parser.add_argument("--within", type=int, help="Only ingredients that run out within this many days")
+    parser.add_argument("--method", choices=METHODS, default="ewma")
+    parser.add_argument("--alpha", type=float, default=0.1, help="Smoothing factor for ewma (default: 0.1)")
+    parser.add_argument("--window", type=int, default=28, help="Days averaged by rolling (default: 28)")
+    parser.add_argument("--history-days", type=int, default=365, help="History used for the rate (default: 365)")
+    args = parser.parse_args(argv)
+
+    as_of = None
+    if args.as_of:
+        as_of = parse_date(args.as_of)
+        if as_of is None:
+            parser.error("--as-of must be YYYY-MM-DD")
+
+    kwargs = dict(as_of=as_of, method=args.method, alpha=args.alpha, window=args.window,
+                  history_days=args.history_days)
+    items = reorder_list(args.within, **kwargs) if args.within is not None else forecast(**kwargs)
+    print(format_table(
+        [(i["name"], round(i["stock"], 2), round(i["daily_rate"], 2), i["days_left"], i["run_out"], i["unit"])
+         for i in items],
+        headers=["Ingredient", "Stock", "Per day", "Days left", "Runs out", "Unit"],
+    ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
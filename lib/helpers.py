@@ -1,5 +1,7 @@
 
-from typing import Optional, List, Dict, Union
+import itertools
+import sys
+from typing import Optional, List, Dict, Union, Iterable, TextIO
 def get_user_input(prompt, required=True, valid_options=None):
     """
     Prompt the user for input, optionally enforce required input
@@ -64,6 +66,50 @@ def format_table(data: List[Dict[str, Union[str, int, float]]], headers: Optiona
     return table_str
 
 
+def stream_table(rows: Iterable[Union[Dict, tuple]], headers: Optional[List[str]] = None,
+                 out: Optional[TextIO] = None, widths: Optional[List[int]] = None, sample_size: int = 100) -> int:
+    """
+    Write rows (dicts or tuples) as a table like format_table, one line at a time.
+    Column widths are taken from widths, or else from the first sample_size
+    rows, which are the only rows held in memory. Later values wider than
+    their column are written in full. Writes nothing for no rows and returns
+    the number of rows written.
+    """
+    out = out or sys.stdout
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, 1 if widths else sample_size))
+    if not sample:
+        return 0
+
+    if isinstance(sample[0], dict):
+        if not headers:
+            headers = list(dict.fromkeys(key for row in sample for key in row))
+        as_tuple = lambda row: [row.get(h, "") for h in headers]
+    else:
+        if not headers:
+            headers = [f"Col{i+1}" for i in range(len(sample[0]))]
+        as_tuple = tuple
+    sample = [as_tuple(row) for row in sample]
+
+    if not widths:
+        widths = [max(len(str(item)) for item in [header] + [row[i] for row in sample]) for i, header in enumerate(headers)]
+    # One format string for the whole row instead of a str/ljust per cell
+    line = " | ".join(f"{{!s:<{width}}}" for width in widths) + "\n"
+
+    out.write(line.format(*headers))
+    out.write("-+-".join("-" * width for width in widths) + "\n")
+    count = 0
+    chunk = []
+    for row in itertools.chain(sample, map(as_tuple, rows)):
+        chunk.append(line.format(*row))
+        if len(chunk) == 1000:
+            out.write("".join(chunk))
+            count += len(chunk)
+            chunk.clear()
+    out.write("".join(chunk))
+    return count + len(chunk)
+
+
 def confirm_action(prompt="Are you sure? (y/n): "):
     """
     Prompt user for yes/no confirmation.
@@ -88,3 +134,21 @@ def parse_date(date_str):
         return datetime.strptime(date_str, "%Y-%m-%d").date()
     except ValueError:
         return None
+
+
+def lazy_import(name):
+    """
+    Return module name, executing it only when one of its attributes is
+    first used. Lets the CLI print help or parse arguments without paying
+    for SQLAlchemy and the ORM models.
+    """
+    import importlib.util
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
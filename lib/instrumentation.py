@@ -0,0 +1,318 @@
+"""
+Opt-in query instrumentation for db_operations.
+
+Public db_operations functions are marked with @instrumented. While
+instrumentation is enabled, SQLAlchemy cursor events attribute every SQL
+statement to the outermost instrumented call that issued it, and the
+registry keeps per-function call counts, statement counts, DB time and
+wall time, plus a log of slow statements. Each statement is also counted
+as a hit or a miss in SQLAlchemy's compiled-statement cache (or as
+uncached, e.g. raw SQL), so statement_cache_stats() shows whether hot
+paths reuse their compiled SQL. When disabled, the decorator
+costs one flag check per call and no engine listeners are attached.
+
+    import instrumentation
+    instrumentation.enable(slow_query_ms=50)
+    ...
+    print(instrumentation.registry.to_prometheus())
+
+assert_max_queries() works whether or not instrumentation is enabled and
+is meant for query-budget checks in CI (see query_budgets.py).
+"""
+import contextvars
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+from sqlalchemy import event
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+logger = logging.getLogger("meal_mate.sql")
+
+# Name of the instrumented function currently running in this context, and
+# a one-item statement counter for that call
+_current = contextvars.ContextVar("meal_mate_instrumented_call", default=None)
+_call_counts = contextvars.ContextVar("meal_mate_instrumented_counts", default=None)
+
+
+def _is_transaction_control(statement):
+    return statement == "BEGIN"
+
+
+class MetricsRegistry:
+    """
+    In-process counters per db_operations function. Thread-safe.
+    """
+
+    def __init__(self, slow_query_ms=100.0, slow_log_size=100):
+        self.enabled = False
+        self.slow_query_ms = slow_query_ms
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self._functions = {}
+        self._lock = threading.Lock()
+        self._engines = []
+
+    def _entry(self, name):
+        entry = self._functions.get(name)
+        if entry is None:
+            entry = self._functions[name] = {
+                "calls": 0,
+                "statements": 0,
+                "db_seconds": 0.0,
+                "call_seconds": 0.0,
+                "max_statements_per_call": 0,
+                "slow_queries": 0,
+                "cache_hits": 0,
+                "cache_misses": 0,
+                "uncached": 0,
+            }
+        return entry
+
+    def record_call(self, name, seconds, statements):
+        with self._lock:
+            entry = self._entry(name)
+            entry["calls"] += 1
+            entry["call_seconds"] += seconds
+            entry["max_statements_per_call"] = max(entry["max_statements_per_call"], statements)
+
+    def record_statement(self, name, statement, seconds, cache_hit=None):
+        with self._lock:
+            entry = self._entry(name or "<untracked>")
+            entry["statements"] += 1
+            entry["db_seconds"] += seconds
+            if cache_hit is CACHE_HIT:
+                entry["cache_hits"] += 1
+            elif cache_hit is CACHE_MISS:
+                entry["cache_misses"] += 1
+            else:
+                entry["uncached"] += 1
+            if seconds * 1000 >= self.slow_query_ms:
+                entry["slow_queries"] += 1
+                self.slow_queries.append({
+                    "function": name,
+                    "statement": " ".join(statement.split()),
+                    "duration_ms": round(seconds * 1000, 3),
+                    "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                })
+                logger.warning("slow query in %s (%.1f ms): %s", name, seconds * 1000, statement)
+
+    def snapshot(self):
+        """Return {function: counters} as a plain dict copy."""
+        with self._lock:
+            return {name: dict(entry) for name, entry in sorted(self._functions.items())}
+
+    def statement_cache(self):
+        """Compiled-statement cache hits, misses and uncached statements summed over all functions."""
+        totals = {"hits": 0, "misses": 0, "uncached": 0}
+        for entry in self.snapshot().values():
+            totals["hits"] += entry["cache_hits"]
+            totals["misses"] += entry["cache_misses"]
+            totals["uncached"] += entry["uncached"]
+        total = sum(totals.values())
+        totals["hit_ratio"] = round(totals["hits"] / total, 4) if total else None
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self._functions.clear()
+            self.slow_queries.clear()
+
+    def to_json(self, indent=None):
+        return json.dumps(
+            {
+                "functions": self.snapshot(),
+                "statement_cache": self.statement_cache(),
+                "slow_queries": list(self.slow_queries),
+            },
+            indent=indent,
+        )
+
+    def to_prometheus(self):
+        """Render the counters in the Prometheus text exposition format."""
+        metrics = [
+            ("meal_mate_db_calls_total", "calls", "Calls per db_operations function"),
+            ("meal_mate_db_statements_total", "statements", "SQL statements per db_operations function"),
+            ("meal_mate_db_time_seconds_total", "db_seconds", "Time spent executing SQL"),
+            ("meal_mate_db_call_seconds_total", "call_seconds", "Wall time spent in the function"),
+            ("meal_mate_db_slow_queries_total", "slow_queries", "Statements slower than the slow-query threshold"),
+            ("meal_mate_db_statement_cache_hits_total", "cache_hits", "Statements whose compiled SQL was cached"),
+            ("meal_mate_db_statement_cache_misses_total", "cache_misses", "Statements compiled and added to the cache"),
+            ("meal_mate_db_uncached_statements_total", "uncached", "Raw or uncacheable statements"),
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for metric, key, help_text in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, entry in snapshot.items():
+                lines.append(f'{metric}{{function="{name}"}} {entry[key]}')
+        return "\n".join(lines) + "\n"
+
+    # Engine events
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("instrumentation_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("instrumentation_start")
+        if not stack:
+            # Listener attached while this statement was already running
+            return
+        started = stack.pop()
+        if _is_transaction_control(statement):
+            return
+        elapsed = time.perf_counter() - started
+        self.record_statement(_current.get(), statement, elapsed, getattr(context, "cache_hit", None))
+        counts = _call_counts.get()
+        if counts is not None:
+            counts[0] += 1
+
+    def attach(self, engine):
+        if engine in self._engines:
+            return
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        self._engines.append(engine)
+
+    def detach(self):
+        for engine in self._engines:
+            event.remove(engine, "before_cursor_execute", self._before_execute)
+            event.remove(engine, "after_cursor_execute", self._after_execute)
+        self._engines.clear()
+
+
+registry = MetricsRegistry()
+
+
+def enable(engine=None, slow_query_ms=None):
+    """
+    Start recording. engine defaults to db_operations.engine; call again with
+    another engine (e.g. async_db_operations.engine) to track it too.
+    """
+    if engine is None:
+        import db_operations
+        engine = db_operations.engine
+    # An AsyncEngine's statements run on the sync engine it wraps
+    engine = getattr(engine, "sync_engine", engine)
+    if slow_query_ms is not None:
+        registry.slow_query_ms = slow_query_ms
+    registry.attach(engine)
+    registry.enabled = True
+
+
+def statement_cache_stats():
+    """Compiled-statement cache counters recorded while instrumentation was enabled."""
+    return registry.statement_cache()
+
+
+def disable():
+    registry.enabled = False
+    registry.detach()
+
+
+@contextmanager
+def _scope(name, counts):
+    name_token = _current.set(name)
+    counts_token = _call_counts.set(counts)
+    try:
+        yield
+    finally:
+        _call_counts.reset(counts_token)
+        _current.reset(name_token)
+
+
+def instrumented(func):
+    """Attribute the SQL a function runs to it while instrumentation is enabled."""
+    name = func.__name__
+
+    if inspect.isgeneratorfunction(func):
+        @wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            if not registry.enabled or _current.get() is not None:
+                yield from func(*args, **kwargs)
+                return
+            # Only the work done inside next() is attributed, not the caller's loop body
+            counts = [0]
+            elapsed = 0.0
+            iterator = func(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        with _scope(name, counts):
+                            item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield item
+            finally:
+                iterator.close()
+                registry.record_call(name, elapsed, counts[0])
+        return generator_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        # Context variables are per task, so concurrent calls are counted apart
+        @wraps(func)
+        async def coroutine_wrapper(*args, **kwargs):
+            if not registry.enabled or _current.get() is not None:
+                return await func(*args, **kwargs)
+            counts = [0]
+            start = time.perf_counter()
+            try:
+                with _scope(name, counts):
+                    return await func(*args, **kwargs)
+            finally:
+                registry.record_call(name, time.perf_counter() - start, counts[0])
+        return coroutine_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        # Nested calls (cook -> consume_recipes) count towards the outer function
+        if not registry.enabled or _current.get() is not None:
+            return func(*args, **kwargs)
+        counts = [0]
+        start = time.perf_counter()
+        try:
+            with _scope(name, counts):
+                return func(*args, **kwargs)
+        finally:
+            registry.record_call(name, time.perf_counter() - start, counts[0])
+    return wrapper
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None, label=None):
+    """
+    Fail with QueryBudgetExceeded if the block runs more than limit SQL
+    statements (BEGIN not counted). Yields the list of captured statements.
+    """
+    if engine is None:
+        import db_operations
+        engine = db_operations.engine
+    engine = getattr(engine, "sync_engine", engine)
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if not _is_transaction_control(statement):
+            statements.append(" ".join(statement.split()))
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    if len(statements) > limit:
+        listing = "\n".join(f"  {i}. {s}" for i, s in enumerate(statements, 1))
+        raise QueryBudgetExceeded(
+            f"{label or 'block'} ran {len(statements)} statements, budget is {limit}:\n{listing}"
+        )
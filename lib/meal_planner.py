@@ -1,9 +1,9 @@
+from db.database import get_engine
 from db.models import Recipe, RecipeIngredient, Inventory, MealPlan
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
 from datetime import datetime
 
-engine = create_engine("sqlite:///db/meal_mate.db")
+engine = get_engine()
 Session = sessionmaker(bind=engine)
 
 def list_recipes():
@@ -0,0 +1,196 @@
+"""
+Meal-plan optimizer: fill a date range with recipes so that as little as
+possible has to be bought beyond current stock.
+
+The search runs entirely on the feasibility module's in-memory requirement
+matrix (COO arrays of recipe x ingredient quantities) and a running
+"remaining stock" vector. For each meal slot it scores every candidate
+recipe at once with NumPy by the extra quantity it would add to the
+purchase list, picks the cheapest (preferring recipes that use up more
+stock), and moves on, so thousands of recipes over months of slots take
+well under a second. Existing meal plans in the range are kept and their
+demand is taken out of stock first.
+
+Usage:
+    python optimizer.py 2026-11-01 2026-11-30 --meals-per-day 2 --no-repeat-days 7
+"""
+import argparse
+import random
+import sys
+from datetime import timedelta
+
+import numpy as np
+
+import db_operations
+import feasibility
+from db.models import Ingredient, MealPlan
+from helpers import format_table, parse_date
+
+
+def _existing_plans(start, end):
+    with db_operations.Session() as session:
+        return (
+            session.query(MealPlan.date, MealPlan.recipe_id)
+            .filter(MealPlan.date.between(start, end))
+            .all()
+        )
+
+
+def _use_stock(matrix, remaining, row):
+    # Entries are sorted by row, so a recipe's requirements are one slice
+    lo, hi = np.searchsorted(matrix.rows, [row, row + 1])
+    np.subtract.at(remaining, matrix.cols[lo:hi], matrix.values[lo:hi])
+
+
+def _purchase_increments(matrix, remaining):
+    """Extra purchase per recipe if it were added on top of current demand."""
+    rem = remaining[matrix.cols]
+    before = np.maximum(0.0, -rem)
+    after = np.maximum(0.0, matrix.values - rem)
+    n_rows = len(matrix.recipe_ids)
+    cost = np.bincount(matrix.rows, weights=after - before, minlength=n_rows)
+    # How much of the recipe comes out of stock we already have
+    covered = np.bincount(matrix.rows, weights=matrix.values - (after - before), minlength=n_rows)
+    return cost, covered
+
+
+def _pick(candidates, cost, covered, rng):
+    # Cheapest first, then the one using most stock, then random for variety
+    idx = np.flatnonzero(candidates)
+    idx = idx[cost[idx] <= cost[idx].min() + 1e-9]
+    idx = idx[covered[idx] >= covered[idx].max() - 1e-9]
+    return idx[rng.integers(len(idx))]
+
+
+def optimize(start_date, end_date, meals_per_day=1, no_repeat_days=7, seed=None):
+    """
+    Plan meals_per_day recipes for every date from start_date to end_date
+    (inclusive) without saving anything. A recipe is not repeated within
+    no_repeat_days days, counting plans that already exist around the range.
+
+    Return {"plan", "purchases", "unfilled"}: plan is a list of
+    {"date", "recipe_id", "name", "purchase"} for the new slots, purchases
+    lists {"ingredient_id", "name", "quantity", "unit"} still to buy for the
+    whole range (existing plans included), unfilled counts slots no
+    recipe could fill under the constraints.
+    """
+    start, end = db_operations._to_date(start_date), db_operations._to_date(end_date)
+    if end < start:
+        raise ValueError("End date is before start date")
+    if meals_per_day < 1 or no_repeat_days < 0:
+        raise ValueError("meals_per_day must be at least 1 and no_repeat_days not negative")
+
+    matrix = feasibility.requirement_matrix()
+    remaining = matrix.stock_vector()
+    n_rows = len(matrix.recipe_ids)
+    # Recipes without ingredients would look free; they are not cookable either
+    usable = matrix.active & (np.bincount(matrix.rows, minlength=n_rows) > 0)
+    rng = np.random.default_rng(seed if seed is not None else random.randrange(2**32))
+
+    # Day index of each recipe's latest use, relative to start
+    last_used = np.full(n_rows, np.iinfo(np.int64).min // 2, dtype=np.int64)
+    planned_per_day = {}
+    for plan_date, recipe_id in _existing_plans(start - timedelta(days=no_repeat_days), end):
+        row = matrix.row_of.get(recipe_id)
+        if row is None:
+            continue
+        day = (plan_date - start).days
+        last_used[row] = max(last_used[row], day)
+        if day >= 0:
+            planned_per_day.setdefault(day, set()).add(row)
+            _use_stock(matrix, remaining, row)
+
+    plan = []
+    unfilled = 0
+    for day in range((end - start).days + 1):
+        taken = planned_per_day.get(day, set())
+        for _ in range(meals_per_day - len(taken)):
+            candidates = usable & (day - last_used > no_repeat_days)
+            if taken:
+                candidates[list(taken)] = False
+            if not candidates.any():
+                unfilled += 1
+                continue
+            cost, covered = _purchase_increments(matrix, remaining)
+            best = _pick(candidates, cost, covered, rng)
+
+            _use_stock(matrix, remaining, best)
+            last_used[best] = day
+            taken.add(best)
+            plan.append({
+                "date": start + timedelta(days=day),
+                "recipe_id": int(matrix.recipe_ids[best]),
+                "name": matrix.names[best],
+                "purchase": float(cost[best]),
+            })
+
+    return {"plan": plan, "purchases": _purchases(matrix, remaining), "unfilled": unfilled}
+
+
+def _purchases(matrix, remaining):
+    short = np.flatnonzero(remaining < 0)
+    if not short.size:
+        return []
+    ingredient_ids = matrix.ingredient_ids[short].tolist()
+    with db_operations.Session() as session:
+        names = {
+            ingredient_id: (name, unit)
+            for ingredient_id, name, unit in session.query(Ingredient.id, Ingredient.name, Ingredient.unit)
+            .filter(Ingredient.id.in_(ingredient_ids))
+        }
+    purchases = [
+        {"ingredient_id": i, "name": names[i][0], "quantity": float(-q), "unit": names[i][1]}
+        for i, q in zip(ingredient_ids, remaining[short])
+        if i in names
+    ]
+    return sorted(purchases, key=lambda p: p["name"])
+
+
+def plan_meals(start_date, end_date, meals_per_day=1, no_repeat_days=7, seed=None, dry_run=False):
+    """
+    Run optimize() and save the chosen slots as meal plans with one bulk insert.
+    The result also carries create_meal_plans' "created" and "skipped" lists.
+    """
+    result = optimize(start_date, end_date, meals_per_day, no_repeat_days, seed)
+    if dry_run or not result["plan"]:
+        result.update(created=[], skipped=[])
+        return result
+    saved = db_operations.create_meal_plans([(p["date"], p["recipe_id"]) for p in result["plan"]])
+    result.update(saved)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan meals that need as few purchases as possible.")
+    parser.add_argument("start", help="First date (YYYY-MM-DD)")
+    parser.add_argument("end", help="Last date (YYYY-MM-DD)")
+    parser.add_argument("--meals-per-day", type=int, default=1)
+    parser.add_argument("--no-repeat-days", type=int, default=7,
+                        help="Days before a recipe may be planned again (default: 7)")
+    parser.add_argument("--seed", type=int, help="Seed for tie-breaking between equally good recipes")
+    parser.add_argument("--dry-run", action="store_true", help="Show the plan without saving it")
+    args = parser.parse_args(argv)
+
+    start, end = parse_date(args.start), parse_date(args.end)
+    if start is None or end is None:
+        parser.error("dates must be YYYY-MM-DD")
+
+    result = plan_meals(start, end, args.meals_per_day, args.no_repeat_days, args.seed, args.dry_run)
+    print(format_table(
+        [(p["date"], p["name"], round(p["purchase"], 2)) for p in result["plan"]],
+        headers=["Date", "Recipe", "Extra purchase"],
+    ))
+    print("\nTo buy:")
+    print(format_table(
+        [(p["name"], round(p["quantity"], 2), p["unit"]) for p in result["purchases"]],
+        headers=["Ingredient", "Quantity", "Unit"],
+    ))
+    if result["unfilled"]:
+        print(f"\n{result['unfilled']} slot(s) left empty: not enough recipes for the repeat window.")
+    if not args.dry_run:
+        print(f"\nSaved {len(result['created'])} meal plan(s), {len(result['skipped'])} already planned.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Query budget checker for db_operations.
+
+Runs every benchmark scenario a few times against a small synthetic
+database and fails if any call runs more SQL statements than its budget
+below. Budgets do not depend on data size, so an N+1 regression (one query
+per recipe or ingredient) fails CI immediately.
+
+Usage:
+    python query_budgets.py
+    python query_budgets.py --calls 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from datetime import datetime
+
+from sqlalchemy import insert, literal, select, update
+
+import benchmark
+import datagen
+import db_operations
+from db.database import get_engine
+from db.models import Ingredient, Inventory, StockMovement
+from instrumentation import QueryBudgetExceeded, assert_max_queries
+
+# Max statements per call for each benchmark scenario, with warm catalog caches
+QUERY_BUDGETS = {
+    "list_recipes": 0,
+    "check_inventory": 2,  # requirements cache miss + one stock query
+    "recipe_requirements": 1,
+    "check_inventory_bulk": 1,
+    "list_recipes_page": 1,
+    "iter_recipes": 1,  # one per batch_size rows
+    "load_inventory": 1,
+    "load_inventory_page": 1,
+    "iter_inventory": 1,  # one per batch_size rows
+    "save_ingredient": 4,  # ingredient insert on a miss, stock update, stock insert, ledger insert
+    "save_recipe_with_ingredients": 8,  # scenario uses 6 ingredients
+    "create_meal_plan": 3,
+    "create_meal_plans": 2,
+    "get_stock": 1,
+    "update_ingredient_quantity": 3,
+    "shopping_list": 1,
+    "consume_recipes": 4,  # recipe id check, demand read, UPDATE ... FROM, ledger insert
+    "cook": 5,
+    "delete_recipe": 4,
+    "delete_ingredient": 5,
+    "stock_at": 3,  # two checkpoint lookups + one aggregate
+    "list_stock_movements": 1,
+    "checkpoint_stock": 4,
+    "rebuild_inventory": 2,
+}
+
+
+# Scenarios that must reach the UPDATE ... FROM and ledger insert, not stop at a shortfall
+MUST_CONSUME = {"consume_recipes", "cook"}
+
+
+def _stock_up(engine, quantity=1e9):
+    """
+    Give every ingredient ample stock, so consuming never falls short. The
+    top-ups go through the ledger as 'adjust' movements, so rebuild_inventory
+    still finds nothing to correct.
+    """
+    inventory = Inventory.__table__
+    with engine.begin() as conn:
+        conn.execute(insert(inventory).from_select(
+            ["ingredient_id", "quantity_in_stock", "unit"],
+            select(Ingredient.id, 0.0, Ingredient.unit).where(~Ingredient.id.in_(select(inventory.c.ingredient_id))),
+        ))
+        conn.execute(insert(StockMovement.__table__).from_select(
+            ["ingredient_id", "kind", "quantity", "created_at"],
+            select(
+                inventory.c.ingredient_id, literal("adjust"), quantity - inventory.c.quantity_in_stock,
+                literal(datetime.now()),
+            ),
+        ))
+        conn.execute(update(inventory).values(quantity_in_stock=quantity, version=inventory.c.version + 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail when db_operations calls exceed their query budget.")
+    parser.add_argument("--calls", type=int, default=20, help="Calls per scenario (default: 20)")
+    args = parser.parse_args(argv)
+
+    missing = set(benchmark.SCENARIOS) - set(QUERY_BUDGETS)
+    if missing:
+        print(f"No query budget for: {', '.join(sorted(missing))}")
+        return 1
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "budgets.db")
+        datagen.generate(db_path, ingredients=200, recipes=500, days=30)
+        engine = get_engine(f"sqlite:///{db_path}")
+        db_operations.engine = engine
+        db_operations.Session.configure(bind=engine)
+        fixture = benchmark.Fixture(engine, seed=42)
+
+        for name, make_call in benchmark.SCENARIOS.items():
+            if name in MUST_CONSUME:
+                # Earlier scenarios lower some stock; consuming must not fall short
+                _stock_up(engine)
+            worst = 0
+            for _ in range(args.calls):
+                db_operations.list_recipes()
+                db_operations._ingredient_map()
+                call = make_call(fixture)
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        with assert_max_queries(QUERY_BUDGETS[name], engine, label=name) as statements:
+                            result = call()
+                except QueryBudgetExceeded as e:
+                    failures += 1
+                    print(f"[OVER] {e}")
+                    break
+                if name in MUST_CONSUME and not (result["ok"] and result["consumed"]):
+                    failures += 1
+                    print(f"[FAIL] {name}: nothing was consumed, so its write path went unmeasured: {result}")
+                    break
+                worst = max(worst, len(statements))
+            else:
+                print(f"[ok]   {name}: at most {worst} of {QUERY_BUDGETS[name]} statements")
+        engine.dispose()
+
+    if failures:
+        print(f"\n{failures} function(s) over their query budget.")
+        return 1
+    print("\nAll functions within their query budgets.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
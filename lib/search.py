@@ -0,0 +1,320 @@
+"""
+Typo-tolerant and prefix search over recipe and ingredient names.
+
+Names are held in memory in two structures per kind: a sorted list of
+words for prefix lookups (bisect), and a trigram index (trigram -> rows)
+for fuzzy matching, scored with NumPy by the Dice coefficient of shared
+trigrams. An ingredient -> recipes map answers "which recipes use these
+ingredients". Everything is loaded with three column selects on first use
+and then follows db_operations change events, so searches never scan the
+database; with 100k recipes a query takes milliseconds, where a
+LIKE '%x%' scan takes a full table pass. Searches and change events from
+different server threads take turns on the index lock.
+"""
+import bisect
+import unicodedata
+from collections import Counter
+from threading import RLock
+
+import numpy as np
+
+import db_operations
+from db.models import Ingredient, Recipe, RecipeIngredient
+
+
+def normalize(text):
+    """Lowercase and strip accents, so 'Crème Brûlée' matches 'creme brulee'."""
+    if text.isascii():
+        return text.lower().strip()
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).strip()
+
+
+def trigrams(text):
+    return _trigrams(normalize(text))
+
+
+def _trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Prefix and trigram index over (id, name) pairs. Rows are never reused;
+    removed names are only marked dead.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.normalized = []
+        self.alive = []
+        self.gram_counts = []
+        self.row_of = {}
+        self.postings = {}
+        # Sorted (word, row) pairs for prefix search on any word of a name,
+        # and sorted (name, row) pairs for whole-name prefixes
+        self.words = []
+        self.sorted_names = []
+        # NumPy copies of gram_counts and alive, rebuilt after changes
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def add(self, item_id, name):
+        if item_id in self.row_of:
+            self.remove(item_id)
+        row = self._append(item_id, name)
+        bisect.insort(self.sorted_names, (self.normalized[row], row))
+        for word in self.normalized[row].split():
+            bisect.insort(self.words, (word, row))
+
+    def _append(self, item_id, name):
+        row = len(self.ids)
+        self.ids.append(item_id)
+        self.names.append(name)
+        normalized = normalize(name)
+        self.normalized.append(normalized)
+        self.alive.append(True)
+        self.row_of[item_id] = row
+        grams = _trigrams(normalized)
+        self.gram_counts.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(row)
+        self._arrays = None
+        return row
+
+    def bulk_load(self, items):
+        """Add many (id, name) pairs, sorting the word list once at the end."""
+        words = self.words
+        self.words = []
+        for item_id, name in items:
+            row = self._append(item_id, name)
+            words.extend((word, row) for word in self.normalized[row].split())
+        words.sort()
+        self.words = words
+        self.sorted_names = sorted(zip(self.normalized, range(len(self.normalized))))
+
+    def remove(self, item_id):
+        row = self.row_of.pop(item_id, None)
+        if row is not None:
+            self.alive[row] = False
+            self._arrays = None
+
+    def name_of(self, item_id):
+        row = self.row_of.get(item_id)
+        return None if row is None else self.names[row]
+
+    def prefix(self, query, limit=10):
+        """Rows whose name starts with query, then rows where each query word starts a word of the name."""
+        query = normalize(query)
+        if not query:
+            return []
+        query_words = query.split()
+        # Scan from the longest query word, which has the fewest candidates
+        first_word = max(query_words, key=len)
+        normalized = self.normalized
+        rows = []
+        start = bisect.bisect_left(self.sorted_names, (query,))
+        for i in range(start, len(self.sorted_names)):
+            name, row = self.sorted_names[i]
+            if not name.startswith(query) or len(rows) >= limit:
+                break
+            if self.alive[row]:
+                rows.append(row)
+        if len(rows) >= limit:
+            return sorted(rows, key=lambda r: len(normalized[r]))
+
+        seen = set(rows)
+        # A very common word could match most names; enough candidates to rank is plenty
+        cap = max(limit * 10, 100)
+        start = bisect.bisect_left(self.words, (first_word,))
+        for i in range(start, len(self.words)):
+            word, row = self.words[i]
+            if not word.startswith(first_word) or len(rows) >= cap:
+                break
+            if row in seen or not self.alive[row]:
+                continue
+            seen.add(row)
+            # Every query word must start some word of the name: "tom sou" finds "Tomato Soup"
+            name_words = normalized[row].split()
+            if all(any(w.startswith(q) for w in name_words) for q in query_words):
+                rows.append(row)
+        # Whole-name prefixes first, then shorter names
+        rows.sort(key=lambda r: (not normalized[r].startswith(query), len(normalized[r])))
+        return rows[:limit]
+
+    def fuzzy(self, query, limit=10, min_score=0.3):
+        """(row, score) pairs ranked by trigram similarity to query."""
+        query_grams = trigrams(query)
+        grams = [g for g in query_grams if g in self.postings]
+        if not grams or not self.ids:
+            return []
+        if self._arrays is None:
+            self._arrays = (np.asarray(self.gram_counts, dtype=np.float64), np.asarray(self.alive, dtype=bool))
+        gram_counts, alive = self._arrays
+
+        hits = np.concatenate([np.asarray(self.postings[g], dtype=np.int64) for g in grams])
+        shared = np.bincount(hits, minlength=len(self.ids))
+        candidates = np.flatnonzero(shared)
+        scores = 2.0 * shared[candidates] / (len(query_grams) + gram_counts[candidates])
+        keep = alive[candidates] & (scores >= min_score)
+        candidates, scores = candidates[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+    def search(self, query, limit=10, min_score=0.3):
+        """Prefix matches first (score 1.0), then fuzzy matches."""
+        results = [(row, 1.0) for row in self.prefix(query, limit)]
+        seen = {row for row, _ in results}
+        if len(results) < limit:
+            for row, score in self.fuzzy(query, limit + len(results), min_score):
+                if row not in seen:
+                    results.append((row, min(score, 0.99)))
+                    seen.add(row)
+        return [
+            {"id": self.ids[row], "name": self.names[row], "score": round(score, 3)}
+            for row, score in results[:limit]
+        ]
+
+
+class SearchIndex:
+    def __init__(self):
+        self.loaded = False
+        self.lock = RLock()
+        self._reset()
+
+    def _reset(self):
+        self.recipes = NameIndex()
+        self.ingredients = NameIndex()
+        # ingredient_id -> set of recipe ids using it
+        self.recipes_by_ingredient = {}
+        # Recipes added since the last read; fetched by ensure_loaded()
+        self.pending = set()
+
+    def load(self):
+        with self.lock:
+            self._load()
+
+    def _load(self):
+        self._reset()
+        with db_operations.Session() as session:
+            recipes = session.query(Recipe.id, Recipe.name).all()
+            ingredients = session.query(Ingredient.id, Ingredient.name).all()
+            links = session.query(RecipeIngredient.ingredient_id, RecipeIngredient.recipe_id).all()
+        self.recipes.bulk_load(recipes)
+        self.ingredients.bulk_load(ingredients)
+        for ingredient_id, recipe_id in links:
+            self.recipes_by_ingredient.setdefault(ingredient_id, set()).add(recipe_id)
+        self.loaded = True
+
+    def ensure_loaded(self):
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            elif self.pending:
+                self._add_pending()
+
+    def _add_pending(self):
+        recipe_ids, self.pending = list(self.pending), set()
+        with db_operations.Session() as session:
+            recipes = session.query(Recipe.id, Recipe.name).filter(Recipe.id.in_(recipe_ids)).all()
+            links = (
+                session.query(RecipeIngredient.ingredient_id, RecipeIngredient.recipe_id)
+                .filter(RecipeIngredient.recipe_id.in_(recipe_ids))
+                .all()
+            )
+        for recipe_id, name in recipes:
+            self.recipes.add(recipe_id, name)
+        for ingredient_id, recipe_id in links:
+            self.recipes_by_ingredient.setdefault(ingredient_id, set()).add(recipe_id)
+
+    def on_change(self, event, **details):
+        with self.lock:
+            self._on_change(event, details)
+
+    def _on_change(self, event, details):
+        if not self.loaded:
+            return
+        # Listeners run inside the writer's call (on the event loop for the
+        # async API), so they only record what changed and never query
+        if event == "recipe_added":
+            self.pending.add(details["recipe_id"])
+        elif event == "recipe_deleted":
+            recipe_id = details["recipe_id"]
+            self.pending.discard(recipe_id)
+            self.recipes.remove(recipe_id)
+            for recipe_ids in self.recipes_by_ingredient.values():
+                recipe_ids.discard(recipe_id)
+        elif event == "ingredient_added":
+            self.ingredients.add(details["ingredient_id"], details["name"])
+        elif event == "ingredient_deleted":
+            self.ingredients.remove(details["ingredient_id"])
+            self.recipes_by_ingredient.pop(details["ingredient_id"], None)
+        elif event == "caches_invalidated":
+            self.loaded = False
+
+
+_index = SearchIndex()
+db_operations.add_change_listener(_index.on_change)
+
+
+def search_recipes(query, limit=10, min_score=0.3):
+    """Return [{"id", "name", "score"}] for recipes matching query by prefix or fuzzily."""
+    with _index.lock:
+        _index.ensure_loaded()
+        return _index.recipes.search(query, limit, min_score)
+
+
+def search_ingredients(query, limit=10, min_score=0.3):
+    """Return [{"id", "name", "score"}] for ingredients matching query by prefix or fuzzily."""
+    with _index.lock:
+        _index.ensure_loaded()
+        return _index.ingredients.search(query, limit, min_score)
+
+
+def recipes_with_ingredients(names, match_all=True, limit=20):
+    """
+    Return recipes using the named ingredients, each name resolved to its
+    best fuzzy match, as [{"id", "name", "matched"}] with matched the number
+    of those ingredients the recipe uses. With match_all, only recipes
+    using all of them are returned; otherwise the best partial matches are.
+    """
+    with _index.lock:
+        _index.ensure_loaded()
+        return _recipes_with_ingredients(names, match_all, limit)
+
+
+def _recipes_with_ingredients(names, match_all, limit):
+    counts = Counter()
+    resolved = 0
+    for name in names:
+        best = _index.ingredients.search(name, limit=1)
+        if not best:
+            continue
+        resolved += 1
+        counts.update(_index.recipes_by_ingredient.get(best[0]["id"], ()))
+    if match_all and resolved < len(names):
+        return []
+
+    needed = len(names) if match_all else 1
+    matches = [
+        {"id": recipe_id, "name": _index.recipes.name_of(recipe_id), "matched": matched}
+        for recipe_id, matched in counts.items()
+        if matched >= needed and _index.recipes.name_of(recipe_id) is not None
+    ]
+    matches.sort(key=lambda r: (-r["matched"], r["name"]))
+    return matches[:limit]
+
+
+def suggest(kind, name, limit=3):
+    """Close names for an unknown recipe or ingredient, for 'did you mean' hints."""
+    search = search_recipes if kind == "recipe" else search_ingredients
+    return [match["name"] for match in search(name, limit=limit, min_score=0.4)]
+
+
+def reload():
+    """Rebuild the index from the database, e.g. after another process changed names."""
+    _index.load()
@@ -0,0 +1,509 @@
+"""
+Local HTTP/JSON API over db_operations.
+
+One long-running process keeps the engine, connection pool and caches warm,
+so integrations pay an HTTP round trip per operation instead of starting
+Python and importing SQLAlchemy each time. Requests are handed to a bounded
+worker pool: threads by default (caches shared in-process), or processes
+with --processes for CPU-heavy reads; every write bumps a generation
+counter that makes process workers drop their caches before the next task.
+
+    python server.py --port 8080 --workers 8
+    curl -s localhost:8080/recipes?limit=20
+    curl -s -X POST localhost:8080/inventory -d '{"name": "Flour", "quantity": 1, "unit": "kg"}'
+
+Endpoints (JSON bodies and responses; dates as YYYY-MM-DD):
+
+    GET    /health
+    GET    /recipes                   ?after_id=&limit= for one keyset page
+    GET    /recipes/search?q=         ?limit=
+    GET    /recipes/cookable
+    GET    /recipes/<id>/requirements
+    POST   /recipes                   {"name", "ingredients": [{"name", "quantity", "unit"}]}
+    DELETE /recipes/<name>
+    GET    /inventory                 ?after_id=&limit= for one keyset page
+    GET    /inventory/<name>
+    POST   /inventory                 {"name", "quantity", "unit", "density"?}   adds stock
+    PUT    /inventory/<name>          {"quantity", "unit"?, "expected_version"?} sets stock
+    DELETE /ingredients/<name>
+    POST   /inventory/check           {"recipe_ids": [...], "servings"?}
+    POST   /meal-plans                {"entries": [{"date", "recipe_id"}]}
+    POST   /consume                   {"recipe_ids": [...], "servings"?}  servings: n or {"<recipe_id>": n}
+    POST   /cook                      {"date", "servings"?}
+    GET    /shopping-list?start=&end= ?all=1 to include items already in stock
+    GET    /stock-at?when=            a date (end of day) or ISO time
+    GET    /forecast                  ?within=&as_of=&method=&alpha=&window=&history_days=
+    GET    /movements                 ?name=&after_id=&limit= for one ledger page
+    POST   /ledger/checkpoint
+    POST   /ledger/rebuild            corrects inventory from the ledger
+    GET    /metrics                   Prometheus text, with --metrics
+    POST   /batch                     {"requests": [{"method", "path", "body"?}], "atomic"?}
+
+A batch runs its requests in order in one worker. With "atomic": true they
+share one transaction and the first failure rolls all of them back.
+"""
+import argparse
+import contextlib
+import io
+import json
+import re
+import sys
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+import db_operations
+from db import units
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class _ThreadOutput(io.TextIOBase):
+    """
+    Stand-in for sys.stdout that collects print() output per thread while a
+    request runs, so db_operations messages become error details instead of
+    interleaving on the console.
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer or self.fallback).write(text)
+
+    def flush(self):
+        self.fallback.flush()
+
+    def capture(self):
+        self.local.buffer = io.StringIO()
+
+    def release(self):
+        buffer, self.local.buffer = self.local.buffer, None
+        return buffer.getvalue().strip()
+
+
+_output = None
+
+
+def _install_output():
+    global _output
+    if _output is None:
+        _output = _ThreadOutput(sys.stdout)
+        sys.stdout = _output
+
+
+def _param(query, key, cast=str, default=None):
+    values = query.get(key)
+    if not values:
+        return default
+    try:
+        return cast(values[-1])
+    except ValueError:
+        raise ApiError(400, f"Query parameter '{key}' is not a valid {cast.__name__}")
+
+
+def _field(body, key, default=KeyError):
+    if not isinstance(body, dict):
+        raise ApiError(400, "Expected a JSON object body")
+    if key not in body:
+        if default is KeyError:
+            raise ApiError(400, f"Missing field '{key}'")
+        return default
+    return body[key]
+
+
+def _servings(body):
+    servings = _field(body, "servings", 1)
+    if not isinstance(servings, dict):
+        return servings
+    # JSON object keys are always strings; recipe ids are ints
+    try:
+        return {int(recipe_id): count for recipe_id, count in servings.items()}
+    except ValueError:
+        raise ApiError(400, "Keys of 'servings' must be recipe ids")
+
+
+def _page_or_all(query, page, everything):
+    if "limit" in query or "after_id" in query:
+        return page(_param(query, "after_id", int), _param(query, "limit", int, 100))
+    return everything()
+
+
+def _search(query):
+    import search
+    text = _param(query, "q")
+    if not text:
+        raise ApiError(400, "Missing query parameter 'q'")
+    return search.search_recipes(text, _param(query, "limit", int, 10))
+
+
+def _cookable(query):
+    from feasibility import cookable_recipes
+    return cookable_recipes()
+
+
+def _stock(name):
+    stock = db_operations.get_stock(name)
+    if stock is None:
+        raise ApiError(404, f"No stock for ingredient '{name}'")
+    return stock
+
+
+def _shopping_list(query):
+    start, end = _param(query, "start"), _param(query, "end")
+    if not start or not end:
+        raise ApiError(400, "Query parameters 'start' and 'end' are required")
+    items = db_operations.shopping_list(start, end, use_cache=True)
+    if not _param(query, "all", int, 0):
+        items = [item for item in items if item["to_buy"] > 0]
+    return items
+
+
+def _stock_at(query):
+    when = _param(query, "when")
+    if not when:
+        raise ApiError(400, "Missing query parameter 'when'")
+    return db_operations.stock_at(when)
+
+
+def _forecast(query):
+    import forecast
+    kwargs = {
+        "as_of": _param(query, "as_of"),
+        "method": _param(query, "method", str, "ewma"),
+        "alpha": _param(query, "alpha", float, 0.1),
+        "window": _param(query, "window", int, 28),
+        "history_days": _param(query, "history_days", int, 365),
+    }
+    within = _param(query, "within", int)
+    if within is not None:
+        return forecast.reorder_list(within, **kwargs)
+    return forecast.forecast(**kwargs)
+
+
+def _metrics(query):
+    import instrumentation
+    if not instrumentation.registry.enabled:
+        raise ApiError(404, "Metrics are off; start the server with --metrics")
+    return instrumentation.registry.to_prometheus()
+
+
+# (method, path pattern, handler(match, query, body)). Handlers return the
+# db_operations result; False means the operation was refused.
+ROUTES = [
+    ("GET", r"/health", lambda m, q, b: {"status": "ok"}),
+    ("GET", r"/recipes", lambda m, q, b: _page_or_all(q, db_operations.list_recipes_page, db_operations.list_recipes)),
+    ("GET", r"/recipes/search", lambda m, q, b: _search(q)),
+    ("GET", r"/recipes/cookable", lambda m, q, b: _cookable(q)),
+    ("GET", r"/recipes/(\d+)/requirements", lambda m, q, b: db_operations.recipe_requirements(int(m[1]))),
+    ("POST", r"/recipes", lambda m, q, b: db_operations.save_recipe_with_ingredients(
+        _field(b, "name"), _field(b, "ingredients"))),
+    ("DELETE", r"/recipes/([^/]+)", lambda m, q, b: db_operations.delete_recipe(m[1])),
+    ("GET", r"/inventory", lambda m, q, b: _page_or_all(
+        q, db_operations.load_inventory_page, db_operations.load_inventory)),
+    ("POST", r"/inventory/check", lambda m, q, b: db_operations.check_inventory_bulk(
+        _field(b, "recipe_ids"), _field(b, "servings", 1))),
+    ("GET", r"/inventory/([^/]+)", lambda m, q, b: _stock(m[1])),
+    ("POST", r"/inventory", lambda m, q, b: db_operations.save_ingredient(
+        _field(b, "name"), _field(b, "quantity"), _field(b, "unit"), _field(b, "density", None)) or True),
+    ("PUT", r"/inventory/([^/]+)", lambda m, q, b: db_operations.update_ingredient_quantity(
+        m[1], _field(b, "quantity"), _field(b, "expected_version", None), _field(b, "unit", None))),
+    ("DELETE", r"/ingredients/([^/]+)", lambda m, q, b: db_operations.delete_ingredient(m[1])),
+    ("POST", r"/meal-plans", lambda m, q, b: db_operations.create_meal_plans(
+        [(_field(e, "date"), _field(e, "recipe_id")) for e in _field(b, "entries")])),
+    ("POST", r"/consume", lambda m, q, b: db_operations.consume_recipes(_field(b, "recipe_ids"), _servings(b))),
+    ("POST", r"/cook", lambda m, q, b: db_operations.cook(_field(b, "date"), _field(b, "servings", 1))),
+    ("GET", r"/shopping-list", lambda m, q, b: _shopping_list(q)),
+    ("GET", r"/stock-at", lambda m, q, b: _stock_at(q)),
+    ("GET", r"/forecast", lambda m, q, b: _forecast(q)),
+    ("GET", r"/movements", lambda m, q, b: db_operations.list_stock_movements(
+        _param(q, "name"), _param(q, "after_id", int), _param(q, "limit", int, 100))),
+    ("POST", r"/ledger/checkpoint", lambda m, q, b: db_operations.checkpoint_stock()),
+    ("POST", r"/ledger/rebuild", lambda m, q, b: db_operations.rebuild_inventory()),
+    ("GET", r"/metrics", lambda m, q, b: _metrics(q)),
+]
+_COMPILED = [(method, re.compile(pattern + r"/?"), handler) for method, pattern, handler in ROUTES]
+
+
+def _route(method, path):
+    allowed = False
+    for route_method, pattern, handler in _COMPILED:
+        match = pattern.fullmatch(path)
+        if match:
+            if route_method == method:
+                return handler, match
+            allowed = True
+    if allowed:
+        raise ApiError(405, f"{method} not allowed on {path}")
+    raise ApiError(404, f"No endpoint {path}")
+
+
+def _database_error(exc):
+    """(status, message) for a database error that escaped db_operations."""
+    message = str(getattr(exc, "orig", None) or exc)
+    # Lost races and constraint violations are conflicts; anything else is ours
+    if isinstance(exc, IntegrityError) or db_operations._is_retryable(exc):
+        return 409, message
+    return 500, message
+
+
+def _call(method, target, body):
+    """Run one request and return (status, payload)."""
+    url = urlsplit(target)
+    path = unquote(url.path)
+    try:
+        if method == "POST" and path.rstrip("/") == "/batch":
+            return _batch(body)
+        handler, match = _route(method, path)
+        _output.capture()
+        try:
+            result = handler(match, parse_qs(url.query), body)
+        finally:
+            message = _output.release()
+    except ApiError as e:
+        return e.status, {"error": str(e)}
+    except (ValueError, TypeError, KeyError, units.UnitError) as e:
+        return 400, {"error": str(e)}
+    except SQLAlchemyError as e:
+        status, error = _database_error(e)
+        return status, {"error": error}
+    except Exception as e:
+        # A bug, not a bad request: log it, but still answer the client
+        traceback.print_exc()
+        return 500, {"error": f"Internal error: {type(e).__name__}"}
+    if result is False:
+        # db_operations refuses with a printed reason and False
+        return (404 if "not found" in message.lower() else 409), {"error": message or "Operation refused"}
+    if result is True:
+        return 200, {"ok": True, "message": message}
+    return 200, result
+
+
+class _BatchFailed(Exception):
+    pass
+
+
+class _TransactionGate:
+    """
+    batch_transaction() rebinds the shared Session factory, so an atomic batch
+    must not overlap other requests in the same process: requests share the
+    gate, atomic batches hold it alone.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._exclusive = False
+
+    @contextlib.contextmanager
+    def shared(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._exclusive)
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._exclusive)
+            self._exclusive = True
+            self._condition.wait_for(lambda: self._active == 0)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+
+_gate = _TransactionGate()
+
+
+def execute(method, target, body):
+    """Entry point for one HTTP request: (status, payload)."""
+    atomic = method == "POST" and isinstance(body, dict) and body.get("atomic")
+    with (_gate.exclusive() if atomic else _gate.shared()):
+        return _call(method, target, body)
+
+
+def _batch(body):
+    requests = _field(body, "requests")
+    atomic = bool(_field(body, "atomic", False))
+    if not isinstance(requests, list):
+        return 400, {"error": "'requests' must be a list"}
+    results = []
+
+    def run_all():
+        for request in requests:
+            method, path = str(_field(request, "method")).upper(), _field(request, "path")
+            if urlsplit(path).path.rstrip("/") == "/batch":
+                raise ApiError(400, "Batches cannot be nested")
+            status, payload = _call(method, path, request.get("body"))
+            results.append({"status": status, "body": payload})
+            if atomic and status >= 400:
+                raise _BatchFailed()
+
+    try:
+        if atomic:
+            with db_operations.batch_transaction():
+                run_all()
+        else:
+            run_all()
+    except _BatchFailed:
+        return 409, {"committed": False, "results": results}
+    except ApiError as e:
+        return e.status, {"error": str(e), "results": results}
+    except SQLAlchemyError as e:
+        # e.g. the final commit lost a lock race; batch_transaction rolled back
+        status, error = _database_error(e)
+        return status, {"committed": False, "error": error, "results": results}
+    return 200, {"committed": True, "results": results}
+
+
+def _is_write(method, body):
+    if method == "POST" and isinstance(body, dict) and isinstance(body.get("requests"), list):
+        return any(str(r.get("method", "")).upper() != "GET" for r in body["requests"] if isinstance(r, dict))
+    return method != "GET"
+
+
+# Process workers: the generation of the last write each worker has seen
+_seen_generation = 0
+
+
+def _init_worker(database_url, in_child=False):
+    if in_child:
+        # Connections pooled before the fork belong to the parent
+        db_operations.engine.dispose(close=False)
+    if database_url:
+        from db.database import get_engine
+        db_operations.engine = get_engine(database_url)
+        db_operations.Session.configure(bind=db_operations.engine)
+    _install_output()
+
+
+def _call_in_worker(generation, method, target, body):
+    global _seen_generation
+    if generation != _seen_generation:
+        # Another worker wrote since this one last ran
+        db_operations.invalidate_caches()
+        _seen_generation = generation
+    return execute(method, target, body)
+
+
+class MealMateServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers=8, processes=False, database_url=None, verbose=False):
+        super().__init__(address, RequestHandler)
+        self.verbose = verbose
+        self.processes = processes
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        if processes:
+            self.pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(database_url, True))
+        else:
+            _init_worker(database_url)
+            self.pool = ThreadPoolExecutor(workers, thread_name_prefix="meal-mate-worker")
+
+    def execute(self, method, target, body):
+        if not self.processes:
+            return self.pool.submit(execute, method, target, body).result()
+        result = self.pool.submit(_call_in_worker, self.generation, method, target, body).result()
+        if _is_write(method, body):
+            with self._generation_lock:
+                self.generation += 1
+        return result
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            return self._send(413, {"error": "Request body too large"})
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            return self._send(400, {"error": "Body is not valid JSON"})
+        status, payload = self.server.execute(self.command, self.path, body)
+        self._send(status, payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def _send(self, status, payload):
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            data, content_type = json.dumps(payload, default=str).encode(), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host="127.0.0.1", port=0, workers=8, processes=False, database_url=None, verbose=False):
+    """Create the server without starting it; port 0 picks a free port (see server_address)."""
+    _install_output()
+    return MealMateServer((host, port), workers, processes, database_url, verbose)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve db_operations over HTTP/JSON on localhost.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="0 picks a free port")
+    parser.add_argument("--workers", type=int, default=8, help="Worker pool size (default: 8)")
+    parser.add_argument("--processes", action="store_true", help="Use worker processes instead of threads")
+    parser.add_argument("--database-url", help="Overrides MEAL_MATE_DATABASE_URL")
+    parser.add_argument("--metrics", action="store_true", help="Record query metrics, served at /metrics")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        if args.processes:
+            parser.error("--metrics needs thread workers; process workers keep their own counters")
+        import instrumentation
+        instrumentation.enable()
+
+    server = make_server(args.host, args.port, args.workers, args.processes, args.database_url, args.verbose)
+    host, port = server.server_address[:2]
+    print(f"Serving Meal Mate on http://{host}:{port} with {args.workers} worker "
+          f"{'processes' if args.processes else 'threads'}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
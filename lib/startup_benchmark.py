@@ -0,0 +1,162 @@
+"""
+Cold-start benchmark for the CLI entry point.
+
+Generates a small synthetic database, then runs each command below as a
+fresh `python -X importtime cli.py ...` process several times. Reports the
+median wall time, the time spent importing modules and the heaviest
+top-level imports per command.
+
+The import budget is which modules a command may load: help and argument
+errors must not import SQLAlchemy or the ORM models, and plain database
+commands must not import NumPy. Unlike wall times, this does not depend
+on the machine, so --check can fail CI when an eager import creeps back.
+
+Usage:
+    python startup_benchmark.py --runs 5
+    python startup_benchmark.py --check --max-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import datagen
+from helpers import format_table
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DAY = datagen.START_DATE.isoformat()
+WEEK_END = (datagen.START_DATE + timedelta(days=6)).isoformat()
+
+COMMANDS = {
+    "help": ["--help"],
+    "recipes help": ["recipes", "--help"],
+    "bad arguments": ["plan", "not-a-date"],
+    "recipes": ["recipes", "--limit", "20"],
+    "inventory": ["inventory", "--limit", "20"],
+    "stock": ["stock", "Ingredient 000001"],
+    "shopping-list": ["shopping-list", DAY, WEEK_END],
+    "plan": ["plan", DAY, "Recipe 000001"],
+    "cookable": ["cookable"],
+    "search": ["search", "recipe 00001"],
+    "forecast": ["forecast", "--as-of", WEEK_END, "--within", "7"],
+}
+
+NO_DATABASE = ("sqlalchemy", "db.models", "numpy")
+# Modules each command must not import
+DEFERRED_IMPORTS = {
+    "help": NO_DATABASE,
+    "recipes help": NO_DATABASE,
+    "bad arguments": NO_DATABASE,
+    "recipes": ("numpy",),
+    "inventory": ("numpy",),
+    "stock": ("numpy",),
+    "shopping-list": ("numpy",),
+    "plan": ("numpy",),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse -X importtime output into (total self microseconds, {module:
+    cumulative microseconds} for top-level imports, set of every module).
+    """
+    total = 0
+    top_level = {}
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total += int(self_us)
+        modules.add(name.strip())
+        # Nesting is shown by two extra spaces of indent per level
+        if not name[1:].startswith(" "):
+            top_level[name.strip()] = int(cumulative_us)
+    return total, top_level, modules
+
+
+def run_command(argv, env):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(HERE, "cli.py"), *argv],
+        env=env, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    import_us, top_level, modules = parse_importtime(proc.stderr)
+    return wall_ms, import_us / 1000, top_level, modules
+
+
+def measure(name, argv, env, runs):
+    # One untimed run so the first measurement does not pay for a cold disk cache
+    run_command(argv, env)
+    walls, imports = [], []
+    for _ in range(runs):
+        wall_ms, import_ms, top_level, modules = run_command(argv, env)
+        walls.append(wall_ms)
+        imports.append(import_ms)
+    heaviest = sorted(top_level.items(), key=lambda item: -item[1])[:3]
+    violations = [
+        module for module in DEFERRED_IMPORTS.get(name, ())
+        if module in modules
+    ]
+    return {
+        "command": name,
+        "argv": argv,
+        "runs": runs,
+        "wall_ms_p50": round(statistics.median(walls), 1),
+        "import_ms_p50": round(statistics.median(imports), 1),
+        "modules": len(modules),
+        "heaviest_imports": [{"module": m, "ms": round(us / 1000, 1)} for m, us in heaviest],
+        "unexpected_imports": violations,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure CLI cold-start time per command.")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per command (default: 5)")
+    parser.add_argument("--only", nargs="+", metavar="COMMAND", choices=COMMANDS, help="Measure only these commands")
+    parser.add_argument("--check", action="store_true", help="Exit 1 when a command breaks its import budget")
+    parser.add_argument("--max-ms", type=float, help="With --check, also fail when a median wall time exceeds this")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        datagen.generate(db_path, ingredients=200, recipes=500, days=30)
+        env = dict(os.environ, MEAL_MATE_DATABASE_URL=f"sqlite:///{db_path}")
+        results = [measure(name, COMMANDS[name], env, args.runs) for name in args.only or COMMANDS]
+
+    print(format_table(
+        [(r["command"], r["wall_ms_p50"], r["import_ms_p50"], r["modules"],
+          ", ".join(f"{h['module']} {h['ms']}" for h in r["heaviest_imports"]))
+         for r in results],
+        headers=["Command", "Wall ms", "Import ms", "Modules", "Heaviest imports (ms)"],
+    ))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    failed = False
+    for r in results:
+        if r["unexpected_imports"]:
+            failed = True
+            print(f"{r['command']}: imports {', '.join(r['unexpected_imports'])}", file=sys.stderr)
+        if args.max_ms is not None and r["wall_ms_p50"] > args.max_ms:
+            failed = True
+            print(f"{r['command']}: {r['wall_ms_p50']} ms is over {args.max_ms} ms", file=sys.stderr)
+    if not args.check:
+        return 0
+    if failed:
+        return 1
+    print("\nAll commands within their import budgets.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Micro-benchmark for the per-call overhead of db_operations' small lookups.
+
+Each lookup runs thousands of times in one session, two ways: "ad hoc"
+builds the statement on every call with session.query(), as db_operations
+used to, and "prebuilt" executes the statement db_operations builds once
+at import. The rows are tiny and the database is warm, so the difference
+is almost all Python: building the expression, ORM query compilation and
+generating the statement cache key. A short extra pass with
+instrumentation enabled reports how often each path found its compiled
+SQL in the engine's statement cache.
+
+Usage:
+    python statement_benchmark.py --calls 5000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import datagen
+import db_operations
+import instrumentation
+from db.database import get_engine
+from db.models import Ingredient, Inventory, MealPlan, RecipeIngredient
+from helpers import format_table
+
+
+def _names(i):
+    return f"Ingredient {i % 1000 + 1:06d}"
+
+
+def _recipe_id(i):
+    return i % 2000 + 1
+
+
+def _plan_date(i):
+    return datagen.START_DATE + timedelta(days=i % 30)
+
+
+# lookup -> (ad hoc, prebuilt), each called as fn(session, i)
+LOOKUPS = {
+    "ingredient by name": (
+        lambda s, i: s.query(Ingredient.id, Ingredient.unit, Ingredient.density)
+        .filter_by(name=_names(i)).first(),
+        lambda s, i: s.execute(db_operations._INGREDIENT_BY_NAME, {"name": _names(i)}).first(),
+    ),
+    "recipe requirements": (
+        lambda s, i: s.query(
+            RecipeIngredient.ingredient_id, Ingredient.name, RecipeIngredient.quantity_needed, Ingredient.unit,
+        ).join(RecipeIngredient.ingredient).filter(RecipeIngredient.recipe_id == _recipe_id(i)).all(),
+        lambda s, i: s.execute(db_operations._REQUIREMENTS, {"recipe_id": _recipe_id(i)}).all(),
+    ),
+    "stock for ingredients": (
+        lambda s, i: s.query(Inventory.ingredient_id, Inventory.quantity_in_stock)
+        .filter(Inventory.ingredient_id.in_([i % 1000 + 1, i % 997 + 1, i % 991 + 1])).all(),
+        lambda s, i: s.execute(
+            db_operations._STOCK_FOR_INGREDIENTS, {"ingredient_ids": [i % 1000 + 1, i % 997 + 1, i % 991 + 1]}
+        ).all(),
+    ),
+    "stock by name": (
+        lambda s, i: s.query(Inventory.quantity_in_stock, Inventory.unit, Inventory.version)
+        .join(Inventory.ingredient).filter(Ingredient.name == _names(i)).first(),
+        lambda s, i: db_operations._get_stock(s, _names(i)),
+    ),
+    "meal plan exists": (
+        lambda s, i: s.query(MealPlan).filter_by(date=_plan_date(i), recipe_id=_recipe_id(i)).first(),
+        lambda s, i: s.scalar(db_operations._MEAL_PLAN_ID, {"date": _plan_date(i), "recipe_id": _recipe_id(i)}),
+    ),
+    "inventory row": (
+        lambda s, i: s.query(Inventory).filter_by(ingredient_id=i % 1000 + 1).first(),
+        lambda s, i: s.scalars(db_operations._INVENTORY_FOR_INGREDIENT, {"ingredient_id": i % 1000 + 1}).first(),
+    ),
+}
+
+
+def time_calls(fn, calls, warmup=200):
+    with db_operations.Session() as session:
+        for i in range(warmup):
+            fn(session, i)
+        start = time.perf_counter()
+        for i in range(calls):
+            fn(session, i)
+        elapsed = time.perf_counter() - start
+        # Keep identity-map growth from one lookup out of the next
+        session.expunge_all()
+    return elapsed / calls * 1e6
+
+
+def cache_hit_ratio(fn, calls=200):
+    instrumentation.registry.reset()
+    instrumentation.enable()
+    try:
+        with db_operations.Session() as session:
+            for i in range(calls):
+                fn(session, i)
+    finally:
+        instrumentation.disable()
+    return instrumentation.statement_cache_stats()["hit_ratio"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare ad hoc and prebuilt statements for small lookups.")
+    parser.add_argument("--calls", type=int, default=5000, help="Timed calls per lookup and path (default: 5000)")
+    parser.add_argument("--db", help="Where to build the database (default: a temporary file)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "statements.db")
+        print(f"Generating database at {db_path} ...")
+        datagen.generate(db_path, ingredients=1000, recipes=2000, days=30)
+        engine = get_engine(f"sqlite:///{db_path}")
+        db_operations.engine = engine
+        db_operations.Session.configure(bind=engine)
+
+        for name, (adhoc, prebuilt) in LOOKUPS.items():
+            adhoc_us = time_calls(adhoc, args.calls)
+            prebuilt_us = time_calls(prebuilt, args.calls)
+            results.append({
+                "lookup": name,
+                "calls": args.calls,
+                "adhoc_us": round(adhoc_us, 1),
+                "prebuilt_us": round(prebuilt_us, 1),
+                "speedup": round(adhoc_us / prebuilt_us, 2),
+                "adhoc_cache_hit_ratio": cache_hit_ratio(adhoc),
+                "prebuilt_cache_hit_ratio": cache_hit_ratio(prebuilt),
+            })
+        engine.dispose()
+
+    print(format_table(
+        [(r["lookup"], r["adhoc_us"], r["prebuilt_us"], r["speedup"],
+          r["adhoc_cache_hit_ratio"], r["prebuilt_cache_hit_ratio"]) for r in results],
+        headers=["Lookup", "Ad hoc us/call", "Prebuilt us/call", "Speedup", "Ad hoc cache hits", "Prebuilt cache hits"],
+    ))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
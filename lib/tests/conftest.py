@@ -0,0 +1,25 @@
+"""
+Shared fixtures. Tests run against their own small synthetic database, never
+db/meal_mate.db: python -m pytest tests (from lib/).
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datagen  # noqa: E402
+import db_operations  # noqa: E402
+from db.database import dispose_engine, tenant_url  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Bind db_operations to a fresh synthetic database for one test; yield its URL."""
+    path = str(tmp_path / "meal_mate.db")
+    datagen.generate(path, ingredients=200, recipes=3000, days=7, plans_per_day=2)
+    url = tenant_url(path)
+    with db_operations.use_database(url):
+        yield url
+    dispose_engine(url)
@@ -0,0 +1,40 @@
+import json
+
+from sqlalchemy.exc import OperationalError
+
+import commands
+import db_operations
+
+
+def _run(capsys, *argv):
+    status = commands.run([*argv, "--format", "json"])
+    out, err = capsys.readouterr()
+    return status, json.loads(out) if out else None, err
+
+
+def test_plan_over_several_days_checks_stock_for_every_day(database, capsys):
+    db_operations.save_ingredient("Oats", 100, "g")
+    db_operations.save_recipe_with_ingredients("Porridge", [{"name": "Oats", "quantity": 80, "unit": "g"}])
+
+    status, rows, _ = _run(capsys, "plan", "2030-01-01", "Porridge")
+    assert status == 0
+    assert not [r for r in rows if r["type"] == "missing"]
+
+    status, rows, _ = _run(capsys, "plan", "2030-02-01", "Porridge", "--days", "3")
+    assert status == 0
+    assert [r for r in rows if r["type"] == "missing"] == [
+        {"type": "missing", "name": "Oats", "needed": 240.0, "have": 100.0, "unit": "grams"}
+    ]
+    assert len([r for r in rows if r["type"] == "planned"]) == 3
+
+
+def test_error_while_streaming_rows_is_reported_cleanly(database, capsys, monkeypatch):
+    def recipes():
+        yield {"id": 1, "name": "First"}
+        raise OperationalError("SELECT ...", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(db_operations, "iter_recipes", recipes)
+    assert commands.run(["recipes", "--format", "json"]) == 1
+    out, err = capsys.readouterr()
+    assert out.startswith('[{"id": 1, "name": "First"}')
+    assert err == "Error: database is locked\n"
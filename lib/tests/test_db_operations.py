@@ -0,0 +1,21 @@
+import pytest
+
+import db_operations
+from db.models import Ingredient
+
+
+def _density(name):
+    with db_operations.Session() as session:
+        return session.query(Ingredient.density).filter_by(name=name).scalar()
+
+
+def test_save_ingredient_rejects_non_positive_density_for_existing_ingredient(database):
+    db_operations.save_ingredient("Milk", 100, "ml", density=1.03)
+    stock = db_operations.get_stock("Milk")["quantity"]
+
+    for density in (-5, 0):
+        with pytest.raises(ValueError, match="Density must be positive"):
+            db_operations.save_ingredient("Milk", 100, "g", density=density)
+
+    assert _density("Milk") == 1.03
+    assert db_operations.get_stock("Milk")["quantity"] == stock
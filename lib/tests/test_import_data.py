@@ -0,0 +1,81 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+from sqlalchemy import func, select
+
+# import_data runs as a script from lib/db and imports its neighbours as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db"))
+
+import import_data  # noqa: E402
+from db.database import get_engine  # noqa: E402
+from db.models import Recipe, RecipeIngredient  # noqa: E402
+
+
+@pytest.fixture
+def engine(database):
+    return get_engine(database)
+
+
+def _import(engine, lines, chunk_size=import_data.DEFAULT_CHUNK_SIZE):
+    stream = io.StringIO("\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines))
+    return import_data.run_import(engine, stream, "jsonl", chunk_size, out=io.StringIO())
+
+
+def _ingredient_count(engine, recipe):
+    with engine.connect() as conn:
+        return conn.scalar(
+            select(func.count(RecipeIngredient.id)).join(Recipe).where(Recipe.name == recipe)
+        )
+
+
+def _recipe_exists(engine, recipe):
+    with engine.connect() as conn:
+        return conn.scalar(select(Recipe.id).where(Recipe.name == recipe)) is not None
+
+
+def test_non_object_lines_are_row_errors(engine):
+    importer = _import(engine, [
+        "[1, 2]",
+        '"x"',
+        "5",
+        {"recipe": "Z1", "ingredients": ["flour"]},
+        {"recipe": "Z2", "ingredients": [{"name": "Flour", "quantity": 1, "unit": "g"}]},
+    ])
+    assert [line_no for line_no, _ in importer.errors] == [1, 2, 3, 4]
+    assert importer.errors[0] == (1, "Expected a JSON object, got list")
+    assert importer.rows_loaded == 1
+    assert _recipe_exists(engine, "Z2")
+    assert not _recipe_exists(engine, "Z1")
+
+
+def test_recipe_with_a_rejected_row_is_skipped_whole(engine):
+    importer = _import(engine, [
+        {"recipe": "Y1", "ingredients": [
+            {"name": "Flour", "quantity": 1, "unit": "g"},
+            {"name": "Sugar", "quantity": "lots", "unit": "g"},
+        ]},
+        {"recipe": "Y2", "ingredients": [{"name": "Flour", "quantity": 1, "unit": "g"}]},
+    ])
+    assert not _recipe_exists(engine, "Y1")
+    assert _ingredient_count(engine, "Y2") == 1
+    assert importer.rows_loaded == 1
+    assert sorted(importer.errors) == [
+        (1, "Invalid quantity 'lots' for ingredient Sugar"),
+        (1, "Recipe 'Y1' skipped: line 1 was rejected"),
+    ]
+
+
+def test_recipe_rejected_in_a_later_chunk_is_removed(engine):
+    rows = [{"recipe": "Y3", "ingredient": name, "quantity": 1, "unit": "g"} for name in ("Flour", "Sugar", "Salt")]
+    rows[2]["unit"] = "parsec"
+    importer = _import(engine, rows, chunk_size=2)
+    assert not _recipe_exists(engine, "Y3")
+    assert importer.rows_loaded == 0
+    assert sorted(importer.errors) == [
+        (1, "Recipe 'Y3' skipped: line 3 was rejected"),
+        (2, "Recipe 'Y3' skipped: line 3 was rejected"),
+        (3, "Invalid unit 'parsec' for ingredient Salt"),
+    ]
@@ -0,0 +1,22 @@
+from datetime import date
+
+from sqlalchemy import update
+
+import db_operations
+import optimizer
+from db.models import Inventory
+
+
+def test_recipes_without_ingredients_are_never_planned(database):
+    # With nothing in stock every real recipe costs something to buy
+    with db_operations.Session() as session:
+        session.execute(update(Inventory).values(quantity_in_stock=0))
+        session.commit()
+    empty = set()
+    for n in range(5):
+        db_operations.save_recipe_with_ingredients(f"Empty {n}", [])
+        empty.add(f"Empty {n}")
+
+    result = optimizer.optimize(date(2031, 1, 1), date(2031, 1, 1), meals_per_day=10)
+    assert len(result["plan"]) == 10
+    assert not {entry["name"] for entry in result["plan"]} & empty
@@ -0,0 +1,103 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from urllib.parse import quote
+
+import pytest
+
+import db_operations
+import feasibility
+import server
+from db.models import Ingredient, Recipe
+
+
+@pytest.fixture
+def api(database):
+    """Serve the test database on a free port; yield request(method, path, body) -> (status, payload)."""
+    httpd = server.make_server(workers=4, database_url=database)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+
+    def request(method, path, body=None):
+        conn = HTTPConnection(host, port, timeout=30)
+        try:
+            conn.request(method, path, body=None if body is None else json.dumps(body),
+                         headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    yield request
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_cookable_while_recipes_change(api):
+    # Load the matrix and the search index so change events update them
+    assert api("GET", "/recipes/cookable")[0] == 200
+    assert api("GET", "/recipes/search?q=recipe")[0] == 200
+
+    with db_operations.Session() as session:
+        units = dict(session.query(Ingredient.name, Ingredient.unit))
+
+    def write(n):
+        name = f"Concurrent {n:03d}"
+        ingredients = [
+            {"name": ingredient, "quantity": 1, "unit": units[ingredient]}
+            for ingredient in ("Ingredient 000001", f"Ingredient {n % 40 + 2:06d}")
+        ]
+        statuses = [api("POST", "/recipes", {"name": name, "ingredients": ingredients})[0]]
+        if n % 3 == 0 and statuses[0] == 200:
+            statuses.append(api("DELETE", f"/recipes/{quote(name)}")[0])
+        return name, statuses
+
+    def read(n):
+        path = "/recipes/cookable" if n % 2 else "/recipes/search?q=concurrent"
+        return api("GET", path)
+
+    with ThreadPoolExecutor(8) as pool:
+        writes = [pool.submit(write, n) for n in range(150)]
+        reads = [pool.submit(read, n) for n in range(300)]
+        writes, reads = [f.result() for f in writes], [f.result() for f in reads]
+
+    # Writers may lose SQLite's lock race (409); readers must never fail
+    assert {status for _, statuses in writes for status in statuses} <= {200, 409}
+    assert [status for status, _ in reads] == [200] * len(reads)
+    saved = {name for name, statuses in writes if statuses[0] == 200 and statuses[1:] != [200]}
+    status, cookable = api("GET", "/recipes/cookable")
+    assert status == 200
+    assert {r["name"] for r in cookable if r["name"].startswith("Concurrent")} <= saved
+    assert {r["name"] for r in api("GET", "/recipes/search?q=concurrent&limit=200")[1]} == saved
+
+
+def test_unexpected_error_is_a_500(api, monkeypatch):
+    def broken():
+        raise IndexError("boom")
+
+    monkeypatch.setattr(feasibility, "cookable_recipes", broken)
+    assert api("GET", "/recipes/cookable") == (500, {"error": "Internal error: IndexError"})
+    assert api("GET", "/health") == (200, {"status": "ok"})
+
+
+def test_post_inventory_rejects_negative_density(api):
+    assert api("POST", "/inventory", {"name": "Milk", "quantity": 100, "unit": "ml", "density": 1.03})[0] == 200
+    status, payload = api("POST", "/inventory", {"name": "Milk", "quantity": 100, "unit": "g", "density": -5})
+    assert (status, payload) == (400, {"error": "Density must be positive"})
+
+
+def test_consume_servings_map_uses_recipe_ids_from_json_keys(api):
+    db_operations.save_ingredient("Rice", 1000, "g")
+    db_operations.save_recipe_with_ingredients("Rice Bowl", [{"name": "Rice", "quantity": 100, "unit": "g"}])
+    with db_operations.Session() as session:
+        recipe_id = session.query(Recipe.id).filter_by(name="Rice Bowl").scalar()
+
+    status, _ = api("POST", "/consume", {"recipe_ids": [recipe_id], "servings": {str(recipe_id): 3}})
+    assert status == 200
+    assert db_operations.get_stock("Rice")["quantity"] == 700
+
+    status, payload = api("POST", "/consume", {"recipe_ids": [recipe_id], "servings": {"rice": 3}})
+    assert (status, payload) == (400, {"error": "Keys of 'servings' must be recipe ids"})
+    assert db_operations.get_stock("Rice")["quantity"] == 700